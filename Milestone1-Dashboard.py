@@ -1,7 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
+
+from compact import ColumnRows, load_compact_data
+from correlation import CorrelationIndex
+from dashboards import DISPLAY_NAMES, average_bar, correlation_heatmap, trend_line
+from downsample import DEFAULT_WIDTH, downsample_frame
+from rollups import RollupIndex, window_bounds
 
 # ----------------------------
 # 🎨 PAGE SETUP
@@ -72,35 +77,29 @@ st.markdown("---")
 # ----------------------------
 # 📂 LOAD DATA
 # ----------------------------
-@st.cache_data
+# One compact, read-only dataset shared by every session (see compact.py).
+# The indexes read its rows through column views rather than a float64 copy.
+@st.cache_resource
 def load_data():
-    df = pd.read_csv("AirQuality_cleaned.csv")
-
-    rename_map = {
-        'CO(GT)': 'CO',
-        'PT08.S1(CO)': 'Sensor_CO',
-        'NMHC(GT)': 'NMHC',
-        'C6H6(GT)': 'Benzene',
-        'PT08.S2(NMHC)': 'Sensor_NMHC',
-        'NOx(GT)': 'NOx',
-        'PT08.S3(NOx)': 'Sensor_NOx',
-        'NO2(GT)': 'NO2',
-        'PT08.S4(NO2)': 'Sensor_NO2',
-        'PT08.S5(O3)': 'Sensor_O3',
-        'T': 'Temperature_C',
-        'RH': 'Relative_Humidity',
-        'AH': 'Absolute_Humidity',
-        'O3': 'O3',
-        'SO2': 'SO2'
-    }
-
-    df = df.rename(columns=rename_map)
-    df['Datetime'] = pd.to_datetime(df['Datetime'], errors='coerce')
-    df = df.dropna(subset=['Datetime'])
-    df = df.sort_values(by='Datetime')
-    return df
-
-df = load_data()
+    return load_compact_data().rename(DISPLAY_NAMES)
+
+@st.cache_resource
+def load_rollups():
+    dataset = load_data()
+    return RollupIndex.from_rows(dataset.columns, dataset.stamps, ColumnRows(dataset))
+
+@st.cache_resource
+def load_correlations():
+    dataset = load_data()
+    return CorrelationIndex.from_rows(dataset.columns, dataset.stamps, ColumnRows(dataset))
+
+@st.cache_data
+def trend_points(columns, time_range, width=DEFAULT_WIDTH):
+    lo, hi = window_bounds(load_rollups(), time_range)
+    return downsample_frame(load_data().frame(columns, lo, hi), 'Datetime', list(columns), width)
+
+dataset = load_data()
+rollups = load_rollups()
 
 # ----------------------------
 # 🧭 SIDEBAR FILTERS
@@ -116,10 +115,7 @@ pollutants = [
 selected_pollutants = st.sidebar.multiselect("Select Pollutants", pollutants, default=['CO', 'NO2', 'Temperature_C'])
 
 time_range = st.sidebar.selectbox("Select Time Range", ["Last 7 Days", "Last 30 Days", "All Data"])
-if time_range == "Last 7 Days":
-    df = df[df['Datetime'] >= df['Datetime'].max() - pd.Timedelta(days=7)]
-elif time_range == "Last 30 Days":
-    df = df[df['Datetime'] >= df['Datetime'].max() - pd.Timedelta(days=30)]
+window_stats = rollups.window_stats(time_range)
 
 # ----------------------------
 # 📊 KPI METRICS
@@ -131,19 +127,19 @@ col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     st.markdown(f"<p style='color:{text_color}; font-size:18px;'>🌡️ Avg Temperature (°C)</p>", unsafe_allow_html=True)
-    st.markdown(f"<h3 style='color:#1E90FF;'>{df['Temperature_C'].mean():.2f}</h3>", unsafe_allow_html=True)
+    st.markdown(f"<h3 style='color:#1E90FF;'>{window_stats.loc['Temperature_C', 'mean']:.2f}</h3>", unsafe_allow_html=True)
 
 with col2:
     st.markdown(f"<p style='color:{text_color}; font-size:18px;'>💧 Avg Humidity (%)</p>", unsafe_allow_html=True)
-    st.markdown(f"<h3 style='color:#1E90FF;'>{df['Relative_Humidity'].mean():.2f}</h3>", unsafe_allow_html=True)
+    st.markdown(f"<h3 style='color:#1E90FF;'>{window_stats.loc['Relative_Humidity', 'mean']:.2f}</h3>", unsafe_allow_html=True)
 
 with col3:
     st.markdown(f"<p style='color:{text_color}; font-size:18px;'>🌿 Avg CO (mg/m³)</p>", unsafe_allow_html=True)
-    st.markdown(f"<h3 style='color:#1E90FF;'>{df['CO'].mean():.2f}</h3>", unsafe_allow_html=True)
+    st.markdown(f"<h3 style='color:#1E90FF;'>{window_stats.loc['CO', 'mean']:.2f}</h3>", unsafe_allow_html=True)
 
 with col4:
     st.markdown(f"<p style='color:{text_color}; font-size:18px;'>🚗 Avg NOx (ppb)</p>", unsafe_allow_html=True)
-    st.markdown(f"<h3 style='color:#1E90FF;'>{df['NOx'].mean():.2f}</h3>", unsafe_allow_html=True)
+    st.markdown(f"<h3 style='color:#1E90FF;'>{window_stats.loc['NOx', 'mean']:.2f}</h3>", unsafe_allow_html=True)
 
 
 # ----------------------------
@@ -154,12 +150,10 @@ st.markdown(f"<h3 style='color:{text_color};'>📈 Trends Over Time</h3>", unsaf
 
 if selected_pollutants:
     for pollutant in selected_pollutants:
-        if pollutant in df.columns:
-            fig = px.line(
-                df, x='Datetime', y=pollutant, 
-                title=f"{pollutant} Trend Over Time",
-                color_discrete_sequence=chart_colors,
-                template=plot_template
+        if pollutant in dataset:
+            fig = trend_line(
+                trend_points((pollutant,), time_range), pollutant,
+                f"{pollutant} Trend Over Time", chart_colors, plot_template
             )
             st.plotly_chart(fig, use_container_width=True)
 else:
@@ -170,11 +164,9 @@ else:
 # ----------------------------
 if len(selected_pollutants) > 1:
     st.markdown(f"<h3 style='color:{text_color};'>📊 Pollutant Comparison</h3>", unsafe_allow_html=True)
-    fig2 = px.line(
-        df, x='Datetime', y=selected_pollutants, 
-        title="Comparison of Selected Pollutants",
-        color_discrete_sequence=chart_colors,
-        template=plot_template
+    fig2 = trend_line(
+        trend_points(tuple(selected_pollutants), time_range), selected_pollutants,
+        "Comparison of Selected Pollutants", chart_colors, plot_template
     )
     st.plotly_chart(fig2, use_container_width=True)
 
@@ -187,23 +179,15 @@ st.markdown(f"<h3 style='color:{text_color};'>🔍 Data Insights</h3>", unsafe_a
 colA, colB = st.columns(2)
 with colA:
     st.write("#### Average Values per Pollutant")
-    avg_data = df[selected_pollutants].mean().reset_index()
+    avg_data = window_stats.loc[selected_pollutants, 'mean'].reset_index()
     avg_data.columns = ['Pollutant', 'Average Value']
-    fig3 = px.bar(
-        avg_data, x='Pollutant', y='Average Value', color='Pollutant',
-        color_discrete_sequence=chart_colors,
-        template=plot_template
-    )
+    fig3 = average_bar(avg_data, chart_colors, plot_template)
     st.plotly_chart(fig3, use_container_width=True)
 
 with colB:
     st.write("#### Correlation Heatmap")
-    corr = df[selected_pollutants].corr()
-    fig4 = px.imshow(
-        corr, text_auto=True, aspect="auto",
-        color_continuous_scale='Oranges' if theme=="Dark Mode" else 'Blues',
-        template=plot_template
-    )
+    corr = load_correlations().window_corr(time_range, selected_pollutants)
+    fig4 = correlation_heatmap(corr, 'Oranges' if theme=="Dark Mode" else 'Blues', plot_template)
     st.plotly_chart(fig4, use_container_width=True)
 
 # ----------------------------
@@ -1,9 +1,15 @@
 import streamlit as st
 
+from data_loader import load_cleaned_data
+from query import QUERY_URL
+
 # Load dataset (if needed in backend)
-import pandas as pd
-df = pd.read_csv("AirQuality_cleaned.csv")
+@st.cache_data
+def load_data():
+    return load_cleaned_data()
+
+df = load_data()
 st.write("Dataset Loaded:", df.shape)
 
-# Show dashboard.html fullscreen in an iframe
-st.components.v1.iframe("http://localhost:8502/Milestone2-Dashboard.html", height=1800, width=1500, scrolling=True)
+# Show the dashboard page fullscreen in an iframe; it is served, with its data, by `python query.py`
+st.components.v1.iframe(f"{QUERY_URL}/Milestone2-Dashboard.html", height=1800, width=1500, scrolling=True)
@@ -1,7 +1,13 @@
+import json
+
 import streamlit as st
 import pandas as pd
 import streamlit.components.v1 as components
 
+from alerts import read_events
+from data_loader import load_cleaned_data
+from query import QUERY_URL
+
 # Page config
 st.set_page_config(
     page_title="Air Quality Alert System",
@@ -12,17 +18,26 @@ st.set_page_config(
 # Load CSV
 @st.cache_data
 def load_data():
-    df = pd.read_csv('AirQuality_cleaned.csv')
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
-    return df
+    return load_cleaned_data()
 
 df = load_data()
 
 # Show dataset info
 st.write("✅ **Dataset Loaded:**", df.shape)
 
-# Embed the HTML dashboard
-with open("index.html", "r", encoding="utf-8") as f:
+# Alert feed written by the alert engine as data arrives
+st.markdown("### 🚨 Recent Alerts")
+alert_styles = {'warning': st.warning, 'danger': st.error, 'success': st.success}
+events = read_events(limit=20)
+if not events:
+    st.info("No alerts raised yet.")
+for event in reversed(events):
+    show = alert_styles.get(event['level'], st.info)
+    show(f"**{event['title']}** — AQI {event['aqi']} at {event['station']}\n\n{event['time']}")
+
+# Embed the HTML dashboard; it fetches its data from `python query.py`
+with open("Milestone3-Dashboard.html", "r", encoding="utf-8") as f:
     html_content = f.read()
 
-components.html(html_content, height=2000, scrolling=True)
\ No newline at end of file
+api_script = f"<script>window.QUERY_URL = {json.dumps(QUERY_URL)};</script>"
+components.html(api_script + html_content, height=2000, scrolling=True)
\ No newline at end of file
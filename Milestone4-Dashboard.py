@@ -1,9 +1,22 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, timedelta
+import copy
+import uuid
+
+import aqi
+from alerts import AlertEngine, read_events
+from dashboards import (HORIZONS, POLLUTANT_MAPPING, TREND_POLLUTANTS, aqi_gauge, forecast_chart,
+                        forecast_values, pollutant_mapping, recent_table, trends_chart)
+from data_loader import DATETIME_COL, DEFAULT_STATION, dataset_key, partition_key
+from downsample import DEFAULT_WIDTH, downsample_series
+from forecasting import load_forecaster
+from instrumentation import cache_table, finish_rerun, span, span_table, start_rerun, timed, track_cache
+from mapped import extend_mapped, load_mapped
+from quality import mask_flagged
+from rollups import RollupIndex, window_slice
+from startup import import_modules, warm_up
+from stations import list_stations, load_station, station_version
 
 # Page config
 st.set_page_config(
@@ -13,35 +26,69 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Load data
-@st.cache_data
-def load_data():
-    df = pd.read_csv('AirQuality_cleaned.csv')
-    df['Datetime'] = pd.to_datetime(df['Datetime'])
-    df = df.sort_values('Datetime')
-    return df
-
-df = load_data()
-
-# Column mapping
-POLLUTANT_MAPPING = {
-    "PM2.5": "C6H6(GT)",
-    "NO2": "NO2(GT)",
-    "NOx": "NOx(GT)",
-    "O3": "PT08.S5(O3)",
-    "SO2": "PT08.S4(NO2)"
-}
-
-def calculate_aqi(value):
-    """Calculate AQI from pollutant value"""
-    if value < 50:
-        return {'aqi': round(value), 'status': 'Good', 'color': '#4CAF50'}
-    elif value < 100:
-        return {'aqi': round(value), 'status': 'Moderate', 'color': '#FFC107'}
-    elif value < 150:
-        return {'aqi': round(value), 'status': 'Unhealthy for Sensitive', 'color': '#FF9800'}
-    else:
-        return {'aqi': round(value), 'status': 'Unhealthy', 'color': '#F44336'}
+# Per-rerun timings, cache counters and memory (see instrumentation.py)
+session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+start_rerun('milestone4', session_id)
+
+# Load data (only the selected station's partitions are read). Frames are
+# shared read-only by every session rather than copied per call, and keyed on
+# the station's data version (stations.station_version), so an upload, live
+# write or station partition rewrite from any process is picked up; older
+# versions age out of the bounded caches.
+VERSIONS_KEPT = 8
+
+@track_cache(st.cache_resource(max_entries=VERSIONS_KEPT))
+def load_data(station=DEFAULT_STATION, version=None):
+    return load_station(station)
+
+# Per process and station: the newest frame and the rollups/AQI derived from
+# it. A new version of the same source refreshes them from its first new row
+# instead of rebuilding over all history.
+@st.cache_resource
+def latest_derived():
+    return {}
+
+def changed_since(station, previous, version, df):
+    """First timestamp from which ``df`` may differ from ``previous``'s frame, or None to rebuild."""
+    if station != DEFAULT_STATION or previous is None or previous[0][:2] != version[:2] or df.empty:
+        return None  # another station, or the source file itself changed
+    old = previous[1][DATETIME_COL].to_numpy()
+    new = df[DATETIME_COL].to_numpy()
+    shared = min(len(old), len(new))
+    differ = np.flatnonzero(old[:shared] != new[:shared])
+    if len(differ):
+        return pd.Timestamp(min(old[differ[0]], new[differ[0]]))
+    return pd.Timestamp(new[shared] if len(new) > shared else new[-1])
+
+def derived(kind, station, version, df, build, refresh):
+    latest = latest_derived()
+    previous = latest.get((kind, station))
+    since = changed_since(station, previous, version, df)
+    result = build(df) if since is None else refresh(previous[2], df, since)
+    latest[(kind, station)] = (version, df, result)
+    return result
+
+def refresh_rollups(rollups, df, since):
+    rollups = copy.copy(rollups)  # sessions still on the previous version keep theirs
+    rollups.refresh(df, since)
+    return rollups
+
+@st.cache_resource(max_entries=VERSIONS_KEPT)
+def load_rollups(station=DEFAULT_STATION, version=None):
+    df = load_data(station, version)
+    store = load_mapped()
+    if store is not None and df is store.frame:
+        return store.rollups  # prebuilt buckets, memory-mapped with the data
+    return derived('rollups', station, version, df, RollupIndex, refresh_rollups)
+
+@track_cache(st.cache_resource(max_entries=VERSIONS_KEPT))
+def load_aqi(station=DEFAULT_STATION, version=None):
+    return derived('aqi', station, version, load_data(station, version), aqi.aqi_frame, aqi.refresh_aqi_frame)
+
+@track_cache(st.cache_data(max_entries=VERSIONS_KEPT * 16))
+def trend_points(column, time_range, station=DEFAULT_STATION, version=None, width=DEFAULT_WIDTH):
+    window = window_slice(load_data(station, version), load_rollups(station, version), time_range)
+    return downsample_series(window[column], width)
 
 # Header
 st.markdown("""
@@ -57,7 +104,7 @@ st.sidebar.markdown("### ⚙️ Controls")
 
 station = st.sidebar.selectbox(
     "Monitoring Station",
-    ["Downtown", "Suburb", "Industrial Zone"]
+    list_stations()
 )
 
 time_range = st.sidebar.selectbox(
@@ -72,7 +119,7 @@ pollutant = st.sidebar.selectbox(
 
 forecast_horizon = st.sidebar.selectbox(
     "Forecast Horizon",
-    ["1 Hour", "6 Hours", "12 Hours", "24 Hours", "48 Hours"]
+    list(HORIZONS.keys())
 )
 
 # Update button
@@ -81,31 +128,34 @@ update_btn = st.sidebar.button("🔄 Update Dashboard", use_container_width=True
 # Admin toggle
 st.sidebar.markdown("---")
 admin_mode = st.sidebar.toggle("Admin Mode")
+show_timings = admin_mode and st.sidebar.checkbox("Show timing overlay")
+
+version = station_version(station)
+df = load_data(station, version)
+rollups = load_rollups(station, version)
+mapping = pollutant_mapping(station)
 
 # Get time range data
+@timed()
 def get_time_filtered_data(df, time_range):
-    if time_range == "Last 24 Hours":
-        start = df['Datetime'].max() - timedelta(hours=24)
-    elif time_range == "Last 7 Days":
-        start = df['Datetime'].max() - timedelta(days=7)
-    elif time_range == "Last 30 Days":
-        start = df['Datetime'].max() - timedelta(days=30)
-    else:  # All Data
-        start = df['Datetime'].min()
-    
-    return df[df['Datetime'] >= start]
+    return window_slice(df, rollups, time_range)
 
 # Filter data
 filtered_df = get_time_filtered_data(df, time_range)
-col_name = POLLUTANT_MAPPING[pollutant]
+col_name = mapping[pollutant]
+if col_name not in df.columns:
+    st.warning(f"{pollutant} is not measured at {station}.")
+    finish_rerun('stopped')
+    st.stop()
 pollutant_values = filtered_df[col_name].dropna()
+day_stats = rollups.window_stats("Last 24 Hours", [col_name]).loc[col_name]
 
-# Get current AQI
-if len(pollutant_values) > 0:
-    current_value = pollutant_values.iloc[-1]
-    aqi_info = calculate_aqi(current_value)
-else:
-    aqi_info = {'aqi': 0, 'status': 'No Data', 'color': '#999999'}
+# Get current AQI: the pollutant's sub-index, or the overall AQI for sensor-only columns
+with span('aqi'):
+    aqi_window = window_slice(load_aqi(station, version), rollups, time_range)
+    aqi_col = col_name if col_name in aqi_window.columns else 'AQI'
+    aqi_values = aqi_window[aqi_col].dropna()
+    aqi_info = aqi.describe(aqi_values.iloc[-1] if len(aqi_values) > 0 else None)
 
 # Main Dashboard Grid
 col1, col2, col3 = st.columns(3)
@@ -116,29 +166,9 @@ with col1:
     st.markdown(f"**Station:** {station}")
     
     # AQI Gauge using plotly
-    fig_gauge = go.Figure(go.Indicator(
-        mode="gauge+number+delta",
-        value=aqi_info['aqi'],
-        title={'text': pollutant},
-        domain={'x': [0, 1], 'y': [0, 1]},
-        gauge={
-            'axis': {'range': [0, 200]},
-            'bar': {'color': aqi_info['color']},
-            'steps': [
-                {'range': [0, 50], 'color': "rgba(76, 175, 80, 0.3)"},
-                {'range': [50, 100], 'color': "rgba(255, 193, 7, 0.3)"},
-                {'range': [100, 150], 'color': "rgba(255, 152, 0, 0.3)"},
-                {'range': [150, 200], 'color': "rgba(244, 67, 54, 0.3)"}
-            ],
-            'threshold': {
-                'line': {'color': "red", 'width': 4},
-                'thickness': 0.75,
-                'value': 150
-            }
-        }
-    ))
-    fig_gauge.update_layout(height=350, margin=dict(l=0, r=0, t=30, b=0))
-    st.plotly_chart(fig_gauge, use_container_width=True)
+    fig_gauge = aqi_gauge(aqi_info, pollutant if aqi_col == col_name else "Overall AQI")
+    with span('chart:aqi_gauge'):
+        st.plotly_chart(fig_gauge, use_container_width=True)
     
     st.markdown(f"**Status:** <span style='color: {aqi_info['color']}; font-weight: bold;'>{aqi_info['status']}</span>", unsafe_allow_html=True)
 
@@ -149,82 +179,43 @@ with col2:
     # Generate forecast data
     recent_values = pollutant_values.tail(12).values if len(pollutant_values) >= 12 else pollutant_values.values
     
-    # Forecast horizon mapping
-    horizon_map = {"1 Hour": 1, "6 Hours": 6, "12 Hours": 12, "24 Hours": 24, "48 Hours": 48}
-    h = horizon_map[forecast_horizon]
-    
-    # Generate forecast
-    last_val = recent_values[-1] if len(recent_values) > 0 else 50
-    forecast = np.array([last_val + (np.sin(i/5) * 10) + np.random.randn() * 3 for i in range(h)])
-    forecast = np.maximum(forecast, 0)
+    h = HORIZONS[forecast_horizon]
     
-    # Time labels
-    time_actual = list(range(len(recent_values)))
-    time_forecast = list(range(len(recent_values)-1, len(recent_values) + h - 1))
-    
-    fig_forecast = go.Figure()
-    
-    fig_forecast.add_trace(go.Scatter(
-        x=time_actual,
-        y=recent_values,
-        name='Historical',
-        mode='lines+markers',
-        line=dict(color='#667eea', width=2),
-        marker=dict(size=6)
-    ))
-    
-    fig_forecast.add_trace(go.Scatter(
-        x=time_forecast,
-        y=forecast,
-        name='Forecast',
-        mode='lines+markers',
-        line=dict(color='#ff6b35', width=2, dash='dash'),
-        marker=dict(size=6)
-    ))
+    # Forecast from the current trained model version (memoised per last timestamp)
+    with span('forecast'):
+        forecaster = load_forecaster()
+        forecast = forecast_values(forecaster, df, col_name, recent_values, h)
+    if len(forecast):
+        st.caption(f"Model: {forecaster.model_name(col_name)} ({forecaster.version})")
+    else:
+        st.info("No trained forecast model yet. Run `python forecasting.py` or retrain from Admin Mode.")
     
-    fig_forecast.update_layout(
-        height=350,
-        hovermode='x unified',
-        template='plotly_white',
-        margin=dict(l=0, r=0, t=30, b=0)
-    )
-    st.plotly_chart(fig_forecast, use_container_width=True)
+    fig_forecast = forecast_chart(recent_values, forecast)
+    with span('chart:forecast'):
+        st.plotly_chart(fig_forecast, use_container_width=True)
 
 # Column 3: Alert Notifications
 with col3:
     st.markdown("### 🚨 Alert Notifications")
     
-    alerts = []
-    
-    if aqi_info['aqi'] > 100:
-        alerts.append({
-            'type': 'warning',
-            'icon': '⚠️',
-            'title': 'Moderate air quality expected',
-            'time': 'Tomorrow, 10:00 AM'
-        })
-    
-    if aqi_info['aqi'] > 150:
-        alerts.append({
-            'type': 'danger',
-            'icon': '🔴',
-            'title': 'High pollution alert',
-            'time': 'Tomorrow, 2:00 PM'
-        })
+    alert_icons = {'warning': '⚠️', 'danger': '🔴', 'success': '✅', 'info': 'ℹ️'}
+    # Read from the event log; dashboards never evaluate alerts (see alerts.py).
+    alerts = [
+        {
+            'type': event['level'],
+            'icon': alert_icons[event['level']],
+            'title': f"{event['title']} (AQI {event['aqi']})",
+            'time': pd.Timestamp(event['time']).strftime('%d %b %Y, %I:%M %p')
+        }
+        for event in reversed(read_events(limit=4, station=station))
+    ]
     
-    if aqi_info['aqi'] < 50:
-        alerts.append({
-            'type': 'success',
-            'icon': '✅',
-            'title': 'Good air quality today',
-            'time': 'Today, 8:00 AM'
-        })
-    else:
+    if not alerts:
         alerts.append({
             'type': 'info',
             'icon': 'ℹ️',
-            'title': 'Model update completed',
-            'time': 'Yesterday, 11:30 PM'
+            'title': 'No alerts raised',
+            'time': f"Data up to {df['Datetime'].max():%d %b %Y, %I:%M %p}"
         })
     
     for alert in alerts:
@@ -246,34 +237,16 @@ with col1:
     st.markdown("### 📊 Pollutant Trends")
     
     # Get multiple pollutants for comparison
-    pollutants_to_plot = ["PM2.5", "NO2", "O3"]
-    
-    fig_trends = go.Figure()
-    
-    for pol in pollutants_to_plot:
-        col = POLLUTANT_MAPPING[pol]
+    trend_series = []
+    for pol in TREND_POLLUTANTS:
+        col = mapping[pol]
         if col in filtered_df.columns:
-            values = filtered_df[col].dropna()
-            x_range = list(range(len(values)))
-
-            
-            fig_trends.add_trace(go.Scatter(
-                x=x_range,
-                y=values,
-                name=pol,
-                mode='lines',
-                line=dict(width=2)
-            ))
+            x_range, values = trend_points(col, time_range, station, version)
+            trend_series.append((pol, x_range, values))
     
-    fig_trends.update_layout(
-        height=400,
-        hovermode='x unified',
-        template='plotly_white',
-        xaxis_title='Time',
-        yaxis_title='Concentration (μg/m³)',
-        margin=dict(l=0, r=0, t=30, b=0)
-    )
-    st.plotly_chart(fig_trends, use_container_width=True)
+    fig_trends = trends_chart(trend_series)
+    with span('chart:trends'):
+        st.plotly_chart(fig_trends, use_container_width=True)
 
 # Data statistics
 with col2:
@@ -291,26 +264,43 @@ with col2:
     with col_b:
         st.metric(
             "24h Average",
-            f"{pollutant_values.tail(24).mean():.1f}",
-            delta=f"({pollutant_values.tail(24).std():.1f} std)"
+            f"{day_stats['mean']:.1f}",
+            delta=f"({day_stats['std']:.1f} std)"
         )
     
     with col_c:
         st.metric(
             "Max (24h)",
-            f"{pollutant_values.tail(24).max():.1f}",
-            delta=f"Min: {pollutant_values.tail(24).min():.1f}"
+            f"{day_stats['max']:.1f}",
+            delta=f"Min: {day_stats['min']:.1f}"
         )
     
     # Data table
     st.markdown("### 📋 Recent Data")
-    display_df = filtered_df[[
-        'Datetime', 'C6H6(GT)', 'NO2(GT)', 'NOx(GT)', 'PT08.S5(O3)', 'T', 'RH'
-    ]].tail(10).copy()
-    display_df.columns = ['DateTime', 'PM2.5', 'NO2', 'NOx', 'O3', 'Temp', 'Humidity']
-    st.dataframe(display_df, use_container_width=True)
+    with span('table:recent'):
+        st.dataframe(recent_table(filtered_df, mapping), use_container_width=True)
+
+# Admin Interface (its modules are imported when it first renders)
+@st.cache_resource
+def load_retrain_runner():
+    from retraining import RetrainRunner
+    return RetrainRunner()
+
+@st.fragment(run_every="2s")
+def show_retrain_status(runner):
+    job = runner.status()
+    if job is None:
+        return
+    if job['status'] in ('queued', 'running'):
+        st.progress(job['progress'], text=f"Training models... {len(job['completed'])}/{len(job['targets'])} pollutants")
+    elif job['status'] == 'done':
+        st.success(f"Models retrained successfully! Now serving {job['version']}.")
+    else:
+        st.error(f"Retraining failed: {job['error']}")
+    if job['completed']:
+        metrics = pd.DataFrame(job['completed']).T[['model', 'r2', 'mae', 'rmse']]
+        st.dataframe(metrics, use_container_width=True)
 
-# Admin Interface
 if admin_mode:
     st.markdown("---")
     st.markdown('<div style="background: linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%); padding: 20px; border-radius: 10px; margin-bottom: 20px; box-shadow: 0 4px 8px rgba(0,0,0,0.1);">', unsafe_allow_html=True)
@@ -322,17 +312,73 @@ if admin_mode:
         st.markdown("**Upload New Data**")
         uploaded_file = st.file_uploader("Choose CSV file", type="csv")
         if uploaded_file is not None:
-            st.success("File uploaded successfully!")
-            st.write(pd.read_csv(uploaded_file).head())
+            # The uploader keeps its file across reruns; append each file once.
+            appended = st.session_state.setdefault('appended_uploads', {})
+            if uploaded_file.file_id not in appended:
+                from uploads import append_upload
+                previous = dataset_key()
+                try:
+                    stats = append_upload(pd.read_csv(uploaded_file))
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    rows = stats.pop('rows')
+                    appended[uploaded_file.file_id] = stats
+                    if stats['rows_appended']:
+                        # Add just these rows to the shared mapped file; every
+                        # process sees the new data version on its next rerun.
+                        extend_mapped(mask_flagged(rows), previous, partition_key(previous, [stats['partition']]))
+                        # The uploader evaluates the rows it stored.
+                        AlertEngine.load().process(load_data(DEFAULT_STATION, station_version(DEFAULT_STATION)))
+                        st.rerun()
+            stats = appended.get(uploaded_file.file_id)
+            if stats is not None:
+                st.success(
+                    f"File uploaded successfully! Appended {stats['rows_appended']} new rows "
+                    f"({stats['duplicates']} duplicate timestamps, {stats['invalid']} invalid rows skipped)."
+                )
     
     with col2:
         st.markdown("**Model Retraining**")
+        runner = load_retrain_runner()
         if st.button("🤖 Retrain Models"):
-            with st.spinner("Training models..."):
-                import time
-                time.sleep(2)
-            st.success("Models retrained successfully!")
+            runner.submit()
+        show_retrain_status(runner)
     st.markdown('</div>', unsafe_allow_html=True)
 
+# Rerun timings
+rerun = finish_rerun()
+if show_timings and rerun is not None:
+    with st.expander(f"⏱️ Rerun timings: {rerun.seconds * 1000:.0f} ms", expanded=True):
+        st.dataframe(span_table(rerun), use_container_width=True, hide_index=True)
+        st.dataframe(cache_table(rerun), use_container_width=True, hide_index=True)
+        if rerun.rss_end is not None:
+            st.caption(f"Memory: {rerun.rss_end / 2**20:.0f} MB resident "
+                       f"({(rerun.rss_end - rerun.rss_start) / 2**20:+.0f} MB this rerun)")
+
 # Footer
 st.markdown("---")
+
+# Live updates pushed by live.py: follow its feed and rerun when rows arrive.
+# live.py has extended the mapped file, so the rerun's new data version maps it;
+# without one, the caches above refresh from the new rows.
+@st.fragment(run_every="5s")
+def follow_live_feed():
+    from live import read_feed
+    feed = read_feed()
+    if feed is None:
+        return
+    seen = st.session_state.setdefault('live_seq', feed['seq'])
+    if feed['seq'] != seen:
+        st.session_state['live_seq'] = feed['seq']
+        st.rerun()
+
+follow_live_feed()
+
+# Warm-up: with the page sent, preload what other panels and sessions will need
+def preload_forecast_models():
+    forecaster = load_forecaster()
+    if forecaster is not None:
+        forecaster.load_all()
+
+warm_up('milestone4', preload_forecast_models, import_modules('retraining', 'uploads'))
@@ -0,0 +1,150 @@
+"""Shared, memoised aggregates of the Taiwan station dataset.
+
+The Bokeh pipeline used to compute every aggregate from scratch: a
+``dropna`` per plot (three times in one expression for the AQI scatter),
+a ``groupby('Date')``, a monthly ``resample``, a ``groupby('sitename')`` and
+a boolean mask per site for the trend lines. On the 2016-2024 data each of
+those is a full scan.
+
+``AggregateCache`` makes one groupby pass per row filter, collecting the
+sums and non-null counts of every numeric column per (site, day). Monthly,
+per-site and network-wide means are then reductions of that small table,
+so they are exact means over the underlying rows. Per-site rows are
+positional slices from the groupby's index rather than ``df[df[site] ==
+name]``. Results are memoised by (columns, grain, filters) and shared
+between callers, so treat them as read-only.
+"""
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+DATE_COL = 'Date'
+SITE_COL = 'sitename'
+
+# 'day' and 'month' means are indexed by date (months labelled by their last
+# day, like resample('ME')); 'site' means are indexed by site.
+GRAINS = ('day', 'month', 'site')
+
+
+def _key(columns):
+    return () if columns is None else tuple(columns)
+
+
+def _month_end(days):
+    return days.to_period('M').to_timestamp(how='end').normalize()
+
+
+class AggregateCache:
+    """Daily, monthly and per-site means of one station frame.
+
+    ``df`` needs a datetime ``date_col`` and a ``site_col``; it is sorted by
+    site and date once, and every other numeric column is aggregated.
+    """
+
+    def __init__(self, df, date_col=DATE_COL, site_col=SITE_COL):
+        self.date_col = date_col
+        self.site_col = site_col
+        self.df = df.sort_values([site_col, date_col], kind='stable').reset_index(drop=True)
+        self.numeric = [c for c in self.df.columns
+                        if c not in (date_col, site_col) and pd.api.types.is_numeric_dtype(self.df[c])]
+        self._positions = self.df.groupby(site_col, sort=True).indices
+        self._memo = {}
+
+    @property
+    def sites(self):
+        return list(self._positions)
+
+    def _memoised(self, key, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def clear(self):
+        self._memo.clear()
+
+    # ----------------------------
+    # 🔎 ROWS
+    # ----------------------------
+    def site_rows(self, site):
+        """Rows of one site, as a positional slice of the sorted frame."""
+        return self._memoised(('site_rows', site), lambda: self.df.iloc[self._positions[site]])
+
+    def rows(self, site=None, dropna=None):
+        """Rows of ``site`` (all sites when None) with no missing value in ``dropna``."""
+        def compute():
+            rows = self.df if site is None else self.site_rows(site)
+            return rows.dropna(subset=list(dropna)) if dropna else rows
+        return self._memoised(('rows', site, _key(dropna)), compute)
+
+    # ----------------------------
+    # 🧮 AGGREGATES
+    # ----------------------------
+    def _daily(self, dropna=None):
+        """Per-(site, day) sums and non-null counts of every numeric column: the one groupby pass."""
+        def compute():
+            rows = self.rows(dropna=dropna)
+            day = rows[self.date_col].dt.floor('D').rename(self.date_col)
+            grouped = rows.groupby([rows[self.site_col], day], sort=True)[self.numeric]
+            return grouped.sum(), grouped.count()
+        return self._memoised(('daily', _key(dropna)), compute)
+
+    def _totals(self, grain, dropna=None):
+        """Sums and counts at ``grain``, per site, reduced from the daily table."""
+        if grain == 'day':
+            return self._daily(dropna)
+
+        def compute():
+            sums, counts = self._daily(dropna)
+            if grain == 'site':
+                keys = [sums.index.get_level_values(0)]
+            elif grain == 'month':
+                days = sums.index.get_level_values(1)
+                keys = [sums.index.get_level_values(0), _month_end(days).rename(self.date_col)]
+            else:
+                raise ValueError(f"Unknown grain {grain!r}; expected one of {GRAINS}")
+            return sums.groupby(keys, sort=True).sum(), counts.groupby(keys, sort=True).sum()
+        return self._memoised(('totals', grain, _key(dropna)), compute)
+
+    def mean(self, columns, grain, site=None, dropna=None):
+        """Means of ``columns`` per ``grain`` bucket as a frame with the bucket as first column.
+
+        For 'day' and 'month', ``site`` picks one site; None pools all sites
+        (row-weighted, as a groupby over the whole frame would). For 'site'
+        one row per site is returned and ``site`` must be None. Rows with a
+        missing value in any ``dropna`` column are left out first; otherwise
+        each column skips only its own missing values.
+        """
+        columns = list(columns)
+        if grain == 'site' and site is not None:
+            raise ValueError("site means cannot be restricted to one site")
+
+        def compute():
+            sums, counts = self._totals(grain, dropna)
+            sums, counts = sums[columns], counts[columns]
+            if grain == 'site':
+                label = self.site_col
+            elif site is None:
+                sums, counts = sums.groupby(level=1).sum(), counts.groupby(level=1).sum()
+                label = self.date_col
+            elif site in sums.index.get_level_values(0):
+                sums, counts = sums.loc[site], counts.loc[site]
+                label = self.date_col
+            else:
+                return pd.DataFrame(columns=[self.date_col] + columns)
+            means = sums / counts.where(counts > 0)
+            return means.rename_axis(label).reset_index()
+        return self._memoised(('mean', _key(columns), grain, site, _key(dropna)), compute)
+
+    def histogram(self, column, bins, site=None):
+        """``(counts, edges)`` of ``column``; pass shared ``edges`` as ``bins`` to compare sites."""
+        def compute():
+            values = self.rows(site, dropna=[column])[column]
+            return np.histogram(values, bins=bins)
+        return self._memoised(('histogram', column, _key(np.atleast_1d(bins)), site), compute)
+
+    def corr(self, columns, site=None):
+        return self._memoised(('corr', _key(columns), site),
+                              lambda: self.rows(site)[list(columns)].corr())
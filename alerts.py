@@ -0,0 +1,333 @@
+"""Incremental threshold alerts over incoming readings.
+
+``AlertEngine`` keeps, per station and rated column, a trailing-window mean
+(the same EPA averaging windows as ``aqi.py``) and the state of every
+``AlertRule``. Each new reading is an O(1) update: push it into the window,
+rate the average, and compare against the rules. A rule raises once the
+sub-index reaches ``raise_at`` and clears only after it falls below
+``clear_below`` (hysteresis); after raising it is not raised again within
+``cooldown``, so a level bouncing around the threshold alerts once.
+
+Events are pushed to every subscriber queue and appended to a JSON-lines log
+that other apps (e.g. the Milestone 3 alert page) read with
+``read_events``. The log is moved to ``<log>.1`` once it passes
+``LOG_MAX_BYTES``, and ``read_events`` reads it backwards from the end, so a
+dashboard rerun parses only the latest events however long the log has
+been kept. Engine state is saved after each batch, so a restarted
+process only processes readings it has not seen and never re-emits alerts.
+
+Only processes that store readings evaluate them. The live service does so
+for its batches and for rows stored by others, an admin upload for the rows
+it appended, and ``python alerts.py`` for stored history. Dashboards just
+read the log. ``process`` holds an exclusive lock on ``<state>.lock`` and
+first reloads state another process saved, so two evaluators never emit
+the same event or overwrite each other's state.
+
+Usage:
+    python alerts.py                      # evaluate the stored data of every station
+"""
+
+import argparse
+import json
+import os
+import pickle
+import queue
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import aqi
+from data_loader import CACHE_DIR, CLEANED_CSV, DATETIME_COL, DEFAULT_STATION, file_lock, load_cleaned_data
+from stations import STATION_DIR, list_stations, load_station
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+EVENT_LOG = os.path.join(CACHE_DIR, "alerts.jsonl")
+STATE_FILE = os.path.join(CACHE_DIR, "alerts.state.pkl")
+
+RECENT_EVENTS = 200
+LOG_MAX_BYTES = 8 << 20     # the log is rotated to <log>.1 beyond this
+TAIL_BLOCK = 1 << 16        # bytes read per step when reading the log backwards
+
+
+@dataclass(frozen=True)
+class AlertRule:
+    name: str
+    title: str
+    level: str              # 'warning' or 'danger', matching the dashboard's alert styles
+    raise_at: float
+    clear_below: float
+    cooldown: pd.Timedelta = pd.Timedelta(hours=3)
+
+
+DEFAULT_RULES = (
+    AlertRule('sensitive', 'Unhealthy for sensitive groups', 'warning', raise_at=101, clear_below=91),
+    AlertRule('high', 'High pollution alert', 'danger', raise_at=151, clear_below=141),
+)
+
+
+class _TrailingMean:
+    """Mean of the readings in ``(t - window, t]`` with amortised O(1) updates."""
+
+    def __init__(self, window, min_count):
+        self.window = pd.Timedelta(window).value
+        self.min_count = min_count
+        self.items = deque()
+        self.total = 0.0
+
+    def push(self, stamp, value):
+        if not np.isnan(value):
+            self.items.append((stamp, value))
+            self.total += value
+        while self.items and self.items[0][0] <= stamp - self.window:
+            self.total -= self.items.popleft()[1]
+        if len(self.items) < self.min_count:
+            return np.nan
+        return self.total / len(self.items)
+
+
+def _signature(stat):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _window_tracker(pollutant):
+    window = aqi.POLLUTANTS[pollutant]['window']
+    hours = pd.Timedelta(window) / pd.Timedelta(hours=1)
+    return _TrailingMean(window, max(1, int(np.ceil(hours * aqi.MIN_COVERAGE))))
+
+
+class AlertEngine:
+    """Rolling per-station/per-column alert state with subscriber queues."""
+
+    def __init__(self, rules=DEFAULT_RULES, log_path=EVENT_LOG, state_path=STATE_FILE):
+        self.rules = tuple(rules)
+        self.log_path = log_path
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._windows = {}      # (station, column) -> _TrailingMean
+        self._rule_state = {}   # (station, column, rule) -> {'active': bool, 'last_raised': int}
+        self._last_seen = {}    # station -> last processed timestamp (ns)
+        self._saved = None      # signature of the state file as last read or written
+        self.recent = deque(maxlen=RECENT_EVENTS)
+
+    # ----------------------------
+    # 💾 PERSISTENCE
+    # ----------------------------
+    @classmethod
+    def load(cls, rules=DEFAULT_RULES, log_path=EVENT_LOG, state_path=STATE_FILE):
+        """Engine restored from ``state_path`` when it exists, with recent events from the log."""
+        engine = cls(rules, log_path, state_path)
+        engine._read_state()
+        return engine
+
+    def _read_state(self):
+        try:
+            with open(self.state_path, 'rb') as f:
+                saved = _signature(os.fstat(f.fileno()))
+                state = pickle.load(f)
+            self._windows = state['windows']
+            self._rule_state = state['rule_state']
+            self._last_seen = state['last_seen']
+            self._saved = saved
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            pass
+        self.recent.clear()
+        self.recent.extend(read_events(self.log_path, RECENT_EVENTS))
+
+    def _sync_state(self):
+        """Reload the state if another process saved it since this one last read or wrote it."""
+        try:
+            current = _signature(os.stat(self.state_path))
+        except FileNotFoundError:
+            return
+        if current != self._saved:
+            self._read_state()
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump({'windows': self._windows, 'rule_state': self._rule_state,
+                         'last_seen': self._last_seen}, f)
+            f.flush()
+            saved = _signature(os.fstat(f.fileno()))
+        os.replace(tmp, self.state_path)
+        self._saved = saved
+
+    # ----------------------------
+    # 📣 SUBSCRIPTIONS
+    # ----------------------------
+    def subscribe(self):
+        """A queue receiving every event emitted from now on."""
+        q = queue.Queue()
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def _emit(self, events):
+        if not events:
+            return
+        os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+        # Callers hold the state lock, so only one process rotates.
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) >= LOG_MAX_BYTES:
+            os.replace(self.log_path, self.log_path + ".1")
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+        self.recent.extend(events)
+        for q in self._subscribers:
+            for event in events:
+                q.put(event)
+
+    # ----------------------------
+    # ⚡ EVALUATION
+    # ----------------------------
+    def _evaluate(self, station, column, stamp, value):
+        key = (station, column)
+        pollutant, factor = aqi.COLUMN_SOURCES[column]
+        tracker = self._windows.get(key)
+        if tracker is None:
+            tracker = self._windows[key] = _window_tracker(pollutant)
+        mean = tracker.push(stamp, float(value))
+        if np.isnan(mean):
+            return []
+        index = float(aqi.concentration_to_aqi([mean * factor], pollutant)[0])
+
+        events = []
+        for rule in self.rules:
+            state = self._rule_state.setdefault(key + (rule.name,), {'active': False, 'last_raised': None})
+            if not state['active'] and index >= rule.raise_at:
+                cooling = state['last_raised'] is not None and \
+                    stamp - state['last_raised'] < rule.cooldown.value
+                if not cooling:
+                    state['active'] = True
+                    state['last_raised'] = stamp
+                    events.append(self._event(station, column, rule, 'raised', rule.level,
+                                              f"{rule.title} ({column})", index, stamp))
+            elif state['active'] and index < rule.clear_below:
+                state['active'] = False
+                events.append(self._event(station, column, rule, 'cleared', 'success',
+                                          f"{column} back below {rule.title.lower()} level", index, stamp))
+        return events
+
+    @staticmethod
+    def _event(station, column, rule, kind, level, title, index, stamp):
+        return {
+            'station': station,
+            'column': column,
+            'rule': rule.name,
+            'kind': kind,
+            'level': level,
+            'title': title,
+            'aqi': int(round(index)),
+            'time': pd.Timestamp(stamp).isoformat(),
+        }
+
+    def process(self, df, station=DEFAULT_STATION):
+        """Evaluate the rows of ``df`` newer than anything seen for ``station``.
+
+        ``df`` must be sorted by ``Datetime``. Returns the emitted events.
+        """
+        columns = [col for col in df.columns if col in aqi.COLUMN_SOURCES]
+        with self._lock, file_lock(self.state_path + ".lock"):
+            self._sync_state()
+            last = self._last_seen.get(station)
+            if df.empty or (last is not None and pd.Timestamp(df[DATETIME_COL].iloc[-1]).value <= last):
+                return []
+            stamps = pd.DatetimeIndex(df[DATETIME_COL]).as_unit('ns').asi8
+            start = 0 if last is None else int(np.searchsorted(stamps, last, 'right'))
+            if start >= len(stamps):
+                return []
+            values = df[columns].to_numpy(dtype=np.float64)[start:]
+            events = []
+            for stamp, row in zip(stamps[start:], values):
+                for column, value in zip(columns, row):
+                    events.extend(self._evaluate(station, column, int(stamp), value))
+            self._last_seen[station] = int(stamps[-1])
+            self._emit(events)
+            self._save_state()
+        return events
+
+    def active(self, station=DEFAULT_STATION):
+        """``(column, rule)`` pairs currently raised at ``station``."""
+        with self._lock:
+            return [(column, rule) for (stn, column, rule), state in self._rule_state.items()
+                    if stn == station and state['active']]
+
+    def events(self, station=DEFAULT_STATION, limit=10):
+        """Most recent events for ``station``, newest first."""
+        return [e for e in reversed(self.recent) if e['station'] == station][:limit]
+
+
+def _lines_backwards(path, block=TAIL_BLOCK):
+    """Complete lines of ``path``, last first, read in blocks from the end."""
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        pending = b''
+        trailing = True     # the text after the last newline: empty, or a line still being written
+        while end > 0:
+            start = max(0, end - block)
+            f.seek(start)
+            lines = (f.read(end - start) + pending).split(b'\n')
+            end = start
+            pending = lines.pop(0)
+            if trailing and lines:
+                lines.pop()
+                trailing = False
+            yield from reversed(lines)
+        if pending and not trailing:
+            yield pending
+
+
+def read_events(path=EVENT_LOG, limit=RECENT_EVENTS, station=None):
+    """Last ``limit`` events from the JSON-lines log and its rotated file, oldest first.
+
+    Lines are read from the end until ``limit`` events of ``station`` (any
+    station when None) are found; lines of other stations are skipped
+    without being parsed.
+    """
+    marker = None if station is None else f'"station": {json.dumps(station)}'.encode('utf-8')
+    events = []
+    for log in (path, path + ".1"):
+        for line in _lines_backwards(log):
+            if len(events) >= limit:
+                break
+            if not line.strip() or (marker is not None and marker not in line):
+                continue
+            event = json.loads(line)
+            if station is None or event['station'] == station:
+                events.append(event)
+    return events[::-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the alert rules over the stored readings.")
+    parser.add_argument("--source", default=CLEANED_CSV)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--stations", default=STATION_DIR, help="station store (see stations.py)")
+    args = parser.parse_args()
+
+    engine = AlertEngine.load()
+    events = engine.process(load_cleaned_data(args.source, args.cache_dir))
+    for station in list_stations(args.stations):
+        if station != DEFAULT_STATION:
+            events += engine.process(load_station(station, root=args.stations), station)
+    print(f"{len(events)} new events; {len(engine.active())} alerts active at {DEFAULT_STATION}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Vectorized AQI computation over whole frames.
+
+Concentrations are averaged over each pollutant's EPA window (24 h for PM,
+8 h for CO and O3, 1 h for NO2 and SO2) with time-based rolling means,
+truncated to the table precision and mapped to sub-indices by a single
+``np.searchsorted`` over that pollutant's breakpoint table. The overall AQI
+of a row is the maximum of its sub-indices, as in the EPA method.
+
+``COLUMN_SOURCES`` maps dataset columns to a breakpoint table and a unit
+conversion. The UCI columns report CO in mg/m³ and NO2 in µg/m³, so they are
+converted to ppm/ppb; NOx(GT) is rated against the NO2 table, and C6H6(GT)
+stands in for PM2.5 as it does in the Milestone 4 dashboard. The PT08.S*
+columns are raw sensor responses with no concentration unit and get no AQI.
+The lower-case columns of the Taiwan dataset are rated directly.
+
+A row's AQI only depends on the readings of the ``MAX_WINDOW`` before it, so
+``refresh_aqi_frame`` brings a frame up to date after rows were appended by
+recomputing from the first new row, with that much history as context.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATETIME_COL
+
+# ----------------------------
+# 📋 BREAKPOINT TABLES
+# ----------------------------
+# Rows of (C_lo, C_hi); the matching index ranges are AQI_RANGES.
+AQI_RANGES = np.array([
+    (0, 50), (51, 100), (101, 150), (151, 200), (201, 300), (301, 500),
+], dtype=np.float64)
+
+POLLUTANTS = {
+    'pm25': {'window': '24h', 'unit': 'µg/m³', 'decimals': 1, 'breakpoints': [
+        (0.0, 9.0), (9.1, 35.4), (35.5, 55.4), (55.5, 125.4), (125.5, 225.4), (225.5, 325.4)]},
+    'pm10': {'window': '24h', 'unit': 'µg/m³', 'decimals': 0, 'breakpoints': [
+        (0, 54), (55, 154), (155, 254), (255, 354), (355, 424), (425, 604)]},
+    'o3_8h': {'window': '8h', 'unit': 'ppm', 'decimals': 3, 'breakpoints': [
+        (0.000, 0.054), (0.055, 0.070), (0.071, 0.085), (0.086, 0.105), (0.106, 0.200)]},
+    'co_8h': {'window': '8h', 'unit': 'ppm', 'decimals': 1, 'breakpoints': [
+        (0.0, 4.4), (4.5, 9.4), (9.5, 12.4), (12.5, 15.4), (15.5, 30.4), (30.5, 50.4)]},
+    'no2_1h': {'window': '1h', 'unit': 'ppb', 'decimals': 0, 'breakpoints': [
+        (0, 53), (54, 100), (101, 360), (361, 649), (650, 1249), (1250, 2049)]},
+    'so2_1h': {'window': '1h', 'unit': 'ppb', 'decimals': 0, 'breakpoints': [
+        (0, 35), (36, 75), (76, 185), (186, 304), (305, 604), (605, 1004)]},
+}
+
+# Dataset column -> (pollutant, factor converting the column's unit to the table's).
+COLUMN_SOURCES = {
+    'C6H6(GT)': ('pm25', 1.0),
+    'CO(GT)': ('co_8h', 1 / 1.145),     # mg/m³ -> ppm at 25 °C
+    'NO2(GT)': ('no2_1h', 1 / 1.88),    # µg/m³ -> ppb at 25 °C
+    'NOx(GT)': ('no2_1h', 1.0),         # already ppb
+    'pm2.5': ('pm25', 1.0),
+    'pm10': ('pm10', 1.0),
+    'o3': ('o3_8h', 1e-3),              # ppb -> ppm
+    'co': ('co_8h', 1.0),
+    'no2': ('no2_1h', 1.0),
+    'so2': ('so2_1h', 1.0),
+}
+
+# Share of a window's hourly readings required for a valid average.
+MIN_COVERAGE = 0.75
+
+# Longest averaging window: how far back the readings behind one AQI row go.
+MAX_WINDOW = max(pd.Timedelta(spec['window']) for spec in POLLUTANTS.values())
+
+# ----------------------------
+# 🎨 CATEGORIES
+# ----------------------------
+CATEGORIES = [
+    {'status': 'Good', 'color': '#4CAF50'},
+    {'status': 'Moderate', 'color': '#FFC107'},
+    {'status': 'Unhealthy for Sensitive', 'color': '#FF9800'},
+    {'status': 'Unhealthy', 'color': '#F44336'},
+    {'status': 'Very Unhealthy', 'color': '#9C27B0'},
+    {'status': 'Hazardous', 'color': '#7E0023'},
+]
+NO_DATA = {'status': 'No Data', 'color': '#999999'}
+
+# Upper AQI bound of each category, for searchsorted.
+_CATEGORY_TOPS = AQI_RANGES[:, 1]
+
+_TABLES = {name: np.asarray(spec['breakpoints'], dtype=np.float64) for name, spec in POLLUTANTS.items()}
+
+
+def concentration_to_aqi(conc, pollutant):
+    """AQI sub-index for an array of concentrations in the table's unit.
+
+    NaN and negative concentrations give NaN; values above the table are
+    capped at 500.
+    """
+    table = _TABLES[pollutant]
+    ranges = AQI_RANGES[:len(table)]
+    scale = 10.0 ** POLLUTANTS[pollutant]['decimals']
+    conc = np.asarray(conc, dtype=np.float64)
+    conc = np.floor(conc * scale + 1e-9) / scale
+
+    row = np.searchsorted(table[:, 1], conc, side='left')
+    beyond = row >= len(table)
+    row = np.minimum(row, len(table) - 1)
+    c_lo, c_hi = table[row, 0], table[row, 1]
+    i_lo, i_hi = ranges[row, 0], ranges[row, 1]
+    with np.errstate(invalid='ignore'):
+        aqi = np.rint((i_hi - i_lo) / (c_hi - c_lo) * (conc - c_lo) + i_lo)
+    aqi[beyond] = 500.0
+    aqi[~(conc >= 0)] = np.nan
+    return aqi
+
+
+def category_codes(aqi):
+    """Index into ``CATEGORIES`` for each AQI value, -1 where it is NaN."""
+    aqi = np.asarray(aqi, dtype=np.float64)
+    codes = np.searchsorted(_CATEGORY_TOPS, aqi, side='left').clip(max=len(CATEGORIES) - 1)
+    codes = codes.astype(np.int8)
+    codes[np.isnan(aqi)] = -1
+    return codes
+
+
+def window_average(df, column, window):
+    """Time-based trailing mean of ``column`` with ``MIN_COVERAGE`` of the window present."""
+    series = df.set_index(DATETIME_COL)[column].astype(np.float64)
+    hours = pd.Timedelta(window) / pd.Timedelta(hours=1)
+    if hours <= 1:
+        return series.to_numpy()
+    min_periods = max(1, int(np.ceil(hours * MIN_COVERAGE)))
+    return series.rolling(window, min_periods=min_periods).mean().to_numpy()
+
+
+def aqi_frame(df, columns=None):
+    """Sub-index per rated column plus the overall ``AQI`` and its ``Category`` code.
+
+    ``df`` must be sorted by ``Datetime``. Columns without a breakpoint
+    table are skipped.
+    """
+    if columns is None:
+        columns = [col for col in df.columns if col in COLUMN_SOURCES]
+    out = {DATETIME_COL: df[DATETIME_COL].to_numpy()}
+    for column in columns:
+        pollutant, factor = COLUMN_SOURCES[column]
+        averaged = window_average(df, column, POLLUTANTS[pollutant]['window'])
+        out[column] = concentration_to_aqi(averaged * factor, pollutant).astype(np.float32)
+    result = pd.DataFrame(out, index=df.index)
+    sub = result[list(columns)].to_numpy(dtype=np.float64)
+    overall = np.full(len(result), np.nan)
+    has_value = ~np.isnan(sub).all(axis=1) if len(columns) else np.zeros(len(result), dtype=bool)
+    overall[has_value] = np.nanmax(sub[has_value], axis=1)
+    result['AQI'] = overall.astype(np.float32)
+    result['Category'] = category_codes(overall)
+    return result
+
+
+def refresh_aqi_frame(result, df, since):
+    """``aqi_frame(df)`` from ``result``, the one of an earlier version of ``df``.
+
+    Rows of ``df`` before ``since`` must be those ``result`` was computed
+    from; only the rows from ``since`` on are recomputed.
+    """
+    stamps = pd.DatetimeIndex(df[DATETIME_COL])
+    row = int(stamps.searchsorted(pd.Timestamp(since), 'left'))
+    start = int(stamps.searchsorted(pd.Timestamp(since) - MAX_WINDOW, 'left'))
+    columns = [col for col in result.columns if col in COLUMN_SOURCES]
+    fresh = aqi_frame(df.iloc[start:], columns).iloc[row - start:]
+    refreshed = pd.concat([result.iloc[:row], fresh])
+    refreshed.index = df.index
+    return refreshed
+
+
+def describe(aqi):
+    """Display info for one AQI value: rounded value, status and colour."""
+    if aqi is None or np.isnan(aqi):
+        return {'aqi': 0, **NO_DATA}
+    return {'aqi': int(round(float(aqi))), **CATEGORIES[int(category_codes([aqi])[0])]}
@@ -0,0 +1,276 @@
+"""Walk-forward (rolling-origin) backtests of the forecast models.
+
+The notebooks score models on a single split: a random ``df.sample`` in
+Milestone 1, one 80/20 temporal split in Milestone 2. ``run_backtest``
+instead forecasts from many origins and reports, per pollutant and model,
+the error over each dashboard forecast horizon (1/6/12/24/48 h):
+
+    origins   every ``step`` hours once ``min_train`` hours are available,
+              keeping the latest ``max_origins`` that leave a full
+              ``MAX_HORIZON`` hours after them
+    folds     one task per (model, pollutant, block of ``refit_every``
+              origins): the model is fitted on every hour before the
+              block's first origin (expanding window), then forecasts from
+              each origin of the block using only the hours before it
+    horizons  MAE/RMSE/R² over the first ``h`` forecast hours, pooled over
+              origins, so they match what the dashboard shows for ``h``
+
+Every candidate in ``forecasting.CANDIDATES`` whose library is installed
+takes part (Linear, Features, XGBoost, RandomForest, ARIMA, Prophet, LSTM).
+
+The station's hourly frame and its feature matrix are computed once and
+written in the ``mapped.py`` layout; folds run in a spawn-based process pool
+and each worker maps that file read-only, so they share one page-cache copy
+instead of rebuilding features or unpickling a copy per task. The report,
+with the best model per pollutant and horizon, is written to
+``models/backtests/<station>.json``.
+
+Usage:
+    python backtest.py                                # the default station, every installed model
+    python backtest.py --station Banqiao --models Linear Features XGBoost --workers 8
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, replace
+
+import numpy as np
+import pandas as pd
+
+from dashboards import HORIZONS, SITE_POLLUTANT_MAPPING
+from data_loader import DATETIME_COL, DEFAULT_STATION
+from features import DEFAULT_SPEC, FeatureSpec, build_features, hourly_frame
+from forecasting import (CANDIDATES, DEFAULT_TARGETS, MAX_HORIZON, MODEL_DIR, FeatureModel,
+                         available_candidates, evaluate)
+from mapped import read_arrays, write_arrays
+from stations import load_station, station_slug
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+BACKTEST_DIR = os.path.join(MODEL_DIR, "backtests")
+
+MIN_TRAIN = 24 * 14     # hours of data before the first origin
+STEP = 24               # hours between origins
+MAX_ORIGINS = 60        # latest origins kept
+REFIT_EVERY = 7         # origins forecast per fit
+
+# The dashboard's "Forecast Horizon" options, in hours.
+HORIZON_HOURS = sorted(HORIZONS.values())
+
+# In-process memo of mapped fold inputs (one per worker and file).
+_SHARED = {}
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def station_targets(station, columns):
+    """The pollutant columns the dashboard forecasts for ``station``."""
+    targets = DEFAULT_TARGETS if station == DEFAULT_STATION else SITE_POLLUTANT_MAPPING.values()
+    return [c for c in targets if c in columns]
+
+
+def forecast_origins(hours, min_train=MIN_TRAIN, step=STEP, max_origins=MAX_ORIGINS):
+    """Positions of the forecast origins in an hourly series of length ``hours``."""
+    origins = np.arange(min_train, hours - MAX_HORIZON + 1, step)
+    return origins[-max_origins:] if max_origins else origins
+
+
+# ----------------------------
+# 📦 SHARED INPUTS
+# ----------------------------
+def write_inputs(df, out, spec=DEFAULT_SPEC):
+    """Hourly values and features of a station frame, in one file for the folds to map."""
+    columns = [c for c in df.columns if c != DATETIME_COL and pd.api.types.is_numeric_dtype(df[c])]
+    spec = replace(spec, columns=tuple(columns))
+    hourly = hourly_frame(df, columns)
+    arrays = {
+        'stamps': hourly.index.as_unit('ns').asi8,
+        'values': hourly.to_numpy(),
+        'features': build_features(hourly.to_numpy(), hourly.index, spec),
+    }
+    write_arrays(out, {'spec': asdict(spec)}, arrays)
+    return out
+
+
+def load_inputs(path):
+    """``(hourly, features, spec)`` from ``write_inputs``; arrays are read-only views."""
+    if path not in _SHARED:
+        meta, arrays = read_arrays(path)
+        spec = meta['spec']
+        spec = FeatureSpec(**dict(spec, columns=tuple(spec['columns']), lags=tuple(spec['lags']),
+                                  windows=tuple(spec['windows']), stats=tuple(spec['stats']),
+                                  cross_pairs=tuple(map(tuple, spec['cross_pairs']))))
+        index = pd.DatetimeIndex(arrays['stamps'].view('datetime64[ns]'), name=DATETIME_COL)
+        hourly = pd.DataFrame(arrays['values'], index=index, columns=list(spec.columns), copy=False)
+        _SHARED[path] = (hourly, arrays['features'], spec)
+    return _SHARED[path]
+
+
+# ----------------------------
+# 🧪 FOLDS
+# ----------------------------
+def run_fold(path, name, column, origins):
+    """Fit ``name`` before ``origins[0]`` and forecast ``MAX_HORIZON`` hours from each origin.
+
+    Returns the forecasts and actual values as ``(len(origins), MAX_HORIZON)``
+    arrays with fit and forecast seconds, or the error that stopped the fold.
+    """
+    hourly, features, spec = load_inputs(path)
+    fold = {'model': name, 'column': column, 'origins': list(origins)}
+    model = FeatureModel(spec) if CANDIDATES[name][0] is FeatureModel else CANDIDATES[name][0]()
+    train = hourly.iloc[:origins[0]]
+    try:
+        started = time.perf_counter()
+        if isinstance(model, FeatureModel):
+            model.fit(train[column].dropna(), train, features[:origins[0]])
+        else:
+            model.fit(train[column].dropna(), train)
+        fold['fit_s'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        forecasts = np.empty((len(origins), MAX_HORIZON))
+        for i, origin in enumerate(origins):
+            recent = hourly.iloc[max(0, origin - model.history):origin]
+            forecasts[i] = model.forecast(recent[column].dropna(), MAX_HORIZON, recent)
+        fold['forecast_s'] = time.perf_counter() - started
+    except Exception as exc:    # a failing model must not stop the backtest
+        fold['error'] = f"{type(exc).__name__}: {exc}"
+        return fold
+    values = hourly[column].to_numpy()
+    fold['forecasts'] = forecasts
+    fold['actual'] = np.stack([values[origin:origin + MAX_HORIZON] for origin in origins])
+    return fold
+
+
+def score_folds(folds, horizons=HORIZON_HOURS):
+    """Per (column, model, horizon) metrics pooled over every origin of the folds."""
+    pooled = {}
+    for fold in folds:
+        if 'error' not in fold:
+            pooled.setdefault((fold['column'], fold['model']), []).append(fold)
+    rows = []
+    for (column, model), parts in sorted(pooled.items()):
+        forecasts = np.concatenate([f['forecasts'] for f in parts])
+        actual = np.concatenate([f['actual'] for f in parts])
+        for horizon in horizons:
+            true, pred = actual[:, :horizon].ravel(), forecasts[:, :horizon].ravel()
+            keep = np.isfinite(true) & np.isfinite(pred)
+            if keep.any():
+                rows.append(dict(evaluate(true[keep], pred[keep]), column=column, model=model,
+                                 horizon=horizon, origins=len(actual)))
+    return pd.DataFrame(rows, columns=['column', 'model', 'horizon', 'origins', 'mae', 'rmse', 'r2'])
+
+
+def select_models(scores):
+    """``{column: {horizon: model}}`` with the lowest RMSE."""
+    best = scores.loc[scores.groupby(['column', 'horizon'])['rmse'].idxmin()]
+    selected = {}
+    for row in best.itertuples():
+        selected.setdefault(row.column, {})[str(row.horizon)] = row.model
+    return selected
+
+
+# ----------------------------
+# 🚀 BACKTEST
+# ----------------------------
+def run_backtest(station=DEFAULT_STATION, models=None, targets=None, max_workers=None,
+                 min_train=MIN_TRAIN, step=STEP, max_origins=MAX_ORIGINS, refit_every=REFIT_EVERY,
+                 progress=None):
+    """Backtest ``models`` (default: every installed candidate) on one station.
+
+    Returns the report written by ``save_report``; ``progress(done, total)``
+    is called as folds finish.
+    """
+    started = time.time()
+    models = models or available_candidates()
+    df = load_station(station)
+    with tempfile.TemporaryDirectory(prefix="backtest-") as tmp:
+        path = write_inputs(df, os.path.join(tmp, "inputs.airmap"))
+        hourly, _, _ = load_inputs(path)
+        targets = targets or station_targets(station, hourly.columns)
+        origins = forecast_origins(len(hourly), min_train, step, max_origins)
+        if not len(origins):
+            raise ValueError(f"Not enough hourly data to backtest {station!r}: {len(hourly)} hours")
+        origin_stamps = [hourly.index[i].isoformat() for i in origins]
+        blocks = [origins[i:i + refit_every].tolist() for i in range(0, len(origins), refit_every)]
+        tasks = [(name, column, block) for name in models for column in targets for block in blocks]
+
+        # spawn: forking a process that runs Streamlit's threads is unsafe.
+        context = multiprocessing.get_context('spawn')
+        folds = []
+        with ProcessPoolExecutor(max_workers, mp_context=context) as pool:
+            futures = [pool.submit(run_fold, path, *task) for task in tasks]
+            for future in as_completed(futures):
+                folds.append(future.result())
+                if progress is not None:
+                    progress(len(folds), len(futures))
+        del hourly
+        _SHARED.pop(path, None)
+
+    scores = score_folds(folds)
+    timing = {}
+    for fold in folds:
+        entry = timing.setdefault(fold['model'], {'fit_s': 0.0, 'forecast_s': 0.0, 'folds': 0})
+        entry['fit_s'] += fold.get('fit_s', 0.0)
+        entry['forecast_s'] += fold.get('forecast_s', 0.0)
+        entry['folds'] += 1
+    return {
+        'station': station,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'elapsed_s': time.time() - started,
+        'settings': {'min_train': min_train, 'step': step, 'max_origins': max_origins,
+                     'refit_every': refit_every, 'horizons': HORIZON_HOURS, 'models': list(models)},
+        'origins': origin_stamps,
+        'scores': scores.to_dict(orient='records'),
+        'selected': select_models(scores) if len(scores) else {},
+        'errors': sorted({f"{f['model']} / {f['column']}: {f['error']}" for f in folds if 'error' in f}),
+        'timing': timing,
+    }
+
+
+def save_report(report, out_dir=BACKTEST_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, station_slug(report['station']) + ".json")
+    _write_json(path, report)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the forecast models.")
+    parser.add_argument("--station", default=DEFAULT_STATION)
+    parser.add_argument("--models", nargs="+", choices=list(CANDIDATES),
+                        help="models to backtest (default: every installed one)")
+    parser.add_argument("--targets", nargs="+", help="pollutant columns (default: the dashboard's)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--min-train", type=int, default=MIN_TRAIN, help="hours before the first origin")
+    parser.add_argument("--step", type=int, default=STEP, help="hours between origins")
+    parser.add_argument("--max-origins", type=int, default=MAX_ORIGINS)
+    parser.add_argument("--refit-every", type=int, default=REFIT_EVERY, help="origins forecast per fit")
+    parser.add_argument("--out", default=BACKTEST_DIR)
+    args = parser.parse_args()
+
+    report = run_backtest(args.station, args.models, args.targets, args.workers, args.min_train,
+                          args.step, args.max_origins, args.refit_every,
+                          progress=lambda done, total: print(f"\r  {done}/{total} folds", end="", flush=True))
+    print()
+    path = save_report(report, args.out)
+    print(f"{report['station']}: {len(report['origins'])} origins in {report['elapsed_s']:.1f} s -> {path}")
+    for column, picks in report['selected'].items():
+        print(f"  {column}: " + ", ".join(f"{h}h {model}" for h, model in picks.items()))
+    for error in report['errors']:
+        print(f"  failed: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+"""Headless benchmarks of the dashboards' data paths and figure construction.
+
+Each case runs what a fresh Streamlit process does for one dashboard and one
+dataset, outside Streamlit, in its own spawned process so peak RSS is per
+case. Cases run ``REPEATS`` times and every metric is the median of the runs:
+
+    load       read the dataset (columnar cache, or the station's partitions)
+    index      build the per-process structures (rollups, correlations, AQI, alerts)
+
+then one rerun per time window:
+
+    filter     cut the window rows
+    aggregate  window stats, downsampled trend points, correlations, forecast
+    figures    build the Plotly figures and serialise them as Streamlit does
+
+Figure JSON size, the size of the dataset the sessions share and peak RSS
+are recorded too. Datasets are generated once
+under ``.cache/bench/`` from the cleaned file: its own 827 rows, then the
+readings tiled with a little noise onto a regular time grid up to 10M rows,
+optionally split over many stations.
+
+``--save-baseline`` stores the results; ``--check`` compares a run against
+them and exits with status 1 when any metric regresses beyond the tolerance.
+
+Usage:
+    python benchmarks.py --sizes 827 100000 1000000 10000000 --stations 1 100
+    python benchmarks.py --sizes 827 100000 --save-baseline
+    python benchmarks.py --sizes 827 100000 --check
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import aqi
+from alerts import AlertEngine, read_events
+from compact import ColumnRows, load_compact_data
+from correlation import CorrelationIndex
+from dashboards import (HORIZONS, POLLUTANT_MAPPING, SITE_POLLUTANT_MAPPING, TREND_POLLUTANTS,
+                        DISPLAY_NAMES, aqi_gauge, average_bar, correlation_heatmap, forecast_chart,
+                        forecast_values, pollutant_mapping, recent_table, trend_line, trends_chart)
+from data_loader import CACHE_DIR, DATETIME_COL, DEFAULT_STATION, SENSOR_COLUMNS, load_cleaned_data
+from downsample import downsample_frame, downsample_series
+from forecasting import load_forecaster
+from rollups import TIME_WINDOWS, RollupIndex, window_bounds, window_slice
+from stations import build_station_store, list_stations, load_station
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+BENCH_DIR = os.path.join(CACHE_DIR, "bench")
+BASELINE_FILE = "benchmarks.baseline.json"
+
+SIZES = (827, 100_000, 1_000_000, 10_000_000)
+STATION_COUNTS = (1,)
+APPS = ('milestone1', 'milestone4')
+
+# Bump when generated datasets change so old ones are rebuilt.
+DATASET_VERSION = 1
+
+# Hourly readings fit in datetime64[ns] up to ~2 million rows from 2004;
+# larger single-station datasets use minute readings.
+MAX_HOURLY_ROWS = 2_000_000
+NOISE_SCALE = 0.05
+
+# Sidebar defaults of the dashboards.
+MILESTONE1_POLLUTANTS = ['CO', 'NO2', 'Temperature_C']
+MILESTONE1_WINDOWS = ["Last 7 Days", "Last 30 Days", "All Data"]
+MILESTONE1_COLORS = ["#FFA500", "#FF6347", "#FFD700", "#FF4500"]
+MILESTONE4_POLLUTANT = "PM2.5"
+MILESTONE4_HORIZON = "24 Hours"
+
+# A metric regresses when it grows by more than the tolerance and by more
+# than the noise floor of its unit.
+TOLERANCE = 0.25
+NOISE_FLOORS = {'_s': 0.15, '_bytes': 1024, '_mb': 5.0}
+
+REPEATS = 3
+
+
+# ----------------------------
+# 🧪 SYNTHETIC DATASETS
+# ----------------------------
+def synthetic_frame(rows, seed=0, columns=None):
+    """``rows`` readings shaped like the cleaned dataset.
+
+    Up to the cleaned file's length this is the file itself; beyond it the
+    readings are tiled with ``NOISE_SCALE`` standard deviations of noise.
+    """
+    base = load_cleaned_data()
+    if rows <= len(base):
+        frame = base.head(rows).reset_index(drop=True)
+    else:
+        rng = np.random.default_rng(seed)
+        values = base[SENSOR_COLUMNS].to_numpy(dtype=np.float32)
+        noise = rng.standard_normal((rows, len(SENSOR_COLUMNS)), dtype=np.float32)
+        noise *= NOISE_SCALE * np.nanstd(values, axis=0)
+        noise += values[np.arange(rows) % len(values)]
+        freq = 'h' if rows <= MAX_HOURLY_ROWS else 'min'
+        frame = pd.DataFrame(noise, columns=SENSOR_COLUMNS)
+        frame.insert(0, DATETIME_COL, pd.date_range(base[DATETIME_COL].iloc[0], periods=rows, freq=freq))
+    if columns is not None:
+        frame = frame.rename(columns=columns)
+    return frame
+
+
+def dataset_name(rows, stations):
+    return f"{rows}x{stations}"
+
+
+def prepare_dataset(rows, stations, root=BENCH_DIR):
+    """Generate a dataset once and return its descriptor.
+
+    Single-station datasets are a cleaned CSV whose columnar cache is built
+    here, so cases time the cached load a restarted dashboard sees.
+    Multi-station datasets are a station store with ``rows`` readings split
+    evenly over the stations, using the site column names.
+    """
+    name = dataset_name(rows, stations)
+    path = os.path.join(root, name)
+    marker = os.path.join(path, "dataset.json")
+    info = {'name': name, 'rows': rows, 'stations': stations, 'version': DATASET_VERSION,
+            'csv': os.path.join(path, "cleaned.csv"), 'cache_dir': os.path.join(path, "cache"),
+            'store': os.path.join(path, "stations")}
+    try:
+        with open(marker, 'r', encoding='utf-8') as f:
+            if json.load(f) == info:
+                return info
+    except (OSError, ValueError):
+        pass
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    if stations == 1:
+        synthetic_frame(rows).to_csv(info['csv'], index=False)
+        load_cleaned_data(info['csv'], info['cache_dir'])
+    else:
+        site_columns = {POLLUTANT_MAPPING[pol]: SITE_POLLUTANT_MAPPING[pol] for pol in POLLUTANT_MAPPING}
+        per_station = max(1, rows // stations)
+        frames = []
+        for i in range(stations):
+            frame = synthetic_frame(per_station, seed=i, columns=site_columns)
+            frame['station'] = f"Station {i:03d}"
+            frames.append(frame)
+        build_station_store(pd.concat(frames, ignore_index=True), 'station', DATETIME_COL, info['store'])
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return info
+
+
+# ----------------------------
+# ⏱️ MEASUREMENT
+# ----------------------------
+class _Clock:
+    def __init__(self):
+        self.started = time.perf_counter()
+
+    def lap(self):
+        now = time.perf_counter()
+        elapsed, self.started = now - self.started, now
+        return elapsed
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, or None where unsupported.
+
+    On Linux this is ``VmHWM``, which starts afresh in a spawned process;
+    ``ru_maxrss`` there carries the parent's peak over into the child.
+    """
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / (1 << 10)    # kilobytes
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+
+def _serialise(figures):
+    return sum(len(fig.to_json()) for fig in figures)
+
+
+# ----------------------------
+# 🖥️ DASHBOARD CASES
+# ----------------------------
+def _milestone1(dataset):
+    result = {}
+    clock = _Clock()
+    data = load_compact_data(dataset['csv'], dataset['cache_dir']).rename(DISPLAY_NAMES)
+    result['load_s'] = clock.lap()
+    result['dataset_mb'] = data.nbytes / (1 << 20)
+
+    clock = _Clock()
+    rows = ColumnRows(data)
+    rollups = RollupIndex.from_rows(data.columns, data.stamps, rows)
+    correlations = CorrelationIndex.from_rows(data.columns, data.stamps, rows)
+    result['index_s'] = clock.lap()
+
+    reruns = {}
+    for time_range in MILESTONE1_WINDOWS:
+        clock = _Clock()
+        lo, hi = window_bounds(rollups, time_range)
+        filter_s = clock.lap()
+
+        window_stats = rollups.window_stats(time_range)
+        trends = {pol: downsample_frame(data.frame([pol], lo, hi), DATETIME_COL, [pol])
+                  for pol in MILESTONE1_POLLUTANTS}
+        comparison = downsample_frame(data.frame(MILESTONE1_POLLUTANTS, lo, hi), DATETIME_COL,
+                                      MILESTONE1_POLLUTANTS)
+        avg_data = window_stats.loc[MILESTONE1_POLLUTANTS, 'mean'].reset_index()
+        avg_data.columns = ['Pollutant', 'Average Value']
+        corr = correlations.window_corr(time_range, MILESTONE1_POLLUTANTS)
+        aggregate_s = clock.lap()
+
+        figures = [trend_line(points, pol, f"{pol} Trend Over Time", MILESTONE1_COLORS, "plotly_dark")
+                   for pol, points in trends.items()]
+        figures.append(trend_line(comparison, MILESTONE1_POLLUTANTS, "Comparison of Selected Pollutants",
+                                  MILESTONE1_COLORS, "plotly_dark"))
+        figures.append(average_bar(avg_data, MILESTONE1_COLORS, "plotly_dark"))
+        figures.append(correlation_heatmap(corr, 'Oranges', "plotly_dark"))
+        figure_bytes = _serialise(figures)
+        reruns[time_range] = {'filter_s': filter_s, 'aggregate_s': aggregate_s,
+                              'figures_s': clock.lap(), 'figure_bytes': figure_bytes}
+    result['reruns'] = reruns
+    return result
+
+
+def _milestone4(dataset, workdir):
+    result = {}
+    clock = _Clock()
+    if dataset['stations'] == 1:
+        station = DEFAULT_STATION
+        df = load_cleaned_data(dataset['csv'], dataset['cache_dir'])
+    else:
+        station = list_stations(dataset['store'])[1]
+        df = load_station(station, root=dataset['store'])
+    result['load_s'] = clock.lap()
+
+    # Alerts are evaluated by the writers; the dashboard only reads the log.
+    log_path = os.path.join(workdir, "alerts.jsonl")
+    AlertEngine(log_path=log_path, state_path=os.path.join(workdir, "alerts.state.pkl")).process(df, station)
+
+    clock = _Clock()
+    rollups = RollupIndex(df)
+    aqi_df = aqi.aqi_frame(df)
+    forecaster = load_forecaster()
+    result['index_s'] = clock.lap()
+    result['dataset_mb'] = (df.memory_usage(deep=True).sum() + aqi_df.memory_usage(deep=True).sum()) / (1 << 20)
+
+    mapping = pollutant_mapping(station)
+    col_name = mapping[MILESTONE4_POLLUTANT]
+    reruns = {}
+    for time_range in TIME_WINDOWS:
+        clock = _Clock()
+        filtered_df = window_slice(df, rollups, time_range)
+        aqi_window = window_slice(aqi_df, rollups, time_range)
+        filter_s = clock.lap()
+
+        pollutant_values = filtered_df[col_name].dropna()
+        rollups.window_stats("Last 24 Hours", [col_name])
+        aqi_col = col_name if col_name in aqi_window.columns else 'AQI'
+        aqi_values = aqi_window[aqi_col].dropna()
+        aqi_info = aqi.describe(aqi_values.iloc[-1] if len(aqi_values) > 0 else None)
+        recent_values = pollutant_values.tail(12).values
+        forecast = forecast_values(forecaster, df, col_name, recent_values, HORIZONS[MILESTONE4_HORIZON])
+        trend_series = [(pol,) + tuple(downsample_series(filtered_df[mapping[pol]]))
+                        for pol in TREND_POLLUTANTS if mapping[pol] in filtered_df.columns]
+        table = recent_table(filtered_df, mapping)
+        read_events(log_path, limit=4, station=station)
+        aggregate_s = clock.lap()
+
+        figures = [aqi_gauge(aqi_info, MILESTONE4_POLLUTANT), forecast_chart(recent_values, forecast),
+                   trends_chart(trend_series)]
+        figure_bytes = _serialise(figures) + len(table.to_json())
+        reruns[time_range] = {'filter_s': filter_s, 'aggregate_s': aggregate_s,
+                              'figures_s': clock.lap(), 'figure_bytes': figure_bytes}
+    result['reruns'] = reruns
+    return result
+
+
+def run_case(app, dataset, workdir):
+    """Run one dashboard on one dataset; meant to run in a fresh process."""
+    os.makedirs(workdir, exist_ok=True)
+    if app == 'milestone1':
+        result = _milestone1(dataset)
+    else:
+        result = _milestone4(dataset, workdir)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def case_name(app, dataset):
+    return f"{app}/{dataset['name']}"
+
+
+def median_result(runs):
+    """One result holding the median of each metric over ``runs``."""
+    first = runs[0]
+    if isinstance(first, dict):
+        return {key: median_result([run[key] for run in runs]) for key in first}
+    if first is None:
+        return None
+    return float(np.median(runs))
+
+
+def run_benchmarks(sizes=SIZES, station_counts=STATION_COUNTS, apps=APPS, root=BENCH_DIR,
+                   repeats=REPEATS):
+    """Results keyed by case name; each run of a case is a fresh spawned process."""
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for stations in station_counts:
+        for rows in sizes:
+            dataset = prepare_dataset(rows, stations, root)
+            for app in apps:
+                if app == 'milestone1' and stations > 1:
+                    continue  # Milestone 1 only shows the single-site dataset
+                name = case_name(app, dataset)
+                workdir = os.path.join(root, "runs", name.replace('/', '-'))
+                runs = []
+                for _ in range(repeats):
+                    shutil.rmtree(workdir, ignore_errors=True)
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        runs.append(pool.submit(run_case, app, dataset, workdir).result())
+                results[name] = median_result(runs)
+    return results
+
+
+# ----------------------------
+# 🚦 REGRESSION GATE
+# ----------------------------
+def flatten(result):
+    """``{metric: value}`` with per-window metrics as ``"<window>/<metric>"``."""
+    flat = {k: v for k, v in result.items() if k != 'reruns' and v is not None}
+    for time_range, metrics in result.get('reruns', {}).items():
+        flat.update({f"{time_range}/{k}": v for k, v in metrics.items()})
+    return flat
+
+
+def _noise_floor(metric):
+    for suffix, floor in NOISE_FLOORS.items():
+        if metric.endswith(suffix):
+            return floor
+    return 0
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Regressions of ``results`` against ``baseline`` as readable lines.
+
+    Only cases and metrics present in both are compared.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = flatten(baseline[name])
+        for metric, value in flatten(result).items():
+            old = before.get(metric)
+            if old is None:
+                continue
+            if value > old * (1 + tolerance) and value - old > _noise_floor(metric):
+                regressions.append(f"{name} {metric}: {old:.4g} -> {value:.4g}")
+    return regressions
+
+
+def read_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_baseline(results, path=BASELINE_FILE):
+    """Merge ``results`` into the stored baseline, replacing the cases they cover."""
+    baseline = read_baseline(path)
+    baseline.update(results)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def format_table(results):
+    header = f"{'case':<28}{'window':<15}{'load':>9}{'data MB':>9}{'index':>9}{'filter':>9}" \
+             f"{'aggr':>9}{'figures':>9}{'json KB':>10}{'RSS MB':>9}"
+    lines = [header, '-' * len(header)]
+    for name, result in results.items():
+        rss = result.get('peak_rss_mb')
+        for time_range, rerun in result['reruns'].items():
+            lines.append(
+                f"{name:<28}{time_range:<15}{result['load_s']:>9.3f}{result['dataset_mb']:>9.1f}"
+                f"{result['index_s']:>9.3f}{rerun['filter_s']:>9.4f}{rerun['aggregate_s']:>9.3f}"
+                f"{rerun['figures_s']:>9.3f}{rerun['figure_bytes'] / 1024:>10.1f}"
+                f"{rss if rss is not None else float('nan'):>9.0f}"
+            )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboards' data paths and figures.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES), help="rows per dataset")
+    parser.add_argument("--stations", nargs="+", type=int, default=list(STATION_COUNTS),
+                        help="station counts; rows are split evenly over the stations")
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=list(APPS))
+    parser.add_argument("--root", default=BENCH_DIR, help="where datasets are generated")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a regression against the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="runs per case; metrics are medians")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.stations, args.apps, args.root, args.repeats)
+    print(format_table(results))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        baseline = read_baseline(args.baseline)
+        if not baseline:
+            print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+            return 1
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            print("\n".join(f"  {line}" for line in regressions))
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+    if args.save_baseline:
+        write_baseline(results, args.baseline)
+        print(f"Saved baseline for {len(results)} case(s) to {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
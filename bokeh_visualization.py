@@ -39,12 +39,12 @@ from bokeh.layouts import gridplot
 # Display plots inline
 output_notebook()
 
-# Load dataset
-df = pd.read_csv("air_quality.csv", low_memory=False)
+# Load dataset; the dates are parsed with one detected format and cached in .cache/
+from timestamps import read_csv_datetimes
+df = read_csv_datetimes("air_quality.csv", 'date', low_memory=False)
 
 # Basic cleaning
 df = df.rename(columns={'date': 'Date'})
-df['Date'] = pd.to_datetime(df['Date'], format='mixed')
 
 # Convert pollutant columns to numeric, coercing errors
 pollutant_cols = ['pm2.5', 'pm10', 'o3', 'co', 'no2', 'so2', 'no', 'nox']
@@ -65,6 +65,10 @@ elif 'Station' in df.columns:
 else:
     city_col = None
 
+# Shared aggregates: one groupby pass per row filter, memoised by (columns, grain, filters)
+from aggregates import AggregateCache
+agg = AggregateCache(df)
+
 # ==================== IMPORTS ====================
 import pandas as pd
 import numpy as np
@@ -78,7 +82,7 @@ output_notebook()
 
 #Histogram of AQI Distribution
 import numpy as np # Import numpy
-hist, edges = np.histogram(df['aqi'].dropna(), bins=30)
+hist, edges = agg.histogram('aqi', bins=30)
 p1 = figure(width=800, height=350, title="Distribution of AQI ")
 p1.quad(top=hist, bottom=0, left=edges[:-1], right=edges[1:],
         fill_color="skyblue", line_color="white", alpha=0.8)
@@ -89,8 +93,9 @@ show(p1)
 # Scatter with color mapping: AQI by pm2.5
 from bokeh.transform import linear_cmap # Import linear_cmap
 
-if not df.dropna(subset=['pm2.5', 'aqi', 'o3']).empty:
-    source9 = ColumnDataSource(df.dropna(subset=['pm2.5', 'aqi', 'o3']).sample(min(3000, len(df.dropna(subset=['pm2.5', 'aqi', 'o3'])))))
+scatter_rows = agg.rows(dropna=['pm2.5', 'aqi', 'o3'])
+if not scatter_rows.empty:
+    source9 = ColumnDataSource(scatter_rows.sample(min(3000, len(scatter_rows))))
     color_mapper = linear_cmap('o3', 'Viridis256', df['o3'].min(), df['o3'].max())
     p2 = figure(title="pm2.5 vs AQI (Color by O3)", width=600, height=400) # Changed 'PM2.5' to 'pm2.5'
     p2.scatter('pm2.5', 'aqi', source=source9, color=color_mapper, size=6, alpha=0.6) # Changed 'PM2.5' to 'pm2.5' and 'AQI' to 'aqi' and circle to scatter
@@ -105,8 +110,8 @@ show(p2)
 
 #Heatmap: Correlation matrix
 corr_cols = ['pm2.5', 'pm10', 'o3', 'no2', 'so2', 'co']
-if not df[corr_cols].dropna().empty:
-    corr = df[corr_cols].corr() # Changed 'PM2.5' to 'pm2.5' and 'PM10' to 'pm10'
+if not agg.rows(dropna=corr_cols).empty:
+    corr = agg.corr(corr_cols) # Changed 'PM2.5' to 'pm2.5' and 'PM10' to 'pm10'
     corr = corr.stack().reset_index(name='corr')
     p3 = figure(title="Pollutant Correlation Heatmap", x_range=corr_cols, y_range=list(reversed(corr_cols)), width=600, height=400)
     p3.rect(x='level_0', y='level_1', width=1, height=1, source=ColumnDataSource(corr),
@@ -120,8 +125,8 @@ output_notebook()
 show(p3)
 
 # Area: Monthly pm2.5 and pm10
-if not df.dropna(subset=['Date', 'pm2.5', 'pm10']).empty: # Changed 'date' to 'Date'
-    df_monthly = df.resample('ME', on='Date')[['pm2.5', 'pm10']].mean().reset_index() # Changed 'date' to 'Date'
+if not agg.rows(dropna=['Date', 'pm2.5', 'pm10']).empty: # Changed 'date' to 'Date'
+    df_monthly = agg.mean(['pm2.5', 'pm10'], 'month') # month-end labels, like resample('ME')
     source7 = ColumnDataSource(df_monthly)
     p4 = figure(title="Monthly Avg pm2.5 & pm10", x_axis_type='datetime', width=700, height=400) # Changed 'PM2.5' to 'pm2.5' and 'PM10' to 'pm10'
     p4.varea(x='Date', y1='pm2.5', y2=0, source=source7, color="blue", alpha=0.5, legend_label="pm2.5") # Changed 'PM2.5' to 'pm2.5' and 'date' to 'Date'
@@ -135,8 +140,8 @@ output_notebook()
 show(p4)
 
 # Multi-line: Pollutant trends over time
-if not df.dropna(subset=['Date', 'pm2.5', 'o3', 'no2']).empty:
-    df_daily = df.groupby('Date')[['pm2.5', 'o3', 'no2']].mean().reset_index() # Changed 'PM2.5' to 'pm2.5' and 'O3' to 'o3' and 'NO2' to 'no2'
+if not agg.rows(dropna=['Date', 'pm2.5', 'o3', 'no2']).empty:
+    df_daily = agg.mean(['pm2.5', 'o3', 'no2'], 'day') # Changed 'PM2.5' to 'pm2.5' and 'O3' to 'o3' and 'NO2' to 'no2'
     source10 = ColumnDataSource(df_daily)
     p5 = figure(title="Daily Avg Pollutants", x_axis_type='datetime', width=700, height=400)
     p5.line('Date', 'pm2.5', source=source10, color="red", legend_label="pm2.5", line_width=2) # Changed 'PM2.5' to 'pm2.5'
@@ -155,7 +160,7 @@ from bokeh.palettes import Category10 # Import Category10
 from bokeh.transform import factor_cmap # Import factor_cmap
 
 if not df['sitename'].dropna().empty:
-    top_sites_df = df.groupby('sitename')['aqi'].mean().sort_values(ascending=False).head(10).reset_index() # Changed 'site' to 'sitename' and 'AQI' to 'aqi'
+    top_sites_df = agg.mean(['aqi'], 'site').sort_values('aqi', ascending=False).head(10).reset_index(drop=True) # Changed 'site' to 'sitename' and 'AQI' to 'aqi'
     if not top_sites_df.empty:
         top_sites = top_sites_df['sitename'].tolist()
         source3 = ColumnDataSource(top_sites_df)
@@ -180,7 +185,7 @@ if len(sample_sites) >= 3:
     p7 = figure(title="AQI Over Time", x_axis_type='datetime', width=600, height=400)
     colors = Category10[max(3, len(sample_sites))]
     for i, site in enumerate(sample_sites):
-        data = df[df['sitename'] == site].dropna(subset=['Date', 'aqi']) # Changed 'site' to 'sitename' and 'date' to 'Date'
+        data = agg.rows(site, dropna=['Date', 'aqi']) # Changed 'site' to 'sitename' and 'date' to 'Date'
         if not data.empty:
             source = ColumnDataSource(data)
             p7.line('Date', 'aqi', source=source, color=colors[i], legend_label=site, line_width=2) # Changed 'AQI' to 'aqi' and 'date' to 'Date'
@@ -194,8 +199,9 @@ output_notebook()
 show(p7)
 
 #  Scatter: PM2.5 vs O3 with hover
-if len(df.dropna(subset=['pm2.5', 'o3'])) >= 2000:
-    source1 = ColumnDataSource(df.dropna(subset=['pm2.5', 'o3']).sample(2000))
+o3_rows = agg.rows(dropna=['pm2.5', 'o3'])
+if len(o3_rows) >= 2000:
+    source1 = ColumnDataSource(o3_rows.sample(2000))
     p8 = figure(title="pm2.5 vs O3", width=600, height=400, tools="hover,pan,wheel_zoom,box_zoom,reset")
     p8.scatter('pm2.5', 'o3', source=source1, color="navy", alpha=0.5, size=6)
     p8.xaxis.axis_label = "pm2.5 (µg/m³)"
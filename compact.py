@@ -0,0 +1,183 @@
+"""Compact, read-only dataset shared by every session of a process.
+
+``CompactDataset`` keeps the timestamps as int64 nanoseconds since the epoch
+and each sensor column as its own read-only array: int16 codes when the
+column's readings have at most ``MAX_DECIMALS`` decimals and their range fits,
+float32 otherwise. Quantizing is lossless: a column is only coded when
+decoding gives back exactly the float32 readings. The cleaned UCI dataset
+(one decimal for most columns, integer PT08 responses) codes entirely as int16,
+half the size of float32.
+
+Sessions share one instance through ``st.cache_resource`` rather than
+``st.cache_data``, which hands each call an unpickled copy. Filters are
+positional ``[lo, hi)`` row ranges from ``row_range``; only ``frame`` builds
+pandas objects, and only for the rows and columns asked for. ``ColumnRows``
+gives the rollup and correlation indexes float64 row blocks decoded on
+demand, so they do not keep a float64 copy of the data either.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, CLEANED_CSV, DATETIME_COL, dataset_key, load_indexed_data
+
+# ----------------------------
+# 🗜️ QUANTIZATION
+# ----------------------------
+MAX_DECIMALS = 4
+INT16_NAN = np.iinfo(np.int16).min      # code for a missing reading
+_INT16_SPAN = int(np.iinfo(np.int16).max) * 2   # codes usable around the centre
+
+# In-process memo, like data_loader's.
+_DATASETS = {}
+
+
+def _readonly(array):
+    array = np.asarray(array)
+    array.flags.writeable = False
+    return array
+
+
+def quantize(values, max_decimals=MAX_DECIMALS):
+    """``(codes, decimals, centre)`` coding float32 ``values`` losslessly as int16, or None.
+
+    A reading decodes as ``(code + centre) / 10**decimals``.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    present = ~np.isnan(values)
+    if not present.any():
+        return None
+    wide = values[present].astype(np.float64)
+    for decimals in range(max_decimals + 1):
+        scaled = np.rint(wide * 10.0 ** decimals)
+        if scaled.max() - scaled.min() > _INT16_SPAN:
+            return None
+        if not np.array_equal((scaled / 10.0 ** decimals).astype(np.float32), values[present]):
+            continue
+        centre = int((scaled.max() + scaled.min()) // 2)
+        codes = np.full(len(values), INT16_NAN, dtype=np.int16)
+        codes[present] = scaled - centre
+        return codes, decimals, centre
+    return None
+
+
+def dequantize(codes, decimals, centre):
+    values = ((codes.astype(np.float64) + centre) / 10.0 ** decimals).astype(np.float32)
+    values[codes == INT16_NAN] = np.nan
+    return values
+
+
+# ----------------------------
+# 📦 DATASET
+# ----------------------------
+class CompactDataset:
+    """Int64 timestamps and per-column int16/float32 arrays, all read-only."""
+
+    def __init__(self, stamps, arrays, codecs=None):
+        self.stamps = _readonly(np.asarray(stamps, dtype=np.int64))
+        self._arrays = {name: _readonly(array) for name, array in arrays.items()}
+        self._codecs = dict(codecs or {})   # name -> (decimals, centre) for int16 columns
+
+    @classmethod
+    def from_frame(cls, df, quantized=True):
+        """Build from a Datetime-sorted frame's numeric columns."""
+        stamps = pd.DatetimeIndex(df[DATETIME_COL]).as_unit('ns')
+        if not stamps.is_monotonic_increasing:
+            raise ValueError(f"{DATETIME_COL} must be sorted to build a compact dataset")
+        arrays, codecs = {}, {}
+        for name in df.columns:
+            if name == DATETIME_COL or not pd.api.types.is_numeric_dtype(df[name]):
+                continue
+            values = df[name].to_numpy(dtype=np.float32)
+            coded = quantize(values) if quantized else None
+            if coded is None:
+                arrays[name] = values
+            else:
+                arrays[name], codecs[name] = coded[0], coded[1:]
+        return cls(stamps.asi8, arrays, codecs)
+
+    @property
+    def columns(self):
+        return list(self._arrays)
+
+    def __len__(self):
+        return len(self.stamps)
+
+    def __contains__(self, name):
+        return name in self._arrays
+
+    @property
+    def nbytes(self):
+        return self.stamps.nbytes + sum(array.nbytes for array in self._arrays.values())
+
+    def rename(self, names):
+        """The same arrays under new column names; nothing is copied."""
+        return CompactDataset(
+            self.stamps,
+            {names.get(name, name): array for name, array in self._arrays.items()},
+            {names.get(name, name): codec for name, codec in self._codecs.items()},
+        )
+
+    # ----------------------------
+    # 🔎 ACCESS
+    # ----------------------------
+    def row_range(self, start=None, end=None):
+        """Positional ``[lo, hi)`` of rows with ``start <= Datetime < end``."""
+        lo = 0 if start is None else int(np.searchsorted(self.stamps, pd.Timestamp(start).value, 'left'))
+        hi = len(self) if end is None else int(np.searchsorted(self.stamps, pd.Timestamp(end).value, 'left'))
+        return lo, max(lo, hi)
+
+    def values(self, name, lo=0, hi=None):
+        """Float32 readings of one column for rows ``[lo, hi)``.
+
+        Float32 columns return a read-only view; int16 columns decode just
+        the requested rows.
+        """
+        array = self._arrays[name][lo:hi]
+        codec = self._codecs.get(name)
+        return array if codec is None else dequantize(array, *codec)
+
+    def frame(self, columns=None, lo=0, hi=None):
+        """A DataFrame of ``Datetime`` and ``columns`` for rows ``[lo, hi)``."""
+        columns = self.columns if columns is None else list(columns)
+        data = {DATETIME_COL: self.stamps[lo:hi].view('datetime64[ns]')}
+        data.update({name: self.values(name, lo, hi) for name in columns})
+        return pd.DataFrame(data)
+
+    def to_frame(self):
+        return self.frame()
+
+
+class ColumnRows:
+    """Row slices of a dataset's columns as a float64 block, decoded when sliced."""
+
+    def __init__(self, dataset, columns=None):
+        self.dataset = dataset
+        self.columns = dataset.columns if columns is None else list(columns)
+        self.shape = (len(dataset), len(self.columns))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        lo, hi, _ = rows.indices(len(self))
+        block = np.empty((max(0, hi - lo), len(self.columns)))
+        for i, name in enumerate(self.columns):
+            block[:, i] = self.dataset.values(name, lo, max(lo, hi))
+        return block
+
+
+def load_compact_data(path=CLEANED_CSV, cache_dir=CACHE_DIR, quantized=True):
+    """The cleaned dataset (base plus partitions) as a ``CompactDataset``.
+
+    Memoised per process and dataset signature, like ``load_cleaned_data``;
+    the intermediate frame is not kept.
+    """
+    key = dataset_key(path, cache_dir) + (quantized,)
+    dataset = _DATASETS.get(key)
+    if dataset is None:
+        dataset = CompactDataset.from_frame(load_indexed_data(path, cache_dir).reset_index(), quantized)
+        for stale in [k for k in _DATASETS if k[0] == key[0]]:
+            del _DATASETS[stale]
+        _DATASETS[key] = dataset
+    return dataset
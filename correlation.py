@@ -0,0 +1,180 @@
+"""Cached correlation matrices from per-day co-moments.
+
+``CorrelationIndex`` accumulates, for every day, the pairwise-complete
+co-moments of all numeric columns: counts ``N[i, j]``, sums ``S[i, j]`` of
+column i over rows where i and j are both present, squared sums and cross
+products. Values are shifted by the overall column means before they are
+accumulated, which keeps the sums small and the variance arithmetic stable.
+Prefix sums over the days make any run of whole days an O(k²) difference;
+only the partial days at a window's edges are computed from rows.
+
+The full k×k matrix of a window is cached, so picking a different subset of
+pollutants is a ``.loc`` slice — pandas' ``corr`` is pairwise-complete, so
+a slice of the full matrix equals the matrix of the subset. One index is
+shared by every dashboard session, so the cache is guarded by a lock.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATETIME_COL
+from rollups import TIME_WINDOWS
+
+# Window matrices kept per index.
+MATRIX_CACHE_SIZE = 32
+
+_FIELDS = ('n', 's', 'ss', 'sxy')
+
+
+def _moments(values):
+    """Pairwise-complete co-moments of a block of (shifted) rows."""
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    weight = present.astype(np.float64)
+    return {
+        'n': weight.T @ weight,
+        's': filled.T @ weight,
+        'ss': (filled * filled).T @ weight,
+        'sxy': filled.T @ filled,
+    }
+
+
+def _to_corr(m):
+    n = m['n']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_i = m['s'] / n
+        mean_j = m['s'].T / n
+        cov = m['sxy'] / n - mean_i * mean_j
+        var_i = m['ss'] / n - mean_i ** 2
+        var_j = m['ss'].T / n - mean_j ** 2
+        corr = cov / np.sqrt(var_i * var_j)
+    corr[n < 2] = np.nan
+    np.fill_diagonal(corr, np.where(np.diag(n) >= 2, 1.0, np.nan))
+    return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationIndex:
+    """Per-day co-moments of the numeric columns of a Datetime-sorted frame."""
+
+    def __init__(self, df, columns=None):
+        if columns is None:
+            columns = [c for c in df.columns
+                       if c != DATETIME_COL and pd.api.types.is_numeric_dtype(df[c])]
+        self.columns = list(columns)
+        self._load(df)
+        self._init_days()
+
+    @classmethod
+    def from_rows(cls, columns, stamps, values):
+        """An index over sorted int64 ``stamps`` that scans ``values`` instead of a float64 copy.
+
+        ``values`` only needs to support row slicing into a 2-D block, e.g.
+        ``compact.ColumnRows`` over a compact dataset.
+        """
+        index = cls.__new__(cls)
+        index.columns = list(columns)
+        index._stamps, index._values = np.asarray(stamps, dtype=np.int64), values
+        index._matrices, index._prefix = OrderedDict(), None
+        index._lock = threading.Lock()
+        index._init_days()
+        return index
+
+    def _init_days(self):
+        values = self._values[:]
+        self._shift = np.nan_to_num(np.nanmean(values, axis=0)) if len(values) else \
+            np.zeros(len(self.columns))
+        self._days = self._build_days(0)
+
+    def _rows(self, lo, hi):
+        """Rows ``[lo, hi)`` shifted by the column means."""
+        return self._values[lo:hi] - self._shift
+
+    def _load(self, df):
+        stamps = pd.DatetimeIndex(df[DATETIME_COL]).as_unit('ns')
+        if not stamps.is_monotonic_increasing:
+            raise ValueError(f"{DATETIME_COL} must be sorted to build correlations")
+        self._stamps = stamps.asi8
+        self._values = df[self.columns].to_numpy(dtype=np.float64)
+        self._matrices = OrderedDict()
+        self._prefix = None
+        self._lock = threading.Lock()
+
+    def _build_days(self, first_row):
+        """Day starts and per-day co-moments of the rows from ``first_row`` on."""
+        day_ns = pd.Timedelta(days=1).value
+        days = self._stamps[first_row:] // day_ns * day_ns
+        offsets = np.flatnonzero(np.r_[True, days[1:] != days[:-1]]) if len(days) else \
+            np.empty(0, dtype=np.int64)
+        bounds = np.r_[offsets, len(days)]
+        values = self._rows(first_row, len(self._stamps))
+        k = len(self.columns)
+        blocks = {f: np.empty((len(offsets), k, k)) for f in _FIELDS}
+        for b, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+            for field, value in _moments(values[lo:hi]).items():
+                blocks[field][b] = value
+        return {'start': days[offsets], 'blocks': blocks}
+
+    @property
+    def _cumulative(self):
+        if self._prefix is None:
+            k = len(self.columns)
+            self._prefix = {f: np.concatenate([np.zeros((1, k, k)), np.cumsum(self._days['blocks'][f], axis=0)])
+                            for f in _FIELDS}
+        return self._prefix
+
+    def _window_moments(self, lo_ns, hi_ns):
+        day_ns = pd.Timedelta(days=1).value
+        starts = self._days['start']
+        first = int(np.searchsorted(starts, lo_ns, 'left'))
+        stop = int(np.searchsorted(starts + day_ns, hi_ns, 'right'))
+        k = len(self.columns)
+        total = {f: np.zeros((k, k)) for f in _FIELDS}
+
+        if first < stop:
+            cum = self._cumulative
+            for f in _FIELDS:
+                total[f] += cum[f][stop] - cum[f][first]
+            edges = [(lo_ns, int(starts[first])), (int(starts[stop - 1]) + day_ns, hi_ns)]
+        else:
+            edges = [(lo_ns, hi_ns)]
+        for edge_lo, edge_hi in edges:
+            lo = int(np.searchsorted(self._stamps, edge_lo, 'left'))
+            hi = int(np.searchsorted(self._stamps, edge_hi, 'left'))
+            if lo < hi:
+                for f, value in _moments(self._rows(lo, hi)).items():
+                    total[f] += value
+        return total
+
+    def corr(self, start=None, end=None, columns=None):
+        """Pairwise-complete Pearson matrix for ``start <= Datetime < end``.
+
+        Matches ``df[mask][columns].corr()``.
+        """
+        lo_ns = np.iinfo(np.int64).min if start is None else pd.Timestamp(start).value
+        hi_ns = np.iinfo(np.int64).max if end is None else pd.Timestamp(end).value
+        key = (lo_ns, hi_ns)
+        with self._lock:
+            matrix = self._matrices.get(key)
+            if matrix is not None:
+                self._matrices.move_to_end(key)
+        if matrix is None:
+            matrix = pd.DataFrame(_to_corr(self._window_moments(lo_ns, hi_ns)),
+                                  index=self.columns, columns=self.columns)
+            with self._lock:
+                self._matrices[key] = matrix
+                while len(self._matrices) > MATRIX_CACHE_SIZE:
+                    self._matrices.popitem(last=False)
+        if columns is not None:
+            return matrix.loc[list(columns), list(columns)]
+        return matrix
+
+    def window_corr(self, time_range, columns=None):
+        """``corr`` for one of the dashboard ``TIME_WINDOWS``, ending at the latest reading."""
+        span = TIME_WINDOWS[time_range]
+        start = None
+        if span is not None and len(self._stamps):
+            start = pd.Timestamp(self._stamps[-1]) - span
+        return self.corr(start, None, columns)
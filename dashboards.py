@@ -0,0 +1,203 @@
+"""Data preparation and Plotly figures shared by the Streamlit dashboards.
+
+Everything here is plain pandas/Plotly with no Streamlit calls, so the
+dashboards and ``benchmarks.py`` build exactly the same frames and figures.
+Plotly is imported by the figure builders when they first run, so a process
+that only needs the constants or panel data does not pay for it at start.
+"""
+
+import numpy as np
+
+from data_loader import DATETIME_COL, DEFAULT_STATION
+
+# ----------------------------
+# 🏷️ COLUMN NAMES
+# ----------------------------
+# Milestone 1 shows the UCI columns under readable names.
+DISPLAY_NAMES = {
+    'CO(GT)': 'CO',
+    'PT08.S1(CO)': 'Sensor_CO',
+    'NMHC(GT)': 'NMHC',
+    'C6H6(GT)': 'Benzene',
+    'PT08.S2(NMHC)': 'Sensor_NMHC',
+    'NOx(GT)': 'NOx',
+    'PT08.S3(NOx)': 'Sensor_NOx',
+    'NO2(GT)': 'NO2',
+    'PT08.S4(NO2)': 'Sensor_NO2',
+    'PT08.S5(O3)': 'Sensor_O3',
+    'T': 'Temperature_C',
+    'RH': 'Relative_Humidity',
+    'AH': 'Absolute_Humidity',
+    'O3': 'O3',
+    'SO2': 'SO2'
+}
+
+# Milestone 4 pollutant -> column of the UCI dataset
+POLLUTANT_MAPPING = {
+    "PM2.5": "C6H6(GT)",
+    "NO2": "NO2(GT)",
+    "NOx": "NOx(GT)",
+    "O3": "PT08.S5(O3)",
+    "SO2": "PT08.S4(NO2)"
+}
+
+# Multi-site (Taiwan-format) stations use lower-case pollutant columns
+SITE_POLLUTANT_MAPPING = {
+    "PM2.5": "pm2.5",
+    "NO2": "no2",
+    "NOx": "nox",
+    "O3": "o3",
+    "SO2": "so2"
+}
+
+TREND_POLLUTANTS = ["PM2.5", "NO2", "O3"]
+
+HORIZONS = {"1 Hour": 1, "6 Hours": 6, "12 Hours": 12, "24 Hours": 24, "48 Hours": 48}
+
+
+def display_frame(df):
+    return df.rename(columns=DISPLAY_NAMES)
+
+
+def pollutant_mapping(station):
+    return POLLUTANT_MAPPING if station == DEFAULT_STATION else SITE_POLLUTANT_MAPPING
+
+
+# ----------------------------
+# 🧮 PANEL DATA
+# ----------------------------
+def forecast_values(forecaster, df, column, recent_values, horizon):
+    """Last reading followed by the ``horizon``-hour forecast; empty without a model."""
+    if forecaster is None or column not in forecaster.targets or len(recent_values) == 0:
+        return np.array([])
+    return np.concatenate([[recent_values[-1]], forecaster.predict(df, column, horizon)])
+
+
+def recent_table(filtered_df, mapping, rows=10):
+    """The "Recent Data" table: last readings of the main pollutants, temperature and humidity."""
+    table_columns = {DATETIME_COL: 'DateTime'}
+    table_columns.update({mapping[pol]: pol for pol in ['PM2.5', 'NO2', 'NOx', 'O3']})
+    table_columns.update({'T': 'Temp', 'RH': 'Humidity'})
+    display_df = filtered_df[[c for c in table_columns if c in filtered_df.columns]].tail(rows).copy()
+    return display_df.rename(columns=table_columns)
+
+
+# ----------------------------
+# 📊 MILESTONE 1 FIGURES
+# ----------------------------
+def trend_line(points, y, title, colors, template):
+    import plotly.express as px
+
+    return px.line(
+        points, x=DATETIME_COL, y=y,
+        title=title,
+        color_discrete_sequence=colors,
+        template=template
+    )
+
+
+def average_bar(avg_data, colors, template):
+    import plotly.express as px
+
+    return px.bar(
+        avg_data, x='Pollutant', y='Average Value', color='Pollutant',
+        color_discrete_sequence=colors,
+        template=template
+    )
+
+
+def correlation_heatmap(corr, color_scale, template):
+    import plotly.express as px
+
+    return px.imshow(
+        corr, text_auto=True, aspect="auto",
+        color_continuous_scale=color_scale,
+        template=template
+    )
+
+
+# ----------------------------
+# 📈 MILESTONE 4 FIGURES
+# ----------------------------
+def aqi_gauge(aqi_info, title):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=aqi_info['aqi'],
+        title={'text': title},
+        domain={'x': [0, 1], 'y': [0, 1]},
+        gauge={
+            'axis': {'range': [0, max(200, aqi_info['aqi'])]},
+            'bar': {'color': aqi_info['color']},
+            'steps': [
+                {'range': [0, 50], 'color': "rgba(76, 175, 80, 0.3)"},
+                {'range': [50, 100], 'color': "rgba(255, 193, 7, 0.3)"},
+                {'range': [100, 150], 'color': "rgba(255, 152, 0, 0.3)"},
+                {'range': [150, 200], 'color': "rgba(244, 67, 54, 0.3)"}
+            ],
+            'threshold': {
+                'line': {'color': "red", 'width': 4},
+                'thickness': 0.75,
+                'value': 150
+            }
+        }
+    ))
+    fig.update_layout(height=350, margin=dict(l=0, r=0, t=30, b=0))
+    return fig
+
+
+def forecast_chart(recent_values, forecast):
+    import plotly.graph_objects as go
+
+    time_actual = list(range(len(recent_values)))
+    time_forecast = list(range(len(recent_values)-1, len(recent_values)-1 + len(forecast)))
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=time_actual,
+        y=recent_values,
+        name='Historical',
+        mode='lines+markers',
+        line=dict(color='#667eea', width=2),
+        marker=dict(size=6)
+    ))
+    fig.add_trace(go.Scatter(
+        x=time_forecast,
+        y=forecast,
+        name='Forecast',
+        mode='lines+markers',
+        line=dict(color='#ff6b35', width=2, dash='dash'),
+        marker=dict(size=6)
+    ))
+    fig.update_layout(
+        height=350,
+        hovermode='x unified',
+        template='plotly_white',
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    return fig
+
+
+def trends_chart(series):
+    """Overlaid trend lines from ``(name, x, y)`` triples."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    for name, x, y in series:
+        fig.add_trace(go.Scatter(
+            x=x,
+            y=y,
+            name=name,
+            mode='lines',
+            line=dict(width=2)
+        ))
+    fig.update_layout(
+        height=400,
+        hovermode='x unified',
+        template='plotly_white',
+        xaxis_title='Time',
+        yaxis_title='Concentration (μg/m³)',
+        margin=dict(l=0, r=0, t=30, b=0)
+    )
+    return fig
@@ -0,0 +1,398 @@
+"""Shared data-access layer for the AirAware dashboards.
+
+Every app loads the cleaned dataset through ``load_cleaned_data()``. The first
+load parses ``AirQuality_cleaned.csv`` and writes a typed columnar cache
+(float32 sensor columns, datetime64 index) next to it; later loads, in this or
+any other process, read the cache as long as it still matches the source
+file's mtime/size or, failing that, its SHA-256 hash.
+
+Rows added later (e.g. admin uploads) are stored as separate partitions in
+``<cache_dir>/<stem>.parts/`` and concatenated on load, so appending data
+never rewrites or re-parses the base file. Frequent small appends (the live
+service) are combined by ``merge_partitions`` so loads stay a few reads.
+
+Stored rows carry the ``Quality`` bitmask of ``quality.py``; loads return
+the readings with flagged ones set to missing unless ``keep_flags`` is set.
+
+``dataset_key`` names the stored contents (source signature plus partition
+files). ``load_snapshot`` returns it with the rows it names, read from one
+listing, and ``partition_key``/``merged_key`` derive the key a writer's own
+append or merge leads to, so derived files (``mapped.py``) can record exactly
+which rows they hold even while other writers append. ``appended_rows``
+reads just the partitions added since a key, which is how memoised frames
+(``load_cleaned_data``) and the live service catch up without reloading.
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: file locks are no-ops
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# 📂 DATASET LAYOUT
+# ----------------------------
+CLEANED_CSV = "AirQuality_cleaned.csv"
+CACHE_DIR = ".cache"
+DATETIME_COL = "Datetime"
+QUALITY_COL = "Quality"
+
+SENSOR_COLUMNS = [
+    'CO(GT)', 'PT08.S1(CO)', 'NMHC(GT)', 'C6H6(GT)', 'PT08.S2(NMHC)',
+    'NOx(GT)', 'PT08.S3(NOx)', 'NO2(GT)', 'PT08.S4(NO2)', 'PT08.S5(O3)',
+    'T', 'RH', 'AH'
+]
+
+SENSOR_DTYPE = np.float32
+
+# The UCI dataset is a single site; the Milestone 2 notebook calls it All_Data.
+DEFAULT_STATION = "All_Data"
+
+# Bump when the cached layout changes so stale caches are rebuilt.
+CACHE_VERSION = 2
+
+# Partitions smaller than this are combined by ``merge_partitions``.
+MERGE_BYTES = 4 << 20
+
+# In-process memo: every app in the same process gets the same frame.
+_FRAMES = {}
+
+
+def file_signature(path):
+    """Cheap identity of a file: modification time and size."""
+    stat = os.stat(path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive ``flock`` on ``path`` across processes and threads."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _cache_paths(source, cache_dir):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    base = os.path.join(cache_dir, stem)
+    return base + frame_suffix(), base + ".meta.json"
+
+
+def frame_suffix():
+    """File suffix for stored frames: Parquet when pyarrow is installed, else pickle."""
+    try:
+        import pyarrow  # noqa: F401
+        return ".parquet"
+    except ImportError:
+        return ".pkl"
+
+
+def _partition_dir(source, cache_dir):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir, stem + ".parts")
+
+
+def write_frame(df, path):
+    """Write a frame atomically in the format given by the path's suffix."""
+    tmp = path + ".tmp"
+    if path.endswith(".parquet"):
+        df.to_parquet(tmp)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def read_frame(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_pickle(path)
+
+
+def parse_cleaned_csv(path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    """Parse the cleaned CSV into the typed, Datetime-indexed layout.
+
+    The parsed timestamps are kept in ``cache_dir`` (``timestamps.py``), so
+    rebuilding the cache of an unchanged file skips the date strings.
+    Files written before quality flags existed are flagged here.
+    """
+    from quality import QUALITY_DTYPE, flag_frame     # both import this module
+    from timestamps import read_csv_datetimes
+
+    dtypes = {col: SENSOR_DTYPE for col in SENSOR_COLUMNS}
+    df = read_csv_datetimes(path, DATETIME_COL, cache_dir, dtype=dtypes)
+    df = df.dropna(subset=[DATETIME_COL])
+    df = df.set_index(DATETIME_COL).sort_index()
+    if QUALITY_COL in df.columns:
+        df[QUALITY_COL] = df[QUALITY_COL].fillna(0).astype(QUALITY_DTYPE)
+    else:
+        df = flag_frame(df)
+    # Any extra numeric columns are stored compactly too.
+    for col in df.columns:
+        if col not in dtypes and pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(SENSOR_DTYPE)
+    return df
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp = meta_path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def list_partitions(path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    """Paths of the appended partitions of ``path``, oldest first."""
+    part_dir = _partition_dir(path, cache_dir)
+    try:
+        names = sorted(n for n in os.listdir(part_dir) if not n.endswith(".tmp"))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(part_dir, n) for n in names]
+
+
+def append_partition(df, path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    """Store Datetime-indexed rows as a new partition of ``path`` and return its file.
+
+    Callers are responsible for validating and deduplicating the rows.
+    """
+    part_dir = _partition_dir(path, cache_dir)
+    os.makedirs(part_dir, exist_ok=True)
+    name = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6] + frame_suffix()
+    part_path = os.path.join(part_dir, name)
+    write_frame(df, part_path)
+    return part_path
+
+
+def merge_partitions(path=CLEANED_CSV, cache_dir=CACHE_DIR, max_bytes=MERGE_BYTES):
+    """Combine each run of consecutive partitions under ``max_bytes`` into one.
+
+    The merged file sorts just before the run's first partition and holds
+    the run's rows deduplicated as on load, so a load sees the same data
+    before, during and after a merge. Returns the merges made, as merged
+    file -> the partition files it replaced.
+    """
+    runs, run = [], []
+    for part in list_partitions(path, cache_dir):
+        if os.path.getsize(part) < max_bytes:
+            run.append(part)
+        else:
+            runs.append(run)
+            run = []
+    runs.append(run)
+
+    merges = {}
+    for run in (r for r in runs if len(r) > 1):
+        df = pd.concat([read_frame(p) for p in run])
+        df = df[~df.index.duplicated(keep='first')].sort_index()
+        head, suffix = os.path.splitext(run[0])
+        merged = head + "+" + suffix    # '+' sorts before '.'
+        write_frame(df, merged)
+        for part in run:
+            os.remove(part)
+        merges[merged] = run
+    return merges
+
+
+def _load_base(path, cache_dir):
+    """Load the source file with a datetime64 index, using the columnar cache.
+
+    The cache is reused when the source mtime/size match the recorded
+    signature. If they differ (e.g. a fresh checkout touched the file) the
+    source is hashed and the cache is still reused when the content is
+    unchanged.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path, meta_path = _cache_paths(path, cache_dir)
+    signature = file_signature(path)
+    meta = _read_meta(meta_path)
+
+    if meta and meta.get('version') == CACHE_VERSION and os.path.exists(cache_path):
+        if meta.get('signature') == signature:
+            return read_frame(cache_path)
+        digest = file_sha256(path)
+        if meta.get('sha256') == digest:
+            meta['signature'] = signature
+            _write_meta(meta_path, meta)
+            return read_frame(cache_path)
+    else:
+        digest = file_sha256(path)
+
+    df = parse_cleaned_csv(path, cache_dir)
+    write_frame(df, cache_path)
+    _write_meta(meta_path, {
+        'version': CACHE_VERSION,
+        'source': os.path.abspath(path),
+        'signature': signature,
+        'sha256': digest,
+        'rows': len(df),
+    })
+    return df
+
+
+def _key(path, parts):
+    return (
+        os.path.abspath(path),
+        tuple(sorted(file_signature(path).items())),
+        tuple(os.path.basename(p) for p in parts),
+    )
+
+
+def _read_partitions(path, cache_dir, known=()):
+    """``(key, frames)``: the dataset key and the partitions it lists that are not in ``known``."""
+    while True:
+        parts = list_partitions(path, cache_dir)
+        key = _key(path, parts)
+        try:
+            return key, [read_frame(p) for p in parts if os.path.basename(p) not in known]
+        except FileNotFoundError:   # merged away after listing
+            continue
+
+
+def _combine(frames):
+    """Indexed ``frames`` in order as one sorted frame, keeping a timestamp's first occurrence."""
+    from quality import QUALITY_DTYPE
+
+    df = pd.concat(frames)
+    df = df[~df.index.duplicated(keep='first')]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    # Partitions appended before quality flags existed have none.
+    df[QUALITY_COL] = df[QUALITY_COL].fillna(0).astype(QUALITY_DTYPE)
+    return df
+
+
+def load_snapshot(path=CLEANED_CSV, cache_dir=CACHE_DIR, keep_flags=False):
+    """``(key, df)``: ``load_indexed_data`` and the ``dataset_key`` of exactly the rows it read."""
+    from quality import mask_flagged
+
+    df = _load_base(path, cache_dir)
+    key, parts = _read_partitions(path, cache_dir)
+    if parts:
+        df = _combine([df] + parts)
+    return key, df if keep_flags else mask_flagged(df)
+
+
+def appended_rows(previous_key, path=CLEANED_CSV, cache_dir=CACHE_DIR, keep_flags=False):
+    """``(key, rows)``: the dataset key now and the rows of partitions added since ``previous_key``.
+
+    ``rows`` are indexed and masked like ``load_indexed_data``. They are None
+    when there is no previous key, the source file changed or no partition
+    was added, and the caller must load in full. A merged partition is new
+    even though it holds rows stored before, so ``rows`` may repeat stored
+    timestamps; as on load, the stored rows win.
+    """
+    from quality import mask_flagged
+
+    if previous_key is None:
+        return dataset_key(path, cache_dir), None
+    key, parts = _read_partitions(path, cache_dir, known=set(previous_key[2]))
+    if key[:2] != tuple(previous_key[:2]) or not parts:
+        return key, None
+    rows = _combine(parts)
+    return key, rows if keep_flags else mask_flagged(rows)
+
+
+def new_rows(stamps, rows):
+    """``rows`` whose index timestamps are not among sorted datetime64 ``stamps``."""
+    stamps = pd.DatetimeIndex(stamps).as_unit('ns').asi8
+    new = rows.index.as_unit('ns').asi8
+    if not len(stamps):
+        return rows
+    at = np.searchsorted(stamps, new).clip(max=len(stamps) - 1)
+    return rows[stamps[at] != new]
+
+
+def load_indexed_data(path=CLEANED_CSV, cache_dir=CACHE_DIR, keep_flags=False):
+    """Load the dataset with a datetime64 index: the cached source plus its partitions.
+
+    A timestamp present in more than one place keeps its first occurrence.
+    Readings that failed a quality check are NaN; with ``keep_flags`` they
+    are returned as stored, with the ``Quality`` column.
+    """
+    return load_snapshot(path, cache_dir, keep_flags)[1]
+
+
+def dataset_key(path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    """Identity of the dataset's current contents: source path and signature plus partitions.
+
+    The first element is the source path, so memos can drop stale entries.
+    """
+    return _key(path, list_partitions(path, cache_dir))
+
+
+def partition_key(key, added=(), removed=()):
+    """``key`` with the partition files ``added`` and ``removed`` (paths or file names)."""
+    names = set(key[2]) - {os.path.basename(p) for p in removed}
+    names |= {os.path.basename(p) for p in added}
+    return tuple(key[:2]) + (tuple(sorted(names)),)
+
+
+def merged_key(key, merges):
+    """``key`` after the ``merge_partitions`` merges.
+
+    A merged file is only named when ``key`` held every partition it
+    replaced; otherwise it holds rows ``key`` did not, and is left out.
+    """
+    for merged, run in merges.items():
+        names = {os.path.basename(p) for p in run}
+        key = partition_key(key, [merged] if names <= set(key[2]) else (), names)
+    return key
+
+
+def load_cleaned_data(path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    """Return the cleaned dataset with ``Datetime`` as a sorted column.
+
+    Frames are memoised per process and dataset key, so all apps in a
+    process share one frame. When partitions were added since the memoised
+    frame, only those are read and appended to a copy of it. Callers must
+    treat frames as read-only.
+    """
+    key = dataset_key(path, cache_dir)
+    df = _FRAMES.get(key)
+    if df is None:
+        previous, stored = next(((k, v) for k, v in list(_FRAMES.items()) if k[0] == key[0]), (None, None))
+        key, rows = appended_rows(previous, path, cache_dir)
+        if rows is None:
+            key, df = load_snapshot(path, cache_dir)
+            df = df.reset_index()
+        else:
+            df = pd.concat([stored, new_rows(stored[DATETIME_COL], rows).reset_index()], ignore_index=True)
+            if not df[DATETIME_COL].is_monotonic_increasing:
+                df = df.sort_values(DATETIME_COL, kind='stable', ignore_index=True)
+        for stale in [k for k in list(_FRAMES) if k[0] == key[0]]:
+            _FRAMES.pop(stale, None)
+        _FRAMES[key] = df
+    return df
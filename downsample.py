@@ -0,0 +1,132 @@
+"""Server-side downsampling for the dashboard line charts.
+
+Plotly serialises every point it is given, so "All Data" on a long hourly
+series ships far more points than the chart has pixels. These helpers pick a
+pixel-budgeted subset of row positions before the figure is built:
+
+* ``lttb_indices`` — Largest-Triangle-Three-Buckets, keeps the visual shape.
+* ``minmax_indices`` — first min and max of every bucket, guarantees that
+  every peak and trough survives.
+
+Both return sorted positions into the input, so callers can slice frames
+with ``iloc`` and keep whatever x values they plot.
+"""
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# 📐 POINT BUDGET
+# ----------------------------
+DEFAULT_WIDTH = 1200    # px; Streamlit's wide layout on a typical screen
+POINTS_PER_PIXEL = 2    # a min and a max per pixel column
+
+METHODS = ('minmax', 'lttb')
+
+
+def point_budget(width=DEFAULT_WIDTH):
+    return max(3, int(width) * POINTS_PER_PIXEL)
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').view(np.int64).astype(np.float64)
+    return x.astype(np.float64, copy=False)
+
+
+def lttb_indices(x, y, n_out):
+    """Positions of the ``n_out`` points chosen by LTTB.
+
+    ``x`` must be increasing and ``y`` free of NaN. The first and last points
+    are always kept.
+    """
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Interior points [1, n-1) split into n_out - 2 buckets.
+    edges = (1 + np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64)
+    edges[-1] = n - 1
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0] = 0
+    picked[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt_lo, nxt_hi = edges[i + 1], edges[i + 2]
+            cx, cy = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def minmax_indices(y, n_out):
+    """Positions of the first min and first max of ``n_out // 2`` equal buckets.
+
+    ``y`` must be free of NaN. The first and last points are always kept.
+    """
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    n_buckets = max(1, n_out // 2)
+    bucket = (np.arange(n) * n_buckets) // n
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+
+    picked = [np.array([0, n - 1])]
+    for reduce in (np.minimum, np.maximum):
+        extreme = reduce.reduceat(y, starts)
+        hits = np.flatnonzero(y == extreme[bucket])
+        _, first = np.unique(bucket[hits], return_index=True)
+        picked.append(hits[first])
+    return np.unique(np.concatenate(picked))
+
+
+def downsample_indices(x, y, n_out, method='minmax'):
+    if method == 'lttb':
+        return lttb_indices(x, y, n_out)
+    if method == 'minmax':
+        return minmax_indices(y, n_out)
+    raise ValueError(f"Unknown downsampling method {method!r}; expected one of {METHODS}")
+
+
+def downsample_series(values, width=DEFAULT_WIDTH, method='minmax'):
+    """Downsample a Series against its positions (NaN dropped first).
+
+    Returns ``(positions, values)`` where ``positions`` index the NaN-free
+    series, matching the ``range(len(values))`` x axis used by the trend
+    panels.
+    """
+    values = values.dropna()
+    idx = downsample_indices(np.arange(len(values)), values.to_numpy(), point_budget(width), method)
+    return idx, values.iloc[idx]
+
+
+def downsample_frame(df, x, columns, width=DEFAULT_WIDTH, method='minmax'):
+    """Rows of ``df`` needed to draw each of ``columns`` against ``x``.
+
+    Every column is downsampled on its own non-NaN rows and the union of the
+    kept rows is returned, so a wide-format ``px.line`` over ``columns``
+    still shows each column's peaks.
+    """
+    budget = point_budget(width)
+    if len(df) <= budget:
+        return df[[x] + list(columns)]
+    xs = df[x].to_numpy()
+    keep = []
+    for col in columns:
+        values = df[col].to_numpy()
+        present = np.flatnonzero(~pd.isna(values))
+        keep.append(present[downsample_indices(xs[present], values[present], budget, method)])
+    rows = np.unique(np.concatenate(keep)) if keep else np.empty(0, dtype=np.int64)
+    return df[[x] + list(columns)].iloc[rows]
@@ -0,0 +1,157 @@
+"""Lag, rolling-stat, calendar and cross-pollutant features of the sensor data.
+
+The Milestone 2 notebook builds its features cell by cell: an hourly
+``resample('H').mean().ffill()``, three ``shift()`` lag columns and sliding
+LSTM windows. This module builds them for every sensor column at once, with
+the hourly gaps filled by ``imputation.py``, and is the one code path behind
+model training and the dashboard's forecasts.
+
+The hourly values are padded with ``history - 1`` missing rows and viewed
+through ``sliding_window_view`` as one ``(hours, columns, history)``
+window per hour, without copying. Lags are one fancy index into that view
+and rolling stats are reductions over its last ``w`` entries, so there are
+no Python loops over rows or columns and no shifted copies of the frame.
+
+The feature row of hour ``t`` depends only on hours ``t - history + 1 ..
+t``, and each row is computed from its own window alone. ``feature_frame``
+with ``since`` therefore builds only the newest rows, from ``history - 1``
+hours before ``since``, and returns exactly the rows a full rebuild would.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_loader import DATETIME_COL, SENSOR_COLUMNS
+from imputation import context_start, fill_gaps
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+LAGS = (1, 2, 3, 6, 12, 24)     # hours before the hour being forecast; lag 1 is the latest reading
+WINDOWS = (6, 24)               # trailing windows, in hours, ending at the latest reading
+STATS = ('mean', 'std', 'min', 'max')
+
+# Share of the first pollutant in each pair's sum at the latest reading.
+CROSS_PAIRS = (
+    ('NO2(GT)', 'NOx(GT)'),
+    ('C6H6(GT)', 'CO(GT)'),
+    ('PT08.S2(NMHC)', 'PT08.S1(CO)'),
+)
+
+# Calendar cycles encoded as sine/cosine pairs, with their periods.
+CALENDAR = {'hour': 24, 'weekday': 7, 'month': 12}
+
+_REDUCERS = {'mean': np.mean, 'std': np.std, 'min': np.min, 'max': np.max}
+
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    columns: tuple = tuple(SENSOR_COLUMNS)
+    lags: tuple = LAGS
+    windows: tuple = WINDOWS
+    stats: tuple = STATS
+    calendar: bool = True
+    cross_pairs: tuple = CROSS_PAIRS
+
+    @property
+    def history(self):
+        """Hours of data, up to and including the latest, that one feature row needs."""
+        return max(self.lags + self.windows)
+
+    def pairs(self):
+        return [(a, b) for a, b in self.cross_pairs if a in self.columns and b in self.columns]
+
+    def names(self):
+        names = [f"{column}_lag{lag}" for column in self.columns for lag in self.lags]
+        names += [f"{column}_{stat}{window}" for window in self.windows for stat in self.stats
+                  for column in self.columns]
+        if self.calendar:
+            names += [f"{cycle}_{fn}" for cycle in CALENDAR for fn in ('sin', 'cos')]
+        names += [f"{a}_share_{b}" for a, b in self.pairs()]
+        return names
+
+
+DEFAULT_SPEC = FeatureSpec()
+
+
+# ----------------------------
+# ⏱️ HOURLY VALUES
+# ----------------------------
+def hourly_frame(df, columns=SENSOR_COLUMNS, since=None):
+    """Hourly means of ``columns`` with gaps filled by ``imputation.fill_gaps``.
+
+    With ``since``, only the hours from ``since`` on are built. ``df`` must
+    then be sorted by time: only its rows from ``imputation.context_start``
+    on are read, so the gaps are filled with the same values as a full
+    rebuild.
+    """
+    columns = list(columns)
+    start = 0
+    if since is not None:
+        since = pd.Timestamp(since).floor('h')
+        start = context_start(df, columns, since)
+    frame = df.iloc[start:].set_index(DATETIME_COL)[columns].astype(np.float64)
+    hourly = fill_gaps(frame.resample('h').mean())
+    return hourly if since is None else hourly.loc[since:]
+
+
+# ----------------------------
+# 🧮 FEATURES
+# ----------------------------
+def calendar_features(stamps):
+    """Sine/cosine of hour of day, day of week (Monday = 0) and month, one row per stamp."""
+    hours = np.asarray(stamps, dtype='datetime64[h]').astype(np.int64)
+    months = np.asarray(stamps, dtype='datetime64[M]').astype(np.int64)
+    phases = {
+        'hour': hours % 24,
+        'weekday': (hours // 24 + 3) % 7,    # 1970-01-01 was a Thursday
+        'month': months % 12,
+    }
+    angles = np.column_stack([2 * np.pi * phases[cycle] / period for cycle, period in CALENDAR.items()])
+    return np.stack([np.sin(angles), np.cos(angles)], axis=-1).reshape(len(hours), -1)
+
+
+def build_features(values, stamps, spec=DEFAULT_SPEC):
+    """Feature matrix, one row per hour, with columns in ``spec.names()`` order.
+
+    ``values`` holds the consecutive hourly values of ``spec.columns`` as an
+    ``(hours, columns)`` array and ``stamps`` their hours. Rows with fewer
+    than ``spec.history`` hours behind them have missing lags and stats.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n, history = len(values), spec.history
+    padded = np.concatenate([np.full((history - 1, values.shape[1]), np.nan), values])
+    windows = sliding_window_view(padded, history, axis=0)     # (hours, columns, history), a view
+
+    blocks = [windows[:, :, history - np.asarray(spec.lags)].reshape(n, -1)]
+    for window in spec.windows:
+        recent = windows[:, :, history - window:]
+        blocks += [_REDUCERS[stat](recent, axis=-1) for stat in spec.stats]
+    if spec.calendar:
+        blocks.append(calendar_features(stamps))
+    pairs = spec.pairs()
+    if pairs:
+        index = {column: i for i, column in enumerate(spec.columns)}
+        first = values[:, [index[a] for a, _ in pairs]]
+        total = first + values[:, [index[b] for _, b in pairs]]
+        blocks.append(np.divide(first, total, out=np.full_like(first, 0.5), where=total != 0))
+    return np.concatenate(blocks, axis=1)
+
+
+def feature_frame(df, spec=DEFAULT_SPEC, since=None):
+    """Features of the hourly data in ``df`` as a frame indexed by hour.
+
+    With ``since``, only the rows from that hour on are computed, from the
+    ``spec.history - 1`` hours before it; earlier rows are left out.
+    """
+    start = None
+    if since is not None:
+        since = pd.Timestamp(since).floor('h')
+        start = since - pd.Timedelta(hours=spec.history - 1)
+    hourly = hourly_frame(df, spec.columns, start)
+    matrix = build_features(hourly.to_numpy(), hourly.index, spec)
+    frame = pd.DataFrame(matrix, index=hourly.index, columns=spec.names())
+    return frame if since is None else frame.loc[since:]
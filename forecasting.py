@@ -0,0 +1,526 @@
+"""Forecasting service for the Milestone 4 dashboard.
+
+Follows the Milestone 2 notebook: each target column is resampled to hourly
+means with forward fill, candidate models (lag-feature linear regression,
+ridge regression on the ``features`` pipeline, XGBoost and random forest
+on lag features, ARIMA(3,1,2), Prophet, an LSTM) are fitted on the first 80% and scored on the hours
+after it, and the lowest-RMSE model is refitted on the full series.
+Candidates whose library is not installed are skipped. Models are fitted
+and forecast on the target's hourly series; ``hourly`` is the hourly frame
+of every sensor column, which the feature model also uses.
+
+Trained models are written to a versioned directory under ``models/``
+together with a ``manifest.json``; ``models/CURRENT`` names the active
+version and is swapped atomically, so a running dashboard picks up a new
+version on its next load without restarting. ``Forecaster`` unpickles a
+target's model the first time it is asked for, predicts ``MAX_HORIZON``
+hours and memoises the result per last timestamp, so changing the horizon
+only slices the cached arrays. Each model declares the hours of ``history``
+it forecasts from, and only those last hours are resampled and featurised.
+
+Usage:
+    python forecasting.py            # train all targets on AirQuality_cleaned.csv
+"""
+
+import argparse
+import json
+import os
+import pickle
+import threading
+import time
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CLEANED_CSV, DATETIME_COL, file_sha256, load_cleaned_data
+from features import DEFAULT_SPEC, build_features, hourly_frame
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+MODEL_DIR = "models"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# Bump when the artifact layout changes so old versions are ignored.
+ARTIFACT_VERSION = 1
+
+# The columns behind Milestone4's POLLUTANT_MAPPING.
+DEFAULT_TARGETS = ['C6H6(GT)', 'NO2(GT)', 'NOx(GT)', 'PT08.S5(O3)', 'PT08.S4(NO2)']
+
+LAGS = 3                # lag features, as in the Milestone 2 notebook
+MAX_HORIZON = 48        # longest "Forecast Horizon" option, in hours
+TRAIN_FRACTION = 0.8
+ARIMA_ORDER = (3, 1, 2)
+ARIMA_HISTORY = 24 * 14  # hours of recent data the ARIMA state is rebuilt from
+RIDGE_ALPHA = 10.0      # L2 penalty of the feature model, on standardised features
+
+
+def recent_hourly(df, columns, hours=None):
+    """``hourly_frame`` of ``columns`` over the last ``hours`` hours of ``df`` (all when None)."""
+    since = None
+    if hours is not None:
+        since = pd.Timestamp(df[DATETIME_COL].iloc[-1]).floor('h') - pd.Timedelta(hours=hours - 1)
+    return hourly_frame(df, columns, since)
+
+
+def hourly_series(df, column, hours=None):
+    """Hourly mean of ``column`` with gaps forward-filled (Milestone 2 preprocessing)."""
+    return recent_hourly(df, [column], hours)[column].dropna()
+
+
+def lag_matrix(values, lags=LAGS):
+    """Rows of ``lags`` consecutive values (oldest first) and the value that follows each."""
+    windows = np.lib.stride_tricks.sliding_window_view(values, lags + 1)
+    return windows[:, :-1], windows[:, -1]
+
+
+def evaluate(true, pred):
+    """R², MAE and RMSE, as reported in the Milestone 1 notebook."""
+    true = np.asarray(true, dtype=np.float64)
+    pred = np.asarray(pred, dtype=np.float64)
+    err = true - pred
+    total = ((true - true.mean()) ** 2).sum()
+    return {
+        'r2': float(1 - (err ** 2).sum() / total) if total > 0 else float('nan'),
+        'mae': float(np.abs(err).mean()),
+        'rmse': float(np.sqrt((err ** 2).mean())),
+    }
+
+
+# ----------------------------
+# 🤖 MODELS
+# ----------------------------
+class _LagModel:
+    """Recursive multi-step forecaster over the last ``LAGS`` hourly values."""
+
+    def __init__(self, lags=LAGS):
+        self.lags = lags
+
+    @property
+    def history(self):
+        return self.lags
+
+    def fit(self, series, hourly=None):
+        X, y = lag_matrix(series.to_numpy(), self.lags)
+        self._fit(X, y)
+        return self
+
+    def forecast(self, series, steps, hourly=None):
+        window = list(series.to_numpy()[-self.lags:])
+        out = np.empty(steps)
+        for i in range(steps):
+            out[i] = self._predict_one(np.asarray(window[-self.lags:]))
+            window.append(out[i])
+        return out
+
+
+class LinearLagModel(_LagModel):
+    """Least-squares autoregression on lag features; needs only NumPy."""
+
+    name = 'Linear'
+
+    def _fit(self, X, y):
+        design = np.column_stack([np.ones(len(X)), X])
+        self.coef_, *_ = np.linalg.lstsq(design, y, rcond=None)
+
+    def _predict_one(self, window):
+        return self.coef_[0] + window @ self.coef_[1:]
+
+
+class FeatureModel:
+    """Direct multi-horizon ridge regression on the ``features`` pipeline; needs only NumPy.
+
+    One solve maps the feature row of the latest hour (lags, rolling stats,
+    calendar and cross-pollutant shares of every sensor column) to all
+    ``MAX_HORIZON`` following hours, so forecasting needs no recursion.
+    """
+
+    name = 'Features'
+
+    def __init__(self, spec=DEFAULT_SPEC, alpha=RIDGE_ALPHA):
+        self.spec = spec
+        self.alpha = alpha
+
+    @property
+    def history(self):
+        return self.spec.history
+
+    @property
+    def columns(self):
+        return list(self.spec.columns)
+
+    def _features(self, series, hourly, hours=None):
+        hourly = series.to_frame() if hourly is None else hourly.loc[:series.index[-1]]
+        if hours is not None:
+            hourly = hourly.iloc[-hours:]
+        return hourly, build_features(hourly[self.columns].to_numpy(), hourly.index, self.spec)
+
+    def fit(self, series, hourly=None, features=None):
+        """Fit on ``series`` and the other columns of ``hourly``.
+
+        ``features`` may hold the ``build_features`` rows of ``hourly`` for
+        this model's spec, computed once and shared (e.g. by backtest folds).
+        """
+        if hourly is None:
+            hourly = series.to_frame()
+        columns = [c for c in self.spec.columns if c in hourly.columns]
+        if series.name not in columns:
+            columns.append(series.name)
+        self.spec = replace(self.spec, columns=tuple(columns))
+        if features is None:
+            hourly, X = self._features(series, hourly)
+        else:
+            hourly = hourly.loc[:series.index[-1]]
+            X = features[:len(hourly)]
+            if X.shape[1] != len(self.spec.names()):
+                raise ValueError(f"features have {X.shape[1]} columns, the spec needs {len(self.spec.names())}")
+        y = hourly[series.name].to_numpy(np.float64)
+        # Row t is paired with the hours t+1 .. t+MAX_HORIZON.
+        Y = np.lib.stride_tricks.sliding_window_view(y[1:], MAX_HORIZON)
+        X = X[:len(Y)]
+        keep = np.isfinite(X).all(axis=1) & np.isfinite(Y).all(axis=1)
+        X, Y = X[keep], Y[keep]
+        if not len(X):
+            raise ValueError(f"Not enough hourly data for {self.spec.history}-hour features")
+        self.mean_ = X.mean(axis=0)
+        self.scale_ = X.std(axis=0)
+        self.scale_[self.scale_ == 0] = 1
+        design = np.column_stack([np.ones(len(X)), (X - self.mean_) / self.scale_])
+        penalty = self.alpha * np.eye(design.shape[1])
+        penalty[0, 0] = 0   # the intercept is not shrunk
+        self.coef_ = np.linalg.solve(design.T @ design + penalty, design.T @ Y)
+        return self
+
+    def forecast(self, series, steps, hourly=None):
+        if steps > MAX_HORIZON:
+            raise ValueError(f"Forecasts at most {MAX_HORIZON} hours")
+        # Only the last ``history`` hours are needed for the latest feature row.
+        _, X = self._features(series, hourly, self.history)
+        row = (X[-1] - self.mean_) / self.scale_
+        return self.coef_[0, :steps] + row @ self.coef_[1:, :steps]
+
+
+class XGBoostLagModel(_LagModel):
+    name = 'XGBoost'
+
+    def _fit(self, X, y):
+        import xgboost as xgb
+
+        self.model_ = xgb.XGBRegressor(objective='reg:squarederror', n_estimators=100)
+        self.model_.fit(X, y)
+
+    def _predict_one(self, window):
+        return float(self.model_.predict(window[None, :])[0])
+
+
+class RandomForestLagModel(_LagModel):
+    """Random forest on lag features, as in the Milestone 1 model comparison."""
+
+    name = 'RandomForest'
+
+    def _fit(self, X, y):
+        from sklearn.ensemble import RandomForestRegressor
+
+        self.model_ = RandomForestRegressor(random_state=42)
+        self.model_.fit(X, y)
+
+    def _predict_one(self, window):
+        return float(self.model_.predict(window[None, :])[0])
+
+
+class LSTMLagModel(_LagModel):
+    """The Milestone 2 LSTM: 50 ReLU units over min-max scaled lag windows."""
+
+    name = 'LSTM'
+
+    def _fit(self, X, y):
+        from tensorflow.keras.layers import LSTM, Dense, Input
+        from tensorflow.keras.models import Sequential
+
+        self.low_ = float(min(X.min(), y.min()))
+        self.span_ = float(max(X.max(), y.max())) - self.low_ or 1.0
+        self.model_ = Sequential([Input((self.lags, 1)), LSTM(50, activation='relu'), Dense(1)])
+        self.model_.compile(optimizer='adam', loss='mse')
+        self.model_.fit(self._scale(X)[:, :, None], self._scale(y), epochs=50, batch_size=32, verbose=0)
+
+    def _scale(self, values):
+        return (values - self.low_) / self.span_
+
+    def _predict_one(self, window):
+        # Calling the model directly avoids predict()'s per-call setup in the recursive loop.
+        scaled = self.model_(self._scale(window)[None, :, None], training=False)
+        return float(np.asarray(scaled)[0, 0]) * self.span_ + self.low_
+
+
+class ArimaModel:
+    name = 'ARIMA'
+    history = ARIMA_HISTORY
+
+    def fit(self, series, hourly=None):
+        from statsmodels.tsa.arima.model import ARIMA
+
+        self.result_ = ARIMA(series, order=ARIMA_ORDER).fit()
+        return self
+
+    def forecast(self, series, steps, hourly=None):
+        # Re-apply the fitted parameters to the latest history without refitting.
+        recent = self.result_.apply(series.iloc[-ARIMA_HISTORY:])
+        return np.asarray(recent.forecast(steps), dtype=np.float64)
+
+
+class ProphetModel:
+    name = 'Prophet'
+    history = 1
+
+    def fit(self, series, hourly=None):
+        from prophet import Prophet
+
+        self.model_ = Prophet(yearly_seasonality=True)
+        self.model_.fit(pd.DataFrame({'ds': series.index, 'y': series.to_numpy()}))
+        return self
+
+    def forecast(self, series, steps, hourly=None):
+        future = pd.date_range(series.index[-1], periods=steps + 1, freq='h')[1:]
+        return self.model_.predict(pd.DataFrame({'ds': future}))['yhat'].to_numpy()
+
+
+# Tried in order; a candidate whose library is missing is skipped.
+CANDIDATES = {
+    'Linear': (LinearLagModel, None),
+    'Features': (FeatureModel, None),
+    'XGBoost': (XGBoostLagModel, 'xgboost'),
+    'RandomForest': (RandomForestLagModel, 'sklearn'),
+    'ARIMA': (ArimaModel, 'statsmodels'),
+    'Prophet': (ProphetModel, 'prophet'),
+    'LSTM': (LSTMLagModel, 'tensorflow'),
+}
+
+
+def available_candidates():
+    names = []
+    for name, (_, module) in CANDIDATES.items():
+        if module is not None:
+            try:
+                __import__(module)
+            except ImportError:
+                continue
+        names.append(name)
+    return names
+
+
+# ----------------------------
+# 🏋️ TRAINING
+# ----------------------------
+def train_target(series, candidates=None, hourly=None):
+    """Score every candidate on a temporal split and refit the best on all data.
+
+    ``hourly`` is the hourly frame ``series`` was taken from; without it the
+    feature model sees only the target. Returns ``(model, report)`` where
+    ``report`` holds per-candidate metrics and the name of the selected model.
+    """
+    candidates = candidates or available_candidates()
+    split = int(len(series) * TRAIN_FRACTION)
+    train, test = series.iloc[:split], series.iloc[split:split + MAX_HORIZON]
+    if len(train) <= LAGS or test.empty:
+        raise ValueError(f"Not enough hourly data to train {series.name!r}: {len(series)} points")
+
+    scores = {}
+    for name in candidates:
+        try:
+            model = CANDIDATES[name][0]().fit(train, hourly)
+            scores[name] = evaluate(test.to_numpy(), model.forecast(train, len(test), hourly))
+        except Exception as exc:  # a failing candidate must not stop the others
+            scores[name] = {'error': str(exc)}
+
+    ranked = [n for n in scores if 'rmse' in scores[n] and np.isfinite(scores[n]['rmse'])]
+    if not ranked:
+        raise RuntimeError(f"No forecasting model could be trained for {series.name!r}: {scores}")
+    best = min(ranked, key=lambda n: scores[n]['rmse'])
+    model = CANDIDATES[best][0]().fit(series, hourly)
+    return model, {'model': best, 'metrics': scores}
+
+
+def _slug(column):
+    return ''.join(ch if ch.isalnum() else '_' for ch in column).strip('_')
+
+
+def save_models(models, reports, model_dir=MODEL_DIR, source=CLEANED_CSV):
+    """Write a new artifact version and make it current. Returns the version name."""
+    version = time.strftime('v%Y%m%d-%H%M%S')
+    version_dir = os.path.join(model_dir, version)
+    suffix = 0
+    while os.path.exists(version_dir):
+        suffix += 1
+        version_dir = os.path.join(model_dir, f"{version}-{suffix}")
+    version = os.path.basename(version_dir)
+    os.makedirs(version_dir)
+
+    targets = {}
+    for column, model in models.items():
+        filename = _slug(column) + ".pkl"
+        with open(os.path.join(version_dir, filename), 'wb') as f:
+            pickle.dump(model, f)
+        targets[column] = dict(reports[column], file=filename)
+
+    manifest = {
+        'artifact_version': ARTIFACT_VERSION,
+        'version': version,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source_sha256': file_sha256(source) if os.path.exists(source) else None,
+        'lags': LAGS,
+        'max_horizon': MAX_HORIZON,
+        'targets': targets,
+    }
+    with open(os.path.join(version_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    activate_version(version, model_dir)
+    return version
+
+
+def activate_version(version, model_dir=MODEL_DIR):
+    """Atomically point ``CURRENT`` at ``version``."""
+    pointer = os.path.join(model_dir, CURRENT_FILE)
+    tmp = pointer + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp, pointer)
+
+
+def current_version(model_dir=MODEL_DIR):
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def train_column(source, column, candidates=None):
+    """Train one target straight from ``source``; the unit of work for parallel retraining."""
+    hourly = hourly_frame(load_cleaned_data(source))
+    return train_target(hourly[column].dropna(), candidates, hourly)
+
+
+def train_all(df, targets=DEFAULT_TARGETS, candidates=None, model_dir=MODEL_DIR, source=CLEANED_CSV):
+    """Train every target, save a new version and return ``(version, reports)``."""
+    models, reports = {}, {}
+    hourly = hourly_frame(df)   # every sensor column in one resample
+    for column in targets:
+        models[column], reports[column] = train_target(hourly[column].dropna(), candidates, hourly)
+    return save_models(models, reports, model_dir, source), reports
+
+
+# ----------------------------
+# 🔮 INFERENCE
+# ----------------------------
+class Forecaster:
+    """Models of one artifact version with memoised predictions.
+
+    Models are unpickled on first use, so a process that only shows one
+    pollutant never imports the libraries (XGBoost, statsmodels, Prophet)
+    behind the others; ``load_all`` preloads them, e.g. from a warm-up thread.
+    """
+
+    def __init__(self, version, manifest, version_dir):
+        self.version = version
+        self.manifest = manifest
+        self.version_dir = version_dir
+        self._models = {}
+        self._lock = threading.Lock()
+        self._predictions = {}
+
+    @property
+    def targets(self):
+        return list(self.manifest['targets'])
+
+    def model_name(self, column):
+        return self.manifest['targets'][column]['model']
+
+    def model(self, column):
+        with self._lock:
+            model = self._models.get(column)
+            if model is None:
+                info = self.manifest['targets'][column]
+                with open(os.path.join(self.version_dir, info['file']), 'rb') as f:
+                    model = self._models[column] = pickle.load(f)
+        return model
+
+    def load_all(self):
+        for column in self.targets:
+            self.model(column)
+
+    def predict(self, df, column, horizon):
+        """The first ``horizon`` hours of the ``MAX_HORIZON``-hour forecast of ``column``.
+
+        Memoised per column on the last timestamp of ``df``, so other
+        horizons only slice the cached array.
+        """
+        key = pd.Timestamp(df[DATETIME_COL].iloc[-1])
+        cached = self._predictions.get(key)
+        if cached is None:
+            cached = {}
+            self._predictions = {key: cached}
+        forecast = cached.get(column)
+        if forecast is None:
+            model = self.model(column)
+            # Only the hours the model forecasts from, not the whole history
+            hourly = recent_hourly(df, getattr(model, 'columns', [column]), model.history)
+            forecast = model.forecast(hourly[column].dropna(), MAX_HORIZON, hourly)
+            forecast = cached[column] = np.maximum(forecast, 0)
+        return forecast[:horizon]
+
+    def predict_all(self, df):
+        """``MAX_HORIZON``-hour forecasts for every target, keyed by column."""
+        return {column: self.predict(df, column, MAX_HORIZON) for column in self.targets}
+
+
+# Loaded once per process and artifact version.
+_FORECASTERS = {}
+
+
+def load_forecaster(model_dir=MODEL_DIR):
+    """Return the ``Forecaster`` for the current version, or None if none is trained.
+
+    Only the manifest is read here; models load when first predicted with.
+    """
+    version = current_version(model_dir)
+    if version is None:
+        return None
+    key = (os.path.abspath(model_dir), version)
+    forecaster = _FORECASTERS.get(key)
+    if forecaster is None:
+        version_dir = os.path.join(model_dir, version)
+        with open(os.path.join(version_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('artifact_version') != ARTIFACT_VERSION:
+            return None
+        forecaster = Forecaster(version, manifest, version_dir)
+        for stale in [k for k in _FORECASTERS if k[0] == key[0]]:
+            del _FORECASTERS[stale]
+        _FORECASTERS[key] = forecaster
+    return forecaster
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and save the dashboard forecast models.")
+    parser.add_argument("--source", default=CLEANED_CSV, help="cleaned dataset to train on")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--targets", nargs="+", default=DEFAULT_TARGETS)
+    parser.add_argument("--models", nargs="+", choices=list(CANDIDATES),
+                        help="candidates to try (default: every installed one)")
+    args = parser.parse_args()
+
+    df = load_cleaned_data(args.source)
+    version, reports = train_all(df, args.targets, args.models, args.model_dir, args.source)
+    print(f"Saved model version {version}")
+    for column, report in reports.items():
+        best = report['metrics'][report['model']]
+        print(f"  {column}: {report['model']} (MAE {best['mae']:.3f}, RMSE {best['rmse']:.3f})")
+
+
+if __name__ == "__main__":
+    # Go through the importable module so pickled models reference
+    # ``forecasting.*`` rather than ``__main__.*``.
+    import forecasting
+    forecasting.main()
@@ -0,0 +1,176 @@
+"""Streaming ingestion of raw UCI-format ``AirQuality.csv`` files.
+
+Reproduces the Milestone 1/2 notebook cleaning (``;`` separator, ``,``
+decimals, ``-200`` missing-value sentinel, ``18.00.00`` time format,
+Date+Time merge, trailing empty columns dropped) as a chunked pipeline.
+Each chunk is parsed straight into float32 columns and cleaned with
+vectorized operations, flagged by ``quality.QualityDetector`` (which carries
+only the last few readings from chunk to chunk) and appended to the output
+with its ``Quality`` column, so memory stays bounded by the chunk size
+rather than the file size.
+
+Usage:
+    python ingest.py AirQuality.csv AirQuality_cleaned.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATETIME_COL, QUALITY_COL, SENSOR_COLUMNS, SENSOR_DTYPE
+from quality import QualityDetector
+
+# ----------------------------
+# 📄 RAW FORMAT
+# ----------------------------
+RAW_SEPARATOR = ';'
+RAW_DECIMAL = ','
+RAW_DATETIME_FORMAT = '%d/%m/%Y %H.%M.%S'
+RAW_COLUMNS = ['Date', 'Time'] + SENSOR_COLUMNS
+MISSING_SENTINEL = -200
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def read_raw_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield raw chunks with fixed dtypes; the trailing empty columns are skipped."""
+    dtypes = {'Date': str, 'Time': str}
+    dtypes.update({col: SENSOR_DTYPE for col in SENSOR_COLUMNS})
+    return pd.read_csv(
+        path,
+        sep=RAW_SEPARATOR,
+        decimal=RAW_DECIMAL,
+        usecols=RAW_COLUMNS,
+        dtype=dtypes,
+        chunksize=chunksize,
+    )
+
+
+def clean_chunk(chunk, drop_incomplete=False):
+    """Clean one raw chunk into the ``AirQuality_cleaned.csv`` layout.
+
+    Returns the cleaned frame and the number of sentinel values masked.
+    Rows holding missing readings are kept as NaN for ``imputation.py`` to
+    fill; with ``drop_incomplete`` they are dropped, as in Milestone 2.
+    """
+    chunk = chunk.dropna(subset=['Date', 'Time'])
+
+    values = chunk[SENSOR_COLUMNS].to_numpy(dtype=SENSOR_DTYPE, copy=True)
+    sentinel = values == MISSING_SENTINEL
+    values[sentinel] = np.nan
+
+    stamps = pd.to_datetime(
+        chunk['Date'].str.cat(chunk['Time'], sep=' '),
+        format=RAW_DATETIME_FORMAT,
+        errors='coerce',
+    )
+
+    cleaned = pd.DataFrame(values, columns=SENSOR_COLUMNS)
+    cleaned.insert(0, DATETIME_COL, stamps.to_numpy())
+    keep = cleaned[DATETIME_COL].notna().to_numpy(copy=True)
+    if drop_incomplete:
+        keep &= ~np.isnan(values).any(axis=1)
+    return cleaned[keep].reset_index(drop=True), int(sentinel.sum())
+
+
+class _ChunkWriter:
+    """Append cleaned chunks to a CSV or Parquet file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self._parquet = path.endswith(".parquet")
+        self._writer = None
+        self._started = False
+
+    def write(self, frame):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(
+                self.tmp_path,
+                mode='a' if self._started else 'w',
+                header=not self._started,
+                index=False,
+                date_format='%Y-%m-%d %H:%M:%S',
+            )
+        self._started = True
+
+    def close(self):
+        """Move the finished file over ``path``."""
+        if self._writer is not None:
+            self._writer.close()
+        if self._started:
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Drop the partial file, leaving any existing ``path`` untouched."""
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def ingest_raw(source, dest, chunksize=DEFAULT_CHUNKSIZE, drop_incomplete=False):
+    """Stream ``source`` into ``dest`` chunk by chunk and return ingest stats.
+
+    Duplicate timestamps are dropped across the whole file; only the set of
+    already written timestamps (int64) is kept between chunks. Rows must be
+    in time order for the quality checks to see each reading's predecessors.
+    """
+    stats = {'rows_read': 0, 'rows_written': 0, 'sentinels': 0, 'duplicates': 0, 'flagged': 0}
+    seen = np.empty(0, dtype=np.int64)
+    detector = QualityDetector()
+    writer = _ChunkWriter(dest)
+    try:
+        for chunk in read_raw_chunks(source, chunksize):
+            stats['rows_read'] += len(chunk)
+            cleaned, sentinels = clean_chunk(chunk, drop_incomplete)
+            stats['sentinels'] += sentinels
+
+            stamps = cleaned[DATETIME_COL].to_numpy('datetime64[ns]').view(np.int64)
+            fresh = ~pd.Series(stamps).duplicated().to_numpy()
+            fresh &= ~np.isin(stamps, seen)
+            stats['duplicates'] += int((~fresh).sum())
+            cleaned = cleaned[fresh]
+            if cleaned.empty:
+                continue
+
+            seen = np.union1d(seen, stamps[fresh])
+            cleaned = detector.flag(cleaned)
+            stats['flagged'] += int((cleaned[QUALITY_COL] != 0).sum())
+            writer.write(cleaned)
+            stats['rows_written'] += len(cleaned)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean a raw UCI AirQuality.csv file.")
+    parser.add_argument("source", help="raw semicolon-delimited CSV")
+    parser.add_argument("dest", help="output .csv or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--drop-incomplete", action="store_true",
+                        help="drop rows with missing readings (Milestone 2) instead of keeping them as NaN")
+    args = parser.parse_args()
+
+    stats = ingest_raw(args.source, args.dest, args.chunksize, args.drop_incomplete)
+    print(f"Read {stats['rows_read']} rows, wrote {stats['rows_written']} "
+          f"({stats['sentinels']} sentinel values masked, "
+          f"{stats['duplicates']} duplicate timestamps dropped, "
+          f"{stats['flagged']} rows with readings flagged by the quality checks)")
+
+
+if __name__ == "__main__":
+    main()
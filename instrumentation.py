@@ -0,0 +1,318 @@
+"""Per-rerun timing, cache and memory instrumentation for the Streamlit apps.
+
+A dashboard calls ``start_rerun`` at the top of its script and
+``finish_rerun`` at the end. Sections in between are timed with the
+``span`` context manager or the ``timed`` decorator; spans nest, so a cached
+loader that calls another shows up inside it. ``track_cache`` wraps an
+``st.cache_data``/``st.cache_resource`` decorator so every call is timed and
+counted, and calls that reach the function body are counted as misses.
+
+Each finished rerun is appended as one JSON line to ``METRICS_LOG`` with its
+app, session, spans, cache counts and resident memory at start and end.
+Process-wide totals are rewritten to ``PROMETHEUS_FILE`` in the Prometheus
+text format, ready for a node_exporter textfile collector.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+from data_loader import CACHE_DIR
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+METRICS_LOG = os.path.join(CACHE_DIR, "metrics.jsonl")
+PROMETHEUS_FILE = os.path.join(CACHE_DIR, "metrics.prom")
+METRIC_PREFIX = "airaware"
+
+_local = threading.local()
+_lock = threading.Lock()
+_open = {}      # session -> unfinished Rerun
+
+# Process-wide totals for the Prometheus export.
+_span_totals = defaultdict(lambda: [0, 0.0])              # (app, span) -> [count, seconds]
+_cache_totals = defaultdict(lambda: {'calls': 0, 'misses': 0})   # (app, function) -> counts
+_rerun_totals = defaultdict(lambda: [0, 0.0])             # app -> [count, seconds]
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where unsupported."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class Rerun:
+    """Spans, cache counts and memory of one script run."""
+
+    def __init__(self, app, session):
+        self.app = app
+        self.session = session
+        self.started = time.time()
+        self.spans = []     # {'name', 'seconds', 'depth'} in completion order
+        self.cache = defaultdict(lambda: {'calls': 0, 'misses': 0})
+        self.rss_start = rss_bytes()
+        self.rss_end = None
+        self.seconds = None
+        self.status = 'running'
+        self._t0 = time.perf_counter()
+        self._depth = 0
+
+    def to_dict(self):
+        return {
+            'app': self.app,
+            'session': self.session,
+            'time': pd.Timestamp(self.started, unit='s').isoformat(),
+            'status': self.status,
+            'seconds': self.seconds,
+            'spans': self.spans,
+            'cache': dict(self.cache),
+            'rss_start': self.rss_start,
+            'rss_end': self.rss_end,
+        }
+
+
+def current_rerun():
+    """The rerun being executed by this thread, or None."""
+    return getattr(_local, 'rerun', None)
+
+
+# ----------------------------
+# ⏱️ RERUNS AND SPANS
+# ----------------------------
+def start_rerun(app, session):
+    """Begin instrumenting a script run of ``app`` for ``session``.
+
+    A previous run of the same session that never finished (e.g. cut short
+    by ``st.stop`` or ``st.rerun``) is recorded as interrupted first.
+    """
+    with _lock:
+        previous = _open.pop(session, None)
+    if previous is not None:
+        _finish(previous, 'interrupted')
+    rerun = Rerun(app, session)
+    with _lock:
+        _open[session] = rerun
+    _local.rerun = rerun
+    return rerun
+
+
+def finish_rerun(status='ok'):
+    """Close this thread's rerun, export it and return it (None if there is none)."""
+    rerun = current_rerun()
+    _local.rerun = None
+    if rerun is None:
+        return None
+    with _lock:
+        if _open.get(rerun.session) is rerun:
+            del _open[rerun.session]
+    _finish(rerun, status)
+    return rerun
+
+
+def _finish(rerun, status):
+    if rerun.status != 'running':
+        return
+    rerun.status = status
+    rerun.seconds = time.perf_counter() - rerun._t0
+    rerun.rss_end = rss_bytes()
+    with _lock:
+        totals = _rerun_totals[rerun.app]
+        totals[0] += 1
+        totals[1] += rerun.seconds
+    write_record(rerun.to_dict())
+    write_prometheus()
+
+
+class span:
+    """Time a section of the current rerun: ``with span('forecast'): ...``."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.rerun = current_rerun()
+        if self.rerun is not None:
+            self.depth = self.rerun._depth
+            self.rerun._depth += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        rerun = self.rerun
+        app = None
+        if rerun is not None:
+            rerun._depth -= 1
+            rerun.spans.append({'name': self.name, 'seconds': seconds, 'depth': self.depth})
+            app = rerun.app
+        with _lock:
+            totals = _span_totals[(app, self.name)]
+            totals[0] += 1
+            totals[1] += seconds
+        return False
+
+
+def timed(name=None):
+    """Decorator running the function inside ``span(name or its name)``."""
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _count_cache(name, field):
+    rerun = current_rerun()
+    app = None
+    if rerun is not None:
+        rerun.cache[name][field] += 1
+        app = rerun.app
+    with _lock:
+        _cache_totals[(app, name)][field] += 1
+
+
+def track_cache(cache, name=None):
+    """Apply a Streamlit cache decorator with timing and hit/miss counting.
+
+    ``@track_cache(st.cache_data)`` replaces ``@st.cache_data``; the
+    returned function keeps the cache's ``clear()``.
+    """
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            _count_cache(label, 'misses')
+            return func(*args, **kwargs)
+
+        cached = cache(compute)
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            _count_cache(label, 'calls')
+            with span(label):
+                return cached(*args, **kwargs)
+
+        call.clear = cached.clear
+        return call
+    return decorate
+
+
+# ----------------------------
+# 📤 EXPORT
+# ----------------------------
+def write_record(record, path=METRICS_LOG):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_records(path=METRICS_LOG, limit=200):
+    """Last ``limit`` rerun records, oldest first."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()[-limit:]
+    except OSError:
+        return []
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def _labels(**labels):
+    parts = []
+    for key, value in labels.items():
+        if value is not None:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def prometheus_text():
+    """Process-wide totals in the Prometheus text exposition format."""
+    p = METRIC_PREFIX
+    with _lock:
+        spans = {k: list(v) for k, v in _span_totals.items()}
+        caches = {k: dict(v) for k, v in _cache_totals.items()}
+        reruns = {k: list(v) for k, v in _rerun_totals.items()}
+
+    lines = [f"# HELP {p}_rerun_seconds Wall time of whole script reruns.",
+             f"# TYPE {p}_rerun_seconds summary"]
+    for app, (count, seconds) in sorted(reruns.items()):
+        lines.append(f"{p}_rerun_seconds_sum{_labels(app=app)} {seconds:.6f}")
+        lines.append(f"{p}_rerun_seconds_count{_labels(app=app)} {count}")
+
+    lines += [f"# HELP {p}_span_seconds Time spent in instrumented sections.",
+              f"# TYPE {p}_span_seconds summary"]
+    for (app, name), (count, seconds) in sorted(spans.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+        lines.append(f"{p}_span_seconds_sum{_labels(app=app, span=name)} {seconds:.6f}")
+        lines.append(f"{p}_span_seconds_count{_labels(app=app, span=name)} {count}")
+
+    for field, help_text in (('calls', 'Calls of cached functions.'),
+                             ('misses', 'Cached function calls that ran the function body.')):
+        lines += [f"# HELP {p}_cache_{field}_total {help_text}",
+                  f"# TYPE {p}_cache_{field}_total counter"]
+        for (app, name), counts in sorted(caches.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+            lines.append(f"{p}_cache_{field}_total{_labels(app=app, function=name)} {counts[field]}")
+
+    rss = rss_bytes()
+    if rss is not None:
+        lines += [f"# HELP {p}_resident_memory_bytes Resident set size of the app process.",
+                  f"# TYPE {p}_resident_memory_bytes gauge",
+                  f"{p}_resident_memory_bytes{_labels(pid=os.getpid())} {rss}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=PROMETHEUS_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)
+
+
+# ----------------------------
+# 🖥️ OVERLAY
+# ----------------------------
+def span_table(rerun):
+    """Spans of a rerun in start order, indented by nesting, with their share of the run."""
+    total = rerun.seconds or (time.perf_counter() - rerun._t0)
+    rows = []
+    # Spans are recorded as they finish; a parent follows its children.
+    pending = []
+    for item in rerun.spans:
+        children = [c for c in pending if c['depth'] > item['depth']]
+        pending = [c for c in pending if c['depth'] <= item['depth']] + [dict(item, children=children)]
+
+    def walk(items):
+        for item in items:
+            rows.append({
+                'Section': '\u2003' * item['depth'] + item['name'],
+                'ms': round(item['seconds'] * 1000, 1),
+                'Share': f"{item['seconds'] / total:.0%}" if total else '',
+            })
+            walk(item['children'])
+    walk(pending)
+    return pd.DataFrame(rows, columns=['Section', 'ms', 'Share'])
+
+
+def cache_table(rerun):
+    rows = [{'Function': name, 'Calls': c['calls'], 'Hits': c['calls'] - c['misses'], 'Misses': c['misses']}
+            for name, c in rerun.cache.items()]
+    return pd.DataFrame(rows, columns=['Function', 'Calls', 'Hits', 'Misses'])
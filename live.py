@@ -0,0 +1,393 @@
+"""Live ingest service: batched sensor readings in, update notifications out.
+
+Readings use the ``AirQuality_cleaned.csv`` layout (``Datetime`` plus the
+sensor columns) and arrive over
+
+    HTTP      ``POST /readings`` with a CSV body (``Content-Type: text/csv``)
+              or a JSON object or array of objects
+    a socket  a local Unix socket taking one JSON object or array per line
+
+Each request is validated like an admin upload and answered at once;
+accepted rows wait in an in-memory buffer. A flusher writes the buffer
+every ``FLUSH_INTERVAL`` seconds, or as soon as ``MAX_BATCH_ROWS`` are
+waiting, as one deduplicated partition (``uploads.append_rows``). It then
+extends the memory-mapped file when one is in use and runs the new rows,
+with readings flagged by ``quality.py`` masked, through the persisted
+``AlertEngine``. Rows stored by anyone else since its last write (all of
+them on the first write) are evaluated first; ``alerts.py`` describes how
+evaluators share the engine state.
+
+The service keeps the last ``TAIL_ROWS`` stored rows in memory with the
+dataset key they belong to, deduplicates and flags each batch against them,
+and drops readings older than the tail as late. A flush reads only the
+partitions other writers added since that key (``data_loader.appended_rows``)
+and appends the batch to the mapped file in place, so its cost follows the
+batch and those partitions rather than the history. The full dataset is read
+on the first flush, and again only when the source CSV itself changes.
+Once more than ``MAX_PARTITIONS`` partitions exist the small ones are merged
+(``data_loader.merge_partitions``).
+
+After each write the service bumps the update feed: ``FEED_FILE`` holds the
+latest ``{seq, start, end, rows, events}`` and ``GET /events`` streams the
+same records as server-sent events. The Streamlit dashboard polls the feed
+file (one small JSON read) and reruns when ``seq`` moves; its caches are
+keyed on ``dataset_key()``, and the mapped file it reads was already
+extended here, so the rerun maps the new rows without rebuilding anything
+(without a mapped file, the caches refresh from the new rows).
+
+Usage:
+    python live.py --port 8765 --socket .cache/live.sock
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from alerts import AlertEngine
+from data_loader import (CACHE_DIR, CLEANED_CSV, appended_rows, list_partitions, load_snapshot,
+                         merge_partitions, merged_key, new_rows, partition_key)
+from mapped import extend_mapped, rekey_mapped
+from quality import QualityDetector, mask_flagged
+from uploads import append_rows, validate_upload
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+HOST = "127.0.0.1"
+PORT = 8765
+FEED_FILE = os.path.join(CACHE_DIR, "live.feed.json")
+
+FLUSH_INTERVAL = 10.0       # seconds between writes of buffered readings
+MAX_BATCH_ROWS = 5000       # write early once this many readings are waiting
+MAX_BODY_BYTES = 16 << 20
+MAX_PARTITIONS = 32         # merge small partitions once there are more than this
+
+# Stored rows kept in memory: the quality checks' context and the window a
+# reading can arrive late in and still be deduplicated.
+TAIL_ROWS = QualityDetector.history
+KEEPALIVE = 15.0            # seconds between SSE comments on an idle stream
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def read_feed(path=FEED_FILE):
+    """The latest update record, or None before the first write."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def parse_readings(body, content_type=''):
+    """A frame of raw readings from a CSV or JSON request body."""
+    if 'csv' in content_type:
+        return pd.read_csv(io.BytesIO(body))
+    try:
+        records = json.loads(body)
+    except ValueError as exc:
+        raise ValueError(f"Body is neither CSV nor JSON: {exc}") from None
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list):
+        raise ValueError("JSON body must be an object or an array of objects")
+    return pd.DataFrame.from_records(records)
+
+
+# ----------------------------
+# 📥 INGEST
+# ----------------------------
+class LiveIngest:
+    """Buffer, micro-batch writer and update feed of the live service."""
+
+    def __init__(self, path=CLEANED_CSV, cache_dir=CACHE_DIR, feed_path=FEED_FILE,
+                 flush_interval=FLUSH_INTERVAL, max_batch_rows=MAX_BATCH_ROWS, engine=None):
+        self.path = path
+        self.cache_dir = cache_dir
+        self.feed_path = feed_path
+        self.flush_interval = flush_interval
+        self.max_batch_rows = max_batch_rows
+        self.engine = engine if engine is not None else AlertEngine.load()
+        previous = read_feed(feed_path)
+        self.seq = previous['seq'] if previous else 0
+        self._buffer = []
+        self._buffered = 0
+        self._tail = None       # latest stored rows, with Quality
+        self._key = None        # dataset key of the rows stored as of its last write
+        self._wake = asyncio.Event()
+        self._listeners = set()
+        # One writer thread keeps partition writes and alert state in order.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live-writer")
+
+    @property
+    def buffered(self):
+        return self._buffered
+
+    def accept(self, frame):
+        """Validate raw readings and buffer the valid rows; returns the request's stats."""
+        rows, invalid = validate_upload(frame)
+        if len(rows):
+            self._buffer.append(rows)
+            self._buffered += len(rows)
+            if self._buffered >= self.max_batch_rows:
+                self._wake.set()
+        return {'accepted': len(rows), 'invalid': invalid, 'buffered': self._buffered}
+
+    def _write(self, batch):
+        """Store one batch and evaluate its alerts (runs on the writer thread)."""
+        key, added = appended_rows(self._key, self.path, self.cache_dir, keep_flags=True)
+        events = []
+        if added is None and key != self._key:  # first write, or the source changed
+            key, stored = load_snapshot(self.path, self.cache_dir, keep_flags=True)
+            events = self.engine.process(mask_flagged(stored).reset_index())
+            self._tail = stored.iloc[-TAIL_ROWS:]
+        elif added is not None:     # other writers appended
+            events = self.engine.process(mask_flagged(added).reset_index())
+            if len(self._tail):
+                added = added[added.index >= self._tail.index[0]]
+            added = new_rows(self._tail.index, added)
+            self._tail = pd.concat([self._tail, added]).sort_index().iloc[-TAIL_ROWS:]
+        batch = batch[~batch.index.duplicated(keep='first')].sort_index()
+        stats = append_rows(batch, self.path, self.cache_dir, stored=self._tail)
+        rows = stats.pop('rows')
+        if not stats['rows_appended']:
+            self._key = key
+            return stats, events
+        self._tail = pd.concat([self._tail, rows]).sort_index().iloc[-TAIL_ROWS:]
+        rows = mask_flagged(rows)
+        self._key = partition_key(key, [stats['partition']])
+        extend_mapped(rows, key, self._key, self.path, self.cache_dir)
+        if len(list_partitions(self.path, self.cache_dir)) > MAX_PARTITIONS:
+            merged = merged_key(self._key, merge_partitions(self.path, self.cache_dir))
+            rekey_mapped(self._key, merged, self.path, self.cache_dir)
+            self._key = merged
+        # The engine's windows carry the earlier readings.
+        events += self.engine.process(rows.reset_index())
+        return stats, events
+
+    async def flush(self):
+        """Write everything buffered now; returns the published update or None."""
+        if not self._buffer:
+            return None
+        batch = pd.concat(self._buffer)
+        self._buffer, self._buffered = [], 0
+        self._wake.clear()
+        loop = asyncio.get_running_loop()
+        stats, events = await loop.run_in_executor(self._writer, self._write, batch)
+        if not stats['rows_appended']:
+            return None
+        self.seq += 1
+        update = {
+            'seq': self.seq,
+            'start': stats['start'].isoformat(),
+            'end': stats['end'].isoformat(),
+            'rows': stats['rows_appended'],
+            'duplicates': stats['duplicates'],
+            'late': stats['late'],
+            'flagged': stats['flagged'],
+            'events': len(events),
+            'time': pd.Timestamp.now().isoformat(),
+        }
+        await loop.run_in_executor(self._writer, _write_json, self.feed_path, update)
+        for queue in list(self._listeners):
+            queue.put_nowait(update)
+        return update
+
+    async def run_flusher(self):
+        """Flush every ``flush_interval`` seconds or when the buffer fills, until cancelled."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+        finally:
+            await asyncio.shield(self.flush())
+
+    def listen(self):
+        queue = asyncio.Queue()
+        self._listeners.add(queue)
+        return queue
+
+    def unlisten(self, queue):
+        self._listeners.discard(queue)
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+
+# ----------------------------
+# 🌐 HTTP
+# ----------------------------
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+def _response(status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n")
+    return head.encode('ascii') + body
+
+
+async def _read_request(reader):
+    """``(method, path, headers, body)`` of one HTTP/1.1 request."""
+    request_line = (await reader.readline()).decode('latin-1').strip()
+    if not request_line:
+        return None
+    method, target, _ = request_line.split(' ', 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b''
+    return method, target.split('?', 1)[0], headers, body
+
+
+async def _stream_events(service, writer):
+    writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                 b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+    queue = service.listen()
+    try:
+        latest = read_feed(service.feed_path)
+        if latest is not None:
+            queue.put_nowait(latest)
+        while True:
+            try:
+                update = await asyncio.wait_for(queue.get(), KEEPALIVE)
+            except asyncio.TimeoutError:
+                writer.write(b": keepalive\n\n")
+            else:
+                writer.write(f"id: {update['seq']}\ndata: {json.dumps(update)}\n\n".encode('utf-8'))
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):    # client gone or server shutting down
+        pass
+    finally:
+        service.unlisten(queue)
+
+
+async def handle_http(service, reader, writer):
+    try:
+        try:
+            request = await _read_request(reader)
+        except OverflowError:
+            writer.write(_response(413, {'error': f"Body larger than {MAX_BODY_BYTES} bytes"}))
+            return
+        except (ValueError, asyncio.IncompleteReadError):
+            writer.write(_response(400, {'error': "Malformed request"}))
+            return
+        if request is None:
+            return
+        method, path, headers, body = request
+        if path == '/events' and method == 'GET':
+            await _stream_events(service, writer)
+        elif path == '/status' and method == 'GET':
+            writer.write(_response(200, {'seq': service.seq, 'buffered': service.buffered,
+                                         'listeners': len(service._listeners)}))
+        elif path == '/readings':
+            if method != 'POST':
+                writer.write(_response(405, {'error': "Use POST"}))
+                return
+            try:
+                stats = service.accept(parse_readings(body, headers.get('content-type', '')))
+            except ValueError as exc:
+                writer.write(_response(400, {'error': str(exc)}))
+            else:
+                writer.write(_response(202, stats))
+        else:
+            writer.write(_response(404, {'error': f"No route {method} {path}"}))
+    finally:
+        try:
+            await writer.drain()
+            writer.close()
+        except ConnectionError:
+            pass
+
+
+# ----------------------------
+# 🔌 LOCAL SOCKET
+# ----------------------------
+async def handle_socket(service, reader, writer):
+    """One JSON object or array of readings per line; one JSON stats line back per line."""
+    try:
+        while line := await reader.readline():
+            if not line.strip():
+                continue
+            try:
+                reply = service.accept(parse_readings(line))
+            except ValueError as exc:
+                reply = {'error': str(exc)}
+            writer.write((json.dumps(reply) + "\n").encode('utf-8'))
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(service, host=HOST, port=PORT, socket_path=None):
+    """Run the HTTP server, the optional Unix socket and the flusher until cancelled."""
+    servers = [await asyncio.start_server(lambda r, w: handle_http(service, r, w), host, port)]
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        servers.append(await asyncio.start_unix_server(lambda r, w: handle_socket(service, r, w), socket_path))
+    flusher = asyncio.create_task(service.run_flusher())
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        for server in servers:
+            server.close()
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accept live sensor readings and notify open dashboards.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--socket", help="also listen on this Unix socket")
+    parser.add_argument("--source", default=CLEANED_CSV)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_ROWS)
+    args = parser.parse_args()
+
+    async def run():
+        service = LiveIngest(args.source, args.cache_dir, flush_interval=args.flush_interval,
+                             max_batch_rows=args.max_batch)
+        print(f"Listening on http://{args.host}:{args.port}" + (f" and {args.socket}" if args.socket else ""))
+        await serve(service, args.host, args.port, args.socket)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""Memory-mapped dataset and rollups shared by every dashboard process on a host.
+
+``build_mapped`` writes the cleaned dataset (base plus partitions) and its
+closed ``RollupIndex`` buckets into one fixed-layout file::
+
+    b"AIRMAP02"  magic
+    uint64       header slot size (little-endian)
+    2 slots      each uint64 sequence, uint32 CRC-32, uint32 length, then
+                 JSON: dataset key, columns, and name/dtype/shape/capacity/
+                 offset per array
+    padding      to a 64-byte boundary
+    arrays       each starting on a 64-byte boundary, in native C order,
+                 with room for ``capacity`` rows (unwritten room is sparse)
+
+Workers open it with ``load_mapped``: the file is mapped read-only and every
+array is a view into the mapping, so N workers share one page-cache copy and
+a new worker is ready without parsing anything. Columns are stored as float32
+and exposed as a DataFrame whose columns are views, not copies.
+
+The header records the ``data_loader.dataset_key`` of the rows the file
+holds; when the CSV or its partitions change the file is treated as stale and
+``load_mapped`` returns None until it is brought up to date, so callers fall
+back to the regular loaders. Writers that appended a partition call
+``extend_mapped`` with the key before and after their append. Under a file
+lock, it writes the new rows and the rollup buckets they close after the
+stored ones and then the header into the older slot, so an append costs the
+new rows plus the rows of the open month, and readers only ever see a
+complete header and rows that are never rewritten. Rollups hold closed
+buckets only (all but the one with the latest reading, per grain); queries
+fall through to finer grains and raw rows for the rest. The file is rebuilt
+when it does not hold the rows before the append, or has no room left.
+
+Usage:
+    python mapped.py                      # build .cache/AirQuality_cleaned.airmap
+"""
+
+import argparse
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from compact import ColumnRows, CompactDataset
+from data_loader import CACHE_DIR, CLEANED_CSV, DATETIME_COL, dataset_key, file_lock, load_snapshot
+from rollups import GRAINS, RollupIndex, closed_grains
+
+# ----------------------------
+# 📐 FILE LAYOUT
+# ----------------------------
+MAGIC = b"AIRMAP02"
+ALIGN = 64
+MAPPED_SUFFIX = ".airmap"
+SLOT_HEADER = struct.Struct('<QII')     # sequence, CRC-32, length
+MIN_SLOT = 1 << 16                      # bytes per header slot, at least
+GROWTH = 2                              # capacity per stored row when (re)written
+MIN_CAPACITY = 1024                     # rows per array, at least
+
+# Bump when the layout changes so old files are rebuilt.
+MAPPED_VERSION = 3
+
+# In-process memo of open mappings.
+_MAPPED = {}
+
+
+def mapped_path(path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, stem + MAPPED_SUFFIX)
+
+
+def _padded(size):
+    return -(-size // ALIGN) * ALIGN
+
+
+def _jsonable(key):
+    return json.loads(json.dumps(key))
+
+
+def _row_bytes(entry):
+    return np.dtype(entry['dtype']).itemsize * int(np.prod(entry['shape'][1:], dtype=np.int64))
+
+
+def _slot(seq, header):
+    return SLOT_HEADER.pack(seq, zlib.crc32(header), len(header)) + header
+
+
+def _read_header(buf):
+    """``(slot, seq, header)`` of the newest intact header slot."""
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not a mapped dataset file")
+    (slot_size,) = struct.unpack('<Q', bytes(buf[len(MAGIC):len(MAGIC) + 8]))
+    best = None
+    for slot in range(2):
+        at = len(MAGIC) + 8 + slot * slot_size
+        seq, crc, length = SLOT_HEADER.unpack(bytes(buf[at:at + SLOT_HEADER.size]))
+        header = bytes(buf[at + SLOT_HEADER.size:at + SLOT_HEADER.size + length])
+        if length and length <= slot_size - SLOT_HEADER.size and zlib.crc32(header) == crc:
+            if best is None or seq > best[1]:
+                best = (slot, seq, json.loads(header.decode('utf-8')))
+    if best is None:
+        raise ValueError("mapped dataset file has no intact header")
+    return slot_size, best
+
+
+def write_arrays(out, meta, arrays, capacity=None):
+    """Write ``arrays`` (name -> ndarray) and a JSON ``meta`` dict in the mapped layout.
+
+    ``capacity`` maps array names to the rows to make room for, so
+    ``append_arrays`` can add rows in place; by default there is none.
+    """
+    capacity = capacity or {}
+    entries, offset = [], 0
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    for name, array in arrays.items():
+        rows = max(capacity.get(name, 0), len(array))
+        entry = {'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape),
+                 'capacity': rows, 'offset': offset}
+        entries.append(entry)
+        offset += _padded(rows * _row_bytes(entry))
+    header = json.dumps(dict(meta, arrays=entries)).encode('utf-8')
+    slot_size = _padded(max(MIN_SLOT, 2 * (SLOT_HEADER.size + len(header))))
+    data_start = _padded(len(MAGIC) + 8 + 2 * slot_size)
+
+    tmp = out + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', slot_size) + _slot(1, header))
+        for entry, array in zip(entries, arrays.values()):
+            f.seek(data_start + entry['offset'])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, out)
+
+
+def append_arrays(path, meta, additions):
+    """Append rows in place to arrays of a file from ``write_arrays``; False when they do not fit.
+
+    ``additions`` maps array names to the rows to add after the stored ones
+    and ``meta`` replaces the header's. The rows are written before the
+    header, which goes into the older slot, so a reader sees either the old
+    arrays or the new ones in full. Callers serialize writers.
+    """
+    with open(path, 'r+b') as f:
+        head = f.read(len(MAGIC) + 8)
+        (slot_size,) = struct.unpack('<Q', head[len(MAGIC):])
+        f.seek(0)
+        slot, seq, stored = _read_header(memoryview(f.read(len(MAGIC) + 8 + 2 * slot_size)))[1]
+        entries = stored['arrays']
+        for entry in entries:
+            rows = additions.get(entry['name'])
+            if rows is not None and entry['shape'][0] + len(rows) > entry['capacity']:
+                return False
+        new_entries = [dict(entry) for entry in entries]
+        for entry in new_entries:
+            entry['shape'] = list(entry['shape'])
+            rows = additions.get(entry['name'])
+            if rows is not None:
+                entry['shape'][0] += len(rows)
+        header = json.dumps(dict(meta, arrays=new_entries)).encode('utf-8')
+        if SLOT_HEADER.size + len(header) > slot_size:
+            return False
+
+        data_start = _padded(len(MAGIC) + 8 + 2 * slot_size)
+        for entry in entries:
+            rows = additions.get(entry['name'])
+            if rows is not None and len(rows):
+                rows = np.ascontiguousarray(rows, dtype=np.dtype(entry['dtype']))
+                f.seek(data_start + entry['offset'] + entry['shape'][0] * _row_bytes(entry))
+                f.write(rows.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+        f.seek(len(MAGIC) + 8 + (1 - slot) * slot_size)
+        f.write(_slot(seq + 1, header))
+    return True
+
+
+def read_arrays(path):
+    """``(meta, arrays)`` of a mapped file; the arrays are read-only views of one mapping."""
+    buf = np.memmap(path, dtype=np.uint8, mode='r')
+    try:
+        slot_size, (_, _, meta) = _read_header(buf)
+    except ValueError as exc:
+        raise ValueError(f"{path}: {exc}") from None
+    data_start = _padded(len(MAGIC) + 8 + 2 * slot_size)
+    arrays = {}
+    for entry in meta.pop('arrays'):
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape'], dtype=np.int64))
+        array = np.frombuffer(buf, dtype=dtype, count=count, offset=data_start + entry['offset'])
+        arrays[entry['name']] = array.reshape(entry['shape'])
+    return meta, arrays
+
+
+# ----------------------------
+# 🏗️ BUILD
+# ----------------------------
+def _grains(arrays):
+    grains = {grain: {} for grain in GRAINS}
+    for name, array in arrays.items():
+        if name.startswith("rollup/"):
+            _, grain, field = name.split('/')
+            grains[grain][field] = array
+    return grains
+
+
+def _write(out, key, dataset, grains):
+    arrays = {'stamps': dataset.stamps}
+    arrays.update({f"column/{name}": dataset.values(name) for name in dataset.columns})
+    for grain, buckets in grains.items():
+        arrays.update({f"rollup/{grain}/{field}": values for field, values in buckets.items()})
+    capacity = {name: max(GROWTH * len(array), MIN_CAPACITY) for name, array in arrays.items()}
+    meta = {'version': MAPPED_VERSION, 'key': _jsonable(key), 'columns': dataset.columns}
+    write_arrays(out, meta, arrays, capacity)
+
+
+def _build(path, cache_dir, out):
+    key, df = load_snapshot(path, cache_dir)
+    dataset = CompactDataset.from_frame(df.reset_index(), quantized=False)
+    _write(out, key, dataset, closed_grains(dataset.stamps, ColumnRows(dataset)[:]))
+
+
+def build_mapped(path=CLEANED_CSV, cache_dir=CACHE_DIR, out=None):
+    """Write the mapped file for ``path`` and return its location."""
+    out = out or mapped_path(path, cache_dir)
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with file_lock(out + ".lock"):
+        _build(path, cache_dir, out)
+    return out
+
+
+def _current(out, key):
+    """``(meta, arrays)`` of ``out`` when it is a current-version file holding ``key``, else None."""
+    try:
+        meta, arrays = read_arrays(out)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != MAPPED_VERSION or meta['key'] != _jsonable(key):
+        return None
+    return meta, arrays
+
+
+def extend_mapped(rows, previous_key, key, path=CLEANED_CSV, cache_dir=CACHE_DIR, out=None):
+    """Add ``rows`` to the mapped file if one exists; True when it was written.
+
+    ``rows`` are the Datetime-indexed readings of one appended partition as
+    loaded (flagged readings masked), ``previous_key`` the dataset key before
+    it was appended and ``key`` the key with it (``data_loader.partition_key``).
+    When the file holds exactly ``previous_key`` and ``rows`` all come after
+    it, they are appended in place and the file is marked as holding ``key``;
+    otherwise it is rebuilt from the dataset as stored now.
+    """
+    out = out or mapped_path(path, cache_dir)
+    if not os.path.exists(out):
+        return False
+    with file_lock(out + ".lock"):
+        current = _current(out, previous_key)
+        added = CompactDataset.from_frame(rows.reset_index(), quantized=False)
+        if current is None or added.columns != current[0]['columns']:
+            _build(path, cache_dir, out)
+            return True
+        meta, arrays = current
+        stamps = arrays['stamps']
+        if len(stamps) and len(added) and added.stamps[0] <= stamps[-1]:
+            _build(path, cache_dir, out)
+            return True
+
+        # The open buckets' rows from the file, then the new ones.
+        grains = _grains(arrays)
+        covered = {grain: buckets['end'][-1] if len(buckets['end']) else np.iinfo(np.int64).min
+                   for grain, buckets in grains.items()}
+        first = int(np.searchsorted(stamps, min(covered.values()), 'left'))
+        tail = CompactDataset(
+            np.concatenate([stamps[first:], added.stamps]),
+            {name: np.concatenate([arrays[f"column/{name}"][first:], added.values(name)])
+             for name in added.columns})
+        closed = closed_grains(tail.stamps, ColumnRows(tail)[:], covered)
+
+        additions = {'stamps': added.stamps}
+        additions.update({f"column/{name}": added.values(name) for name in added.columns})
+        for grain, buckets in closed.items():
+            additions.update({f"rollup/{grain}/{field}": values for field, values in buckets.items()})
+        if not append_arrays(out, dict(meta, key=_jsonable(key)), additions):
+            dataset = CompactDataset(
+                np.concatenate([stamps, added.stamps]),
+                {name: np.concatenate([arrays[f"column/{name}"], added.values(name)])
+                 for name in added.columns})
+            grains = {grain: {f: np.concatenate([grains[grain][f], closed[grain][f]]) for f in closed[grain]}
+                      for grain in GRAINS}
+            _write(out, key, dataset, grains)
+    return True
+
+
+def rekey_mapped(previous_key, key, path=CLEANED_CSV, cache_dir=CACHE_DIR, out=None):
+    """Mark a mapped file holding ``previous_key`` as holding ``key``; True when it did.
+
+    For changes that keep the rows, e.g. ``data_loader.merged_key`` after a
+    merge of partitions.
+    """
+    out = out or mapped_path(path, cache_dir)
+    if not os.path.exists(out):
+        return False
+    with file_lock(out + ".lock"):
+        current = _current(out, previous_key)
+        if current is None:
+            return False
+        if not append_arrays(out, dict(current[0], key=_jsonable(key)), {}):
+            meta, arrays = current
+            dataset = CompactDataset(arrays['stamps'], {name: arrays[f"column/{name}"] for name in meta['columns']})
+            _write(out, key, dataset, _grains(arrays))
+    return True
+
+
+# ----------------------------
+# 📖 OPEN
+# ----------------------------
+class MappedStore:
+    """Dataset, frame and rollups over one read-only mapping."""
+
+    def __init__(self, path, meta, arrays):
+        self.path = path
+        self.key = meta['key']
+        self.columns = meta['columns']
+        stamps = arrays['stamps']
+        columns = {name: arrays[f"column/{name}"] for name in self.columns}
+        self.dataset = CompactDataset(stamps, columns)
+        self.rollups = RollupIndex.from_arrays(self.columns, stamps, ColumnRows(self.dataset), _grains(arrays))
+        data = {DATETIME_COL: stamps.view('datetime64[ns]')}
+        data.update(columns)
+        self.frame = pd.DataFrame(data, copy=False)
+
+
+def load_mapped(path=CLEANED_CSV, cache_dir=CACHE_DIR, out=None):
+    """The ``MappedStore`` for ``path``, or None when no current mapped file exists.
+
+    Memoised per process and file, and re-read when the dataset key moves
+    past the memoised one; callers must treat it as read-only.
+    """
+    out = os.path.abspath(out or mapped_path(path, cache_dir))
+    key = _jsonable(dataset_key(path, cache_dir))
+    store = _MAPPED.get(out)
+    if store is None or store.key != key:
+        try:
+            meta, arrays = read_arrays(out)
+        except (OSError, ValueError):   # no file yet, or an older layout
+            return None
+        if meta.get('version') != MAPPED_VERSION or meta['key'] != key:
+            return None
+        store = _MAPPED[out] = MappedStore(out, meta, arrays)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped dataset shared by dashboard workers.")
+    parser.add_argument("--source", default=CLEANED_CSV)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--out", help=f"output file (default: <cache-dir>/<stem>{MAPPED_SUFFIX})")
+    args = parser.parse_args()
+
+    out = build_mapped(args.source, args.cache_dir, args.out)
+    print(f"Wrote {out} ({os.path.getsize(out) / 2**20:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
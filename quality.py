@@ -0,0 +1,360 @@
+"""Data-quality flags for sensor readings, computed chunk by chunk as they arrive.
+
+The notebook cleaning only knows the ``-200`` missing-value sentinel; a stuck
+sensor, a spike or a drifting metal-oxide channel goes straight through to
+the AQI, the alerts and model training. ``QualityDetector`` checks every
+reading against the readings before it:
+
+    flatline  the last ``FLATLINE_RUN`` readings of the sensor are all equal
+    spike     robust z-score (median/MAD of the previous ``SPIKE_WINDOW``
+              readings) above ``SPIKE_Z`` while fewer than
+              ``SPIKE_CORROBORATION`` other sensors of the row move too;
+              not applied to the weather columns in ``SPIKE_SKIP``
+    rate      change since the sensor's last accepted reading above its limit
+              in ``RATE_LIMITS``, per hour elapsed; a reading that failed
+              this check is not accepted, so a sensor coming back after a
+              spike is compared with the reading before it, not the spike
+    residual  a PT08 channel far from what its ground-truth reference
+              predicts: log-log least squares over the previous
+              ``RESIDUAL_WINDOW`` readings, flagged beyond ``RESIDUAL_Z``
+              residual standard deviations
+
+Each check is vectorized over a whole chunk and every sensor at once
+(``sliding_window_view`` as in ``features.py``). A reading's flags depend
+only on the ``history`` readings before it and, for the rate check, on each
+sensor's last accepted reading; those are the only state the detector keeps
+between chunks. Flagging a file in chunks therefore gives exactly the flags
+of one pass over it.
+
+Flags are stored with the data as one uint64 ``Quality`` column. Bit
+``BITS_PER_SENSOR * i + j`` is set when check ``j`` (the order of
+``CHECKS``) failed for sensor ``i`` of ``SENSOR_COLUMNS``. ``mask_flagged``
+turns flagged readings into missing values; ``data_loader.load_cleaned_data``
+applies it, so dashboards, alerts and forecasts only see readings that
+passed.
+
+Usage:
+    python quality.py AirQuality_cleaned.csv     # flag counts per sensor and check
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data_loader import DATETIME_COL, QUALITY_COL, SENSOR_COLUMNS
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+CHECKS = ('flatline', 'spike', 'rate', 'residual')
+BITS_PER_SENSOR = 4
+QUALITY_DTYPE = np.uint64
+
+FLATLINE_RUN = 6            # equal consecutive readings of a stuck sensor
+
+SPIKE_WINDOW = 24           # previous readings forming the median/MAD baseline
+SPIKE_MIN_COUNT = 12
+SPIKE_Z = 8.0
+SPIKE_CORROBORATE_Z = 3.0   # other sensors beyond this robust z-score ...
+SPIKE_CORROBORATION = 2     # ... that make a spike a real episode, not a fault
+# Weather readings change smoothly but steadily; their rate limits cover them.
+SPIKE_SKIP = ('T', 'RH', 'AH')
+# Rows per median/MAD block: each block sorts a (rows, sensors, SPIKE_WINDOW)
+# copy of its windows, about 10 MB here, whatever the chunk size.
+SPIKE_BLOCK = 4096
+
+# Largest plausible change per hour, a little above the largest change in
+# the raw UCI file outside known faults.
+RATE_LIMITS = {
+    'CO(GT)': 8.0, 'NMHC(GT)': 800.0, 'C6H6(GT)': 40.0, 'NOx(GT)': 800.0, 'NO2(GT)': 200.0,
+    'PT08.S1(CO)': 1000.0, 'PT08.S2(NMHC)': 1000.0, 'PT08.S3(NOx)': 1000.0,
+    'PT08.S4(NO2)': 1000.0, 'PT08.S5(O3)': 1300.0,
+    'T': 10.0, 'RH': 40.0, 'AH': 0.8,
+}
+
+# PT08 metal-oxide channel -> ground-truth reference it tracks.
+RESIDUAL_PAIRS = {
+    'PT08.S1(CO)': 'CO(GT)',
+    'PT08.S2(NMHC)': 'C6H6(GT)',
+    'PT08.S3(NOx)': 'NOx(GT)',
+    'PT08.S4(NO2)': 'NO2(GT)',
+}
+RESIDUAL_WINDOW = 168       # one week of hourly readings
+RESIDUAL_MIN_COUNT = 48
+RESIDUAL_Z = 6.0
+
+_MAD_SCALE = 0.6745         # MAD of a normal distribution, in standard deviations
+_NS_PER_HOUR = 3_600_000_000_000
+
+
+def flag_bit(column, check, columns=SENSOR_COLUMNS):
+    """The ``Quality`` bit of ``check`` for sensor ``column``."""
+    return 1 << (BITS_PER_SENSOR * list(columns).index(column) + CHECKS.index(check))
+
+
+# ----------------------------
+# 🧮 CHECKS
+# ----------------------------
+def _flatline(values, start):
+    run = FLATLINE_RUN - 1
+    same = np.zeros(values.shape, dtype=bool)
+    same[1:] = values[1:] == values[:-1]
+    padded = np.concatenate([np.zeros((run - 1, values.shape[1]), dtype=bool), same])
+    return sliding_window_view(padded, run, axis=0)[start:].all(axis=-1)
+
+
+def _nanmedian_sorted(ordered, count):
+    """Median of each row of ``ordered`` (sorted, NaNs last) over its ``count`` numbers."""
+    lo = np.maximum(count - 1, 0) // 2
+    hi = np.maximum(count, 1) // 2
+    pick = lambda i: np.take_along_axis(ordered, i[..., None], axis=-1)[..., 0]
+    return np.where(count > 0, (pick(lo) + pick(hi)) / 2, np.nan)
+
+
+def _robust_z(windows, values):
+    """Robust z-score of ``values`` against the readings in ``windows``."""
+    # One sort per window gives both medians, much faster than np.nanmedian.
+    ordered = np.sort(windows, axis=-1)
+    count = (~np.isnan(ordered)).sum(axis=-1)
+    median = _nanmedian_sorted(ordered, count)
+    ordered = np.abs(ordered - median[..., None], out=ordered)
+    ordered.sort(axis=-1)
+    mad = _nanmedian_sorted(ordered, count)
+    ok = (count >= SPIKE_MIN_COUNT) & (mad > 0)
+    with np.errstate(invalid='ignore'):
+        return np.where(ok, _MAD_SCALE * np.abs(values - median) / np.where(ok, mad, 1.0), 0.0)
+
+
+def _spike(values, start, skip):
+    padded = np.concatenate([np.full((SPIKE_WINDOW, values.shape[1]), np.nan), values[:-1]])
+    windows = sliding_window_view(padded, SPIKE_WINDOW, axis=0)[start:]    # previous readings, a view
+    z = np.empty(windows.shape[:2])
+    for lo in range(0, len(z), SPIKE_BLOCK):
+        hi = lo + SPIKE_BLOCK
+        z[lo:hi] = _robust_z(windows[lo:hi], values[start + lo:start + hi])
+    # A pollution episode moves the co-located sensors together; a faulty
+    # reading jumps alone.
+    jumps = z > SPIKE_CORROBORATE_Z
+    alone = jumps.sum(axis=1, keepdims=True) - jumps < SPIKE_CORROBORATION
+    return (z > SPIKE_Z) & alone & ~skip
+
+
+def _no_reference(width):
+    return np.full(width, np.nan), np.zeros(width, dtype=np.int64)
+
+
+def _last_accepted(values, stamps, rejected, reference):
+    """``(values, stamps)`` of each sensor's last reading not ``rejected``, else ``reference``'s."""
+    rows = np.arange(len(values))[:, None]
+    last = np.where(~np.isnan(values) & ~rejected, rows, -1).max(axis=0, initial=-1)
+    found = last >= 0
+    ref_values, ref_stamps = reference[0].copy(), reference[1].copy()
+    ref_values[found] = values[last[found], np.flatnonzero(found)]
+    ref_stamps[found] = stamps[last[found]]
+    return ref_values, ref_stamps
+
+
+def _rate(values, stamps, limits, reference):
+    """Rate flags of ``values`` given each sensor's last accepted reading before them.
+
+    Whether a reading is accepted depends on the flags before it. Each pass
+    recomputes every flag from the previous pass's acceptances, which makes
+    the flags right up to the next reading whose acceptance changed, so the
+    loop ends after one pass per flag in a run of consecutive flags.
+    """
+    ref_values, ref_stamps = reference
+    observed = ~np.isnan(values)
+    rows = np.arange(len(values))[:, None]
+    cols = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    flags = np.zeros(values.shape, dtype=bool)
+    while True:
+        accepted = np.maximum.accumulate(np.where(observed & ~flags, rows, -1), axis=0)
+        prev = np.concatenate([np.full((1, values.shape[1]), -1), accepted[:-1]])
+        before = prev >= 0
+        base = np.where(before, values[np.maximum(prev, 0), cols], ref_values)
+        since = np.where(before, stamps[np.maximum(prev, 0)], ref_stamps)
+        hours = np.maximum((stamps[:, None] - since) / _NS_PER_HOUR, 1.0)
+        with np.errstate(invalid='ignore'):
+            fresh = np.abs(values - base) / hours > limits
+        if np.array_equal(fresh, flags):
+            return flags
+        flags = fresh
+
+
+def _window_sums(series, start):
+    """Sum over the previous ``RESIDUAL_WINDOW`` rows of each row from ``start`` on."""
+    padded = np.concatenate([np.zeros((RESIDUAL_WINDOW,) + series.shape[1:]), series[:-1]])
+    return sliding_window_view(padded, RESIDUAL_WINDOW, axis=0)[start:].sum(axis=-1)
+
+
+def _residual(x, y, start):
+    """Readings of ``y`` far from a log-log fit on ``x`` over the previous readings."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x, y = np.log(np.where(x > 0, x, np.nan)), np.log(np.where(y > 0, y, np.nan))
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x0, y0 = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+    sums = _window_sums(np.column_stack([valid, x0, y0, x0 * x0, x0 * y0, y0 * y0]), start)
+    n, sx, sy, sxx, sxy, syy = sums.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cxx, cxy, cyy = sxx - sx * sx / n, sxy - sx * sy / n, syy - sy * sy / n
+        slope = cxy / cxx
+        sigma = np.sqrt(np.maximum(cyy - slope * cxy, 0.0) / (n - 2))
+        residual = y[start:] - (sy / n + slope * (x[start:] - sx / n))
+        ok = valid[start:] & (n >= RESIDUAL_MIN_COUNT) & (cxx > 0) & (sigma > 0)
+        return ok & (np.abs(residual) > RESIDUAL_Z * sigma)
+
+
+def _checks(values, stamps, columns, start, reference):
+    """``(rows, columns, checks)`` failures of rows ``start:``."""
+    limits = np.array([RATE_LIMITS.get(c, np.inf) for c in columns])
+    checks = np.zeros((len(values) - start, len(columns), len(CHECKS)), dtype=bool)
+    if len(values) > start:
+        checks[..., 0] = _flatline(values, start)
+        checks[..., 1] = _spike(values, start, np.isin(columns, SPIKE_SKIP))
+        checks[..., 2] = _rate(values[start:], stamps[start:], limits, reference)
+        for sensor, paired in RESIDUAL_PAIRS.items():
+            if sensor in columns and paired in columns:
+                i = columns.index(sensor)
+                checks[:, i, 3] = _residual(values[:, columns.index(paired)], values[:, i], start)
+    return checks
+
+
+def _pack(checks):
+    weights = np.left_shift(QUALITY_DTYPE(1), np.arange(checks.shape[1] * len(CHECKS), dtype=QUALITY_DTYPE))
+    return checks.reshape(len(checks), -1).astype(QUALITY_DTYPE) @ weights
+
+
+def quality_flags(values, stamps, columns=SENSOR_COLUMNS, start=0, reference=None):
+    """``Quality`` bitmask of rows ``start:`` of ``values``; earlier rows are context only.
+
+    ``values`` holds the readings of ``columns`` as a ``(rows, columns)``
+    array in time order and ``stamps`` their times as int64 nanoseconds.
+    ``reference`` gives the value and stamp of each sensor's last accepted
+    reading before row ``start`` for the rate check; by default every
+    context reading counts as accepted.
+    """
+    columns = list(columns)
+    values = np.asarray(values, dtype=np.float64)
+    stamps = np.asarray(stamps, dtype=np.int64)
+    if reference is None:
+        context = values[:start]
+        reference = _last_accepted(context, stamps[:start], np.zeros(context.shape, dtype=bool),
+                                   _no_reference(len(columns)))
+    return _pack(_checks(values, stamps, columns, start, reference))
+
+
+# ----------------------------
+# 📡 STREAMING DETECTOR
+# ----------------------------
+class QualityDetector:
+    """Flags chunks of readings in time order.
+
+    The state is the last ``history`` readings and each sensor's last
+    reading accepted by the rate check.
+    """
+
+    history = max(FLATLINE_RUN - 1, SPIKE_WINDOW, RESIDUAL_WINDOW)
+
+    def __init__(self, columns=SENSOR_COLUMNS):
+        self.columns = list(columns)
+        self._values = np.empty((0, len(self.columns)))
+        self._stamps = np.empty(0, dtype=np.int64)
+        self._reference = _no_reference(len(self.columns))
+
+    @staticmethod
+    def _stamps_of(df):
+        stamps = df[DATETIME_COL] if DATETIME_COL in df.columns else df.index
+        return pd.DatetimeIndex(stamps).as_unit('ns').asi8
+
+    def process(self, df):
+        """Flags of the rows of ``df`` (Datetime column or index, sorted, after earlier chunks)."""
+        # Missing sensors stay in the layout as NaN, so bit positions never move.
+        readings = df.reindex(columns=self.columns).to_numpy(dtype=np.float64)
+        stamps = self._stamps_of(df)
+        start = len(self._values)
+        checks = _checks(np.concatenate([self._values, readings]), np.concatenate([self._stamps, stamps]),
+                         self.columns, start, self._reference)
+        self._remember(readings, stamps, checks[..., 2])
+        return _pack(checks)
+
+    def prime(self, df):
+        """Take stored rows of ``df`` as the readings before the next chunk.
+
+        Their ``Quality`` column, when present, is trusted rather than
+        recomputed; only the last ``history`` rows are kept.
+        """
+        if QUALITY_COL not in df.columns:
+            self.process(df.iloc[-self.history:])
+            return
+        readings = df.reindex(columns=self.columns).to_numpy(dtype=np.float64)
+        shifts = np.arange(len(self.columns), dtype=QUALITY_DTYPE) * QUALITY_DTYPE(BITS_PER_SENSOR)
+        shifts += QUALITY_DTYPE(CHECKS.index('rate'))
+        flags = df[QUALITY_COL].to_numpy(dtype=QUALITY_DTYPE)[:, None]
+        self._remember(readings, self._stamps_of(df), (np.right_shift(flags, shifts) & QUALITY_DTYPE(1)) != 0)
+
+    def _remember(self, readings, stamps, rejected):
+        self._reference = _last_accepted(readings, stamps, rejected, self._reference)
+        self._values = np.concatenate([self._values, readings])[-self.history:]
+        self._stamps = np.concatenate([self._stamps, stamps])[-self.history:]
+
+    def flag(self, df):
+        """``df`` with its ``Quality`` column set."""
+        return df.assign(**{QUALITY_COL: self.process(df)})
+
+
+def flag_frame(df, context=None, columns=SENSOR_COLUMNS):
+    """``df`` with a ``Quality`` column, checked after the rows of ``context`` (both sorted)."""
+    detector = QualityDetector(columns)
+    if context is not None and len(context):
+        detector.prime(context)
+    return detector.flag(df)
+
+
+# ----------------------------
+# 🧹 USING THE FLAGS
+# ----------------------------
+def flagged_readings(flags, columns=SENSOR_COLUMNS):
+    """``(rows, columns)`` boolean array: True where any check failed for that reading."""
+    flags = np.asarray(flags, dtype=QUALITY_DTYPE)
+    shifts = np.arange(len(columns), dtype=QUALITY_DTYPE) * QUALITY_DTYPE(BITS_PER_SENSOR)
+    mask = QUALITY_DTYPE((1 << BITS_PER_SENSOR) - 1)
+    return (np.right_shift(flags[:, None], shifts) & mask) != 0
+
+
+def mask_flagged(df, columns=SENSOR_COLUMNS):
+    """``df`` without its ``Quality`` column and with flagged readings set to NaN."""
+    if QUALITY_COL not in df.columns:
+        return df
+    bad = flagged_readings(df[QUALITY_COL].to_numpy(), columns)
+    df = df.drop(columns=QUALITY_COL)
+    present = [i for i, c in enumerate(columns) if c in df.columns]
+    for i in present:
+        if bad[:, i].any():
+            df[columns[i]] = df[columns[i]].mask(bad[:, i])
+    return df
+
+
+def flag_counts(flags, columns=SENSOR_COLUMNS):
+    """Readings flagged per sensor (rows) and check (columns)."""
+    flags = np.asarray(flags, dtype=QUALITY_DTYPE)
+    bits = np.arange(len(columns) * len(CHECKS), dtype=QUALITY_DTYPE)
+    counts = ((np.right_shift(flags[:, None], bits) & QUALITY_DTYPE(1)) != 0).sum(axis=0)
+    return pd.DataFrame(counts.reshape(len(columns), len(CHECKS)), index=list(columns), columns=CHECKS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the quality flags of a cleaned CSV file.")
+    parser.add_argument("source", help="CSV in the AirQuality_cleaned.csv layout")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.source, parse_dates=[DATETIME_COL]).sort_values(DATETIME_COL)
+    flags = QualityDetector().process(df)
+    counts = flag_counts(flags)
+    print(counts[counts.any(axis=1)].to_string())
+    print(f"{int((flags != 0).sum())} of {len(df)} rows have at least one flagged reading")
+
+
+if __name__ == "__main__":
+    main()
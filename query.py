@@ -0,0 +1,364 @@
+"""Local query server for the HTML dashboards.
+
+``Milestone2-Dashboard.html`` and ``Milestone3-Dashboard.html`` used to fetch
+``AirQuality_cleaned.csv`` and split it into rows in the browser. They now
+ask this server for just what they draw:
+
+    GET /api/series?pollutant=NO2&window=24h&grain=hour&station=All_Data
+        hourly/daily/monthly means (with min and max) of one pollutant over
+        a window, from the ``RollupIndex`` buckets; ``grain=raw`` returns
+        the readings, optionally downsampled to ``width`` pixels
+    GET /api/latest?rows=10&station=All_Data
+        the last readings of every column, for the data tables
+    GET /api/stats?window=7d&station=All_Data
+        count/mean/std/min/max per column over a window
+    GET /api/stations
+        the stations and the pollutant -> column mapping of each
+
+``pollutant`` is a dashboard name (PM2.5, NO2, NOx, O3, SO2) or a column
+name, and ``window`` is ``all`` or a duration such as ``24h``, ``7d`` or
+``30d`` back from the latest reading. Numeric arrays are sent as
+little-endian typed arrays, ``{"dtype": "float32", "data": <base64>}``,
+which the pages turn into a ``Float32Array`` without parsing; pass
+``format=json`` for plain lists. Timestamps are epoch milliseconds.
+
+Responses are gzip-compressed when the client accepts it and carry an
+ETag; a matching ``If-None-Match`` gets ``304 Not Modified``. Encoded
+responses are kept in an LRU cache keyed by the request and the dataset's
+current version, so a repeated query costs a dictionary lookup until the
+data changes. The dashboard pages themselves are served from the same
+origin.
+
+Usage:
+    python query.py --port 8502
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from dashboards import pollutant_mapping
+from data_loader import DATETIME_COL, DEFAULT_STATION, dataset_key
+from downsample import downsample_indices, point_budget
+from mapped import load_mapped
+from rollups import RollupIndex
+from stations import STATION_DIR, list_stations, load_station
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+HOST = "127.0.0.1"
+PORT = 8502
+QUERY_URL = f"http://localhost:{PORT}"   # where the Streamlit apps point the pages
+
+PAGES = ("Milestone2-Dashboard.html", "Milestone3-Dashboard.html")
+
+GRAINS = ('raw', 'hour', 'day', 'month')
+FORMATS = ('typed', 'json')
+MAX_ROWS = 1000             # cap of /api/latest
+
+CACHE_ENTRIES = 256
+CACHE_BYTES = 64 << 20      # gzip and plain bodies together
+GZIP_LEVEL = 6
+MIN_GZIP_BYTES = 512        # smaller bodies are sent as they are
+
+_ROLLUPS = {}   # station -> (frame, RollupIndex)
+
+
+# ----------------------------
+# 📦 ENCODING
+# ----------------------------
+def encode_array(values, dtype, fmt='typed'):
+    """A numeric array as a base64 little-endian typed array, or a list with None for NaN."""
+    values = np.asarray(values, dtype=dtype)
+    if fmt == 'json':
+        return [None if v != v else v for v in values.tolist()]
+    data = values.astype(values.dtype.newbyteorder('<'), copy=False).tobytes()
+    return {'dtype': values.dtype.name, 'data': base64.b64encode(data).decode('ascii')}
+
+
+def _epoch_ms(stamps):
+    return pd.DatetimeIndex(stamps).as_unit('ms').asi8.astype(np.float64)
+
+
+def _jsonable(value):
+    return None if value != value else value
+
+
+class Response:
+    """An encoded body with its lazily compressed copy and ETag."""
+
+    def __init__(self, body, content_type='application/json'):
+        self.body = body
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self._gzip = None
+
+    @property
+    def gzip(self):
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+        return self._gzip
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self._gzip) if self._gzip is not None else 0)
+
+
+def json_response(payload):
+    return Response(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+class ResponseCache:
+    """LRU of ``Response`` objects bounded by entry count and bytes."""
+
+    def __init__(self, max_entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or \
+                    (len(self._entries) > 1 and self.nbytes > self.max_bytes):
+                self._entries.popitem(last=False)
+
+    @property
+    def nbytes(self):
+        return sum(response.size for response in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ----------------------------
+# 🧮 QUERIES
+# ----------------------------
+def data_version(station):
+    """Changes whenever the data behind ``station`` does."""
+    if station == DEFAULT_STATION:
+        return dataset_key()
+    try:
+        return os.stat(os.path.join(STATION_DIR, "index.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def station_data(station):
+    """``(frame, rollups)`` of a station, rebuilt when its frame changes."""
+    df = load_station(station)
+    cached = _ROLLUPS.get(station)
+    if cached is None or cached[0] is not df:
+        store = load_mapped() if station == DEFAULT_STATION else None
+        rollups = store.rollups if store is not None and df is store.frame else RollupIndex(df)
+        cached = _ROLLUPS[station] = (df, rollups)
+    return cached
+
+
+def resolve_column(station, pollutant, columns):
+    column = pollutant_mapping(station).get(pollutant, pollutant)
+    if column not in columns:
+        raise ValueError(f"Unknown pollutant {pollutant!r} for station {station!r}")
+    return column
+
+
+def window_start(rollups, window):
+    """Start of ``window`` (``all`` or a duration back from the latest reading)."""
+    if window in (None, '', 'all') or rollups.last is None:
+        return None
+    try:
+        span = pd.Timedelta(window)
+    except ValueError:
+        raise ValueError(f"Bad window {window!r}; use 'all' or a duration such as 24h, 7d") from None
+    return rollups.last - span
+
+
+def series_payload(station=DEFAULT_STATION, pollutant='NO2', window='24h', grain='hour',
+                   width=None, fmt='typed'):
+    """Means (or readings for ``grain='raw'``) of one pollutant over a window."""
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain {grain!r}; expected one of {GRAINS}")
+    df, rollups = station_data(station)
+    column = resolve_column(station, pollutant, rollups.columns)
+    start = window_start(rollups, window)
+    payload = {'station': station, 'pollutant': pollutant, 'column': column, 'grain': grain,
+               'window': window}
+    if grain == 'raw':
+        lo, hi = rollups.row_bounds(start)
+        rows = df.iloc[lo:hi]
+        values = rows[column].to_numpy(dtype=np.float64)
+        present = np.flatnonzero(~np.isnan(values))
+        if width is not None and len(present) > point_budget(width):
+            present = present[downsample_indices(present, values[present], point_budget(width))]
+        payload.update(
+            time=encode_array(_epoch_ms(rows[DATETIME_COL].iloc[present]), np.float64, fmt),
+            value=encode_array(values[present], np.float32, fmt),
+        )
+    else:
+        buckets = rollups.grains[grain]
+        first = 0 if start is None else int(np.searchsorted(buckets['end'], start.value, 'right'))
+        i = rollups.columns.index(column)
+        count = buckets['count'][first:, i].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = buckets['sum'][first:, i] / count
+        keep = count > 0
+        payload.update(
+            time=encode_array(_epoch_ms(buckets['start'][first:][keep].view('datetime64[ns]')), np.float64, fmt),
+            value=encode_array(mean[keep], np.float32, fmt),
+            min=encode_array(buckets['min'][first:, i][keep], np.float32, fmt),
+            max=encode_array(buckets['max'][first:, i][keep], np.float32, fmt),
+            count=encode_array(count[keep], np.int32, fmt),
+        )
+    return payload
+
+
+def latest_payload(station=DEFAULT_STATION, rows=10, fmt='typed'):
+    """The last ``rows`` readings of every column."""
+    df, rollups = station_data(station)
+    tail = df.iloc[-max(1, min(int(rows), MAX_ROWS)):]
+    return {
+        'station': station,
+        'time': encode_array(_epoch_ms(tail[DATETIME_COL]), np.float64, fmt),
+        'columns': {c: encode_array(tail[c], np.float32, fmt) for c in rollups.columns},
+    }
+
+
+def stats_payload(station=DEFAULT_STATION, window='all'):
+    df, rollups = station_data(station)
+    table = rollups.stats(window_start(rollups, window))
+    return {
+        'station': station,
+        'window': window,
+        'stats': {column: {k: _jsonable(float(v)) for k, v in row.items()}
+                  for column, row in table.iterrows()},
+    }
+
+
+def stations_payload():
+    return {'stations': [{'name': s, 'pollutants': pollutant_mapping(s)} for s in list_stations()]}
+
+
+# ----------------------------
+# 🌐 HTTP
+# ----------------------------
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = "AirQualityQuery/1"
+    root = os.path.dirname(os.path.abspath(__file__))
+    cache = ResponseCache()
+
+    def _params(self, url):
+        return dict(parse_qsl(url.query))
+
+    def _api(self, path, params):
+        station = params.get('station', DEFAULT_STATION)
+        fmt = params.get('format', 'typed')
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+        if path == '/api/series':
+            width = params.get('width')
+            return series_payload(station, params.get('pollutant', 'NO2'), params.get('window', '24h'),
+                                  params.get('grain', 'hour'), None if width is None else int(width), fmt)
+        if path == '/api/latest':
+            return latest_payload(station, int(params.get('rows', 10)), fmt)
+        if path == '/api/stats':
+            return stats_payload(station, params.get('window', 'all'))
+        if path == '/api/stations':
+            return stations_payload()
+        raise LookupError(f"No route {path}")
+
+    def _page(self, name):
+        path = os.path.join(self.root, name)
+        key = ('page', name, os.stat(path).st_mtime_ns)
+        response = self.cache.get(key)
+        if response is None:
+            with open(path, 'rb') as f:
+                response = Response(f.read(), 'text/html; charset=utf-8')
+            self.cache.put(key, response)
+        return response
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path.startswith('/api/'):
+                params = self._params(url)
+                station = params.get('station', DEFAULT_STATION)
+                key = (url.path, tuple(sorted(params.items())), data_version(station))
+                response = self.cache.get(key)
+                if response is None:
+                    response = json_response(self._api(url.path, params))
+                    self.cache.put(key, response)
+            elif url.path.lstrip('/') in PAGES:
+                response = self._page(url.path.lstrip('/'))
+            else:
+                raise LookupError(f"No route {url.path}")
+        except LookupError as exc:
+            return self._send(404, json_response({'error': str(exc)}))
+        except ValueError as exc:
+            return self._send(400, json_response({'error': str(exc)}))
+        if self.headers.get('If-None-Match') == response.etag:
+            return self._send(304, response, body=False)
+        self._send(200, response)
+
+    def _send(self, status, response, body=True):
+        payload = response.body
+        compress = body and 'gzip' in self.headers.get('Accept-Encoding', '') and len(payload) >= MIN_GZIP_BYTES
+        if compress:
+            payload = response.gzip
+        self.send_response(status)
+        self.send_header('Content-Type', response.content_type)
+        self.send_header('ETag', response.etag)
+        self.send_header('Cache-Control', 'no-cache')   # revalidate with the ETag every time
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload) if body else 0))
+        self.end_headers()
+        if body:
+            self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve pre-aggregated air quality data to the HTML dashboards.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-entries", type=int, default=CACHE_ENTRIES)
+    args = parser.parse_args()
+
+    QueryHandler.cache = ResponseCache(args.cache_entries)
+    server = ThreadingHTTPServer((args.host, args.port), QueryHandler)
+    print(f"Serving {', '.join(PAGES)} and /api/ on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""Headless per-station reports of the Bokeh visualization pipeline.
+
+``bokeh_visualization.py`` builds its eight plots one after another in a
+notebook, each recomputing its own ``dropna``/``groupby``/``resample``, and
+shows them interactively. This module runs the same pipeline from the
+command line:
+
+1. the Taiwan dataset is loaded and cleaned once, as in the notebook;
+2. the shared aggregates (daily, monthly and per-site means, AQI histograms
+   on common bins, correlations, samples) are computed once in the parent
+   by an ``aggregates.AggregateCache``;
+3. every station's plots are rendered in a process pool and written as a
+   standalone HTML page (Bokeh) and/or a PNG sheet (Matplotlib), plus an
+   ``index.html`` linking them.
+
+Usage:
+    python reports.py air_quality.csv --out reports --format html png --workers 4
+"""
+
+import argparse
+import html
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCache
+from stations import station_slug
+from timestamps import read_csv_datetimes
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+TAIWAN_CSV = "air_quality.csv"
+REPORT_DIR = "reports"
+FORMATS = ('html', 'png')
+
+DATE_COL = 'Date'
+SITE_COL = 'sitename'
+ALL_STATIONS = "All Stations"
+
+POLLUTANT_COLS = ['pm2.5', 'pm10', 'o3', 'co', 'no2', 'so2', 'no', 'nox']
+REQUIRED_COLS = ['pm2.5', 'pm10', 'o3', 'co', 'no2']
+CORR_COLS = ['pm2.5', 'pm10', 'o3', 'no2', 'so2', 'co']
+DAILY_COLS = ['pm2.5', 'o3', 'no2', 'aqi']
+MONTHLY_COLS = ['pm2.5', 'pm10']
+
+HIST_BINS = 30
+AQI_SAMPLE = 3000       # pm2.5 vs AQI scatter
+O3_SAMPLE = 2000        # pm2.5 vs O3 scatter, drawn only with at least this many rows
+TOP_SITES = 10
+TREND_SITES = 3
+SEED = 0
+
+
+# ----------------------------
+# 📂 LOADING
+# ----------------------------
+def load_taiwan(path=TAIWAN_CSV):
+    """The Taiwan dataset cleaned as in the notebook."""
+    df = read_csv_datetimes(path, 'date', low_memory=False)
+    df = df.rename(columns={'date': DATE_COL})
+    for col in POLLUTANT_COLS + ['aqi']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    df = df.dropna(subset=REQUIRED_COLS)
+    keep = [DATE_COL, SITE_COL, 'aqi'] + [c for c in POLLUTANT_COLS if c in df.columns]
+    return df[keep].reset_index(drop=True)
+
+
+# ----------------------------
+# 🧮 SHARED AGGREGATES
+# ----------------------------
+def _sample(cache, site, columns, size, exact=False):
+    rows = cache.rows(site, dropna=columns)
+    if exact and len(rows) < size:
+        return None
+    if rows.empty:
+        return None
+    return rows.sample(min(size, len(rows)), random_state=SEED)
+
+
+def _panels(cache, site, edges):
+    """Row-level panels of one report: histogram, correlations and scatter samples."""
+    rows = cache.rows(site)
+    return {
+        'hist': cache.histogram('aqi', edges, site),
+        'aqi_scatter': _sample(cache, site, ['pm2.5', 'aqi', 'o3'], AQI_SAMPLE),
+        'o3_range': (rows['o3'].min(), rows['o3'].max()),
+        'corr': None if cache.rows(site, dropna=CORR_COLS).empty else cache.corr(CORR_COLS, site),
+        'o3_scatter': _sample(cache, site, ['pm2.5', 'o3'], O3_SAMPLE, exact=True),
+    }
+
+
+def prepare_reports(df, stations=None):
+    """Report data per station plus the network-wide ``ALL_STATIONS`` report.
+
+    ``df`` comes from ``load_taiwan``; every aggregate is served by one
+    ``AggregateCache``.
+    """
+    cache = AggregateCache(df, DATE_COL, SITE_COL)
+    aqi = cache.rows(dropna=['aqi'])['aqi']
+    edges = np.histogram_bin_edges(aqi, bins=HIST_BINS) if len(aqi) else np.linspace(0, 1, HIST_BINS + 1)
+
+    site_aqi = cache.mean(['aqi'], 'site').dropna()
+    top_sites = site_aqi.sort_values('aqi', ascending=False, kind='stable').head(TOP_SITES).reset_index(drop=True)
+    trend_sites = cache.sites[:TREND_SITES]
+
+    reports = {ALL_STATIONS: dict(
+        _panels(cache, None, edges),
+        title=ALL_STATIONS,
+        daily=cache.mean(DAILY_COLS, 'day'),
+        monthly=cache.mean(MONTHLY_COLS, 'month'),
+        top_sites=top_sites,
+        site_trends={site: cache.mean(['aqi'], 'day', site).dropna() for site in trend_sites}
+        if len(trend_sites) >= TREND_SITES else None,
+    )}
+    for station in stations if stations is not None else cache.sites:
+        reports[station] = dict(
+            _panels(cache, station, edges),
+            title=station,
+            daily=cache.mean(DAILY_COLS, 'day', station),
+            monthly=cache.mean(MONTHLY_COLS, 'month', station),
+            top_sites=None,
+            site_trends=None,
+        )
+    return reports
+
+
+# ----------------------------
+# 🖼️ BOKEH (HTML)
+# ----------------------------
+def bokeh_figures(data):
+    """The notebook's plots p1-p8 from prepared report data (network-only plots may be absent)."""
+    from bokeh.models import ColumnDataSource, HoverTool
+    from bokeh.palettes import Category10
+    from bokeh.plotting import figure
+    from bokeh.transform import factor_cmap, linear_cmap
+
+    figures = []
+
+    counts, edges = data['hist']
+    p1 = figure(width=800, height=350, title="Distribution of AQI")
+    p1.quad(top=counts, bottom=0, left=edges[:-1], right=edges[1:],
+            fill_color="skyblue", line_color="white", alpha=0.8)
+    p1.xaxis.axis_label = 'AQI'
+    p1.yaxis.axis_label = 'Frequency'
+    figures.append(p1)
+
+    if data['aqi_scatter'] is not None:
+        p2 = figure(title="pm2.5 vs AQI (Color by O3)", width=600, height=400)
+        p2.scatter('pm2.5', 'aqi', source=ColumnDataSource(data['aqi_scatter']),
+                   color=linear_cmap('o3', 'Viridis256', *data['o3_range']), size=6, alpha=0.6)
+        p2.xaxis.axis_label = "pm2.5"
+        p2.yaxis.axis_label = "AQI"
+        p2.add_tools(HoverTool(tooltips=[("O3", "@o3"), ("Date", "@Date{%F}")], formatters={'@Date': 'datetime'}))
+    else:
+        p2 = figure(title="Not enough data for pm2.5 vs AQI (Color by O3) scatter plot", width=600, height=400)
+    figures.append(p2)
+
+    if data['corr'] is not None:
+        corr = data['corr'].stack().rename_axis(['level_0', 'level_1']).reset_index(name='corr')
+        corr['label'] = corr['corr'].round(2).astype(str)
+        source = ColumnDataSource(corr)
+        p3 = figure(title="Pollutant Correlation Heatmap", x_range=CORR_COLS, y_range=list(reversed(CORR_COLS)),
+                    width=600, height=400)
+        p3.rect(x='level_0', y='level_1', width=1, height=1, source=source,
+                color=linear_cmap('corr', 'Viridis256', -1, 1))
+        p3.text(x='level_0', y='level_1', text='label', source=source,
+                text_font_size="8pt", text_align="center", text_baseline="middle")
+    else:
+        p3 = figure(title="Not enough data for Correlation Heatmap", width=600, height=400)
+    figures.append(p3)
+
+    if not data['monthly'].empty:
+        source = ColumnDataSource(data['monthly'])
+        p4 = figure(title="Monthly Avg pm2.5 & pm10", x_axis_type='datetime', width=700, height=400)
+        p4.varea(x=DATE_COL, y1='pm2.5', y2=0, source=source, color="blue", alpha=0.5, legend_label="pm2.5")
+        p4.varea(x=DATE_COL, y1='pm10', y2=0, source=source, color="green", alpha=0.5, legend_label="pm10")
+        p4.legend.location = "top_left"
+        p4.yaxis.axis_label = "Concentration (µg/m³)"
+    else:
+        p4 = figure(title="Not enough data for Monthly Avg pm2.5 & pm10 plot", width=700, height=400)
+    figures.append(p4)
+
+    if not data['daily'].empty:
+        source = ColumnDataSource(data['daily'])
+        p5 = figure(title="Daily Avg Pollutants", x_axis_type='datetime', width=700, height=400)
+        for col, color in (('pm2.5', "red"), ('o3', "blue"), ('no2', "green")):
+            p5.line(DATE_COL, col, source=source, color=color, legend_label=col, line_width=2)
+        p5.legend.location = "top_left"
+        p5.yaxis.axis_label = "Concentration"
+    else:
+        p5 = figure(title="Not enough data for Daily Avg Pollutants line plot", width=700, height=400)
+    figures.append(p5)
+
+    if data['top_sites'] is not None and not data['top_sites'].empty:
+        top_sites = data['top_sites'][SITE_COL].tolist()
+        p6 = figure(x_range=top_sites, title="Avg AQI by Site", width=700, height=400, toolbar_location=None)
+        p6.vbar(x=SITE_COL, top='aqi', width=0.8, source=ColumnDataSource(data['top_sites']),
+                color=factor_cmap(SITE_COL, Category10[max(3, len(top_sites))], top_sites))
+        p6.xaxis.major_label_orientation = 1.0
+        p6.yaxis.axis_label = "AQI"
+        p6.add_tools(HoverTool(tooltips=[("Site", "@sitename"), ("Avg AQI", "@aqi{0.2f}")], mode='vline'))
+        figures.append(p6)
+
+    if data['site_trends']:
+        p7 = figure(title="Daily AQI Over Time", x_axis_type='datetime', width=600, height=400)
+        colors = Category10[max(3, len(data['site_trends']))]
+        for i, (site, trend) in enumerate(data['site_trends'].items()):
+            if not trend.empty:
+                p7.line(DATE_COL, 'aqi', source=ColumnDataSource(trend), color=colors[i],
+                        legend_label=str(site), line_width=2)
+        p7.legend.click_policy = "hide"
+        p7.xaxis.axis_label = "Date"
+        p7.yaxis.axis_label = "AQI"
+        figures.append(p7)
+
+    if data['o3_scatter'] is not None:
+        p8 = figure(title="pm2.5 vs O3", width=600, height=400, tools="hover,pan,wheel_zoom,box_zoom,reset")
+        p8.scatter('pm2.5', 'o3', source=ColumnDataSource(data['o3_scatter']), color="navy", alpha=0.5, size=6)
+        p8.xaxis.axis_label = "pm2.5 (µg/m³)"
+        p8.yaxis.axis_label = "O3 (ppb)"
+        hover = p8.select_one(HoverTool)
+        hover.tooltips = [("Date", "@Date{%F}"), ("pm2.5", "@{pm2.5}"), ("O3", "@o3")]
+        hover.formatters = {'@Date': 'datetime'}
+    else:
+        p8 = figure(title="Not enough data for pm2.5 vs O3 scatter plot", width=600, height=400)
+    figures.append(p8)
+    return figures
+
+
+def write_html(data, path, inline=False):
+    from bokeh.core.validation import silence
+    from bokeh.core.validation.warnings import MISSING_RENDERERS
+    from bokeh.embed import file_html
+    from bokeh.layouts import gridplot
+    from bokeh.resources import CDN, INLINE
+
+    silence(MISSING_RENDERERS)   # the "Not enough data" placeholders are empty on purpose
+    layout = gridplot(bokeh_figures(data), ncols=2)
+    page = file_html(layout, INLINE if inline else CDN, f"Air Quality Report: {data['title']}")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(page)
+
+
+# ----------------------------
+# 🖼️ MATPLOTLIB (PNG)
+# ----------------------------
+def write_png(data, path):
+    """The same panels as a single Matplotlib sheet."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    panels = 6 + (data['top_sites'] is not None) + bool(data['site_trends'])
+    rows = -(-panels // 2)
+    fig, axes = plt.subplots(rows, 2, figsize=(14, 4 * rows))
+    axes = iter(axes.ravel())
+
+    counts, edges = data['hist']
+    ax = next(axes)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='skyblue', edgecolor='white')
+    ax.set(title="Distribution of AQI", xlabel="AQI", ylabel="Frequency")
+
+    ax = next(axes)
+    if data['aqi_scatter'] is not None:
+        s = data['aqi_scatter']
+        points = ax.scatter(s['pm2.5'], s['aqi'], c=s['o3'], cmap='viridis', s=8, alpha=0.6,
+                            vmin=data['o3_range'][0], vmax=data['o3_range'][1])
+        fig.colorbar(points, ax=ax, label="O3")
+    ax.set(title="pm2.5 vs AQI (Color by O3)", xlabel="pm2.5", ylabel="AQI")
+
+    ax = next(axes)
+    if data['corr'] is not None:
+        image = ax.imshow(data['corr'].to_numpy(), cmap='viridis', vmin=-1, vmax=1)
+        ax.set_xticks(range(len(CORR_COLS)), CORR_COLS)
+        ax.set_yticks(range(len(CORR_COLS)), CORR_COLS)
+        for (i, j), value in np.ndenumerate(data['corr'].to_numpy()):
+            ax.text(j, i, f"{value:.2f}", ha='center', va='center', fontsize=8, color='white')
+        fig.colorbar(image, ax=ax)
+    ax.set(title="Pollutant Correlation Heatmap")
+
+    ax = next(axes)
+    monthly = data['monthly']
+    for col, color in (('pm2.5', 'blue'), ('pm10', 'green')):
+        ax.fill_between(monthly[DATE_COL], monthly[col], color=color, alpha=0.5, label=col)
+    ax.set(title="Monthly Avg pm2.5 & pm10", ylabel="Concentration (µg/m³)")
+    ax.tick_params(axis='x', labelrotation=30)
+    ax.legend(loc='upper left')
+
+    ax = next(axes)
+    daily = data['daily']
+    for col, color in (('pm2.5', 'red'), ('o3', 'blue'), ('no2', 'green')):
+        ax.plot(daily[DATE_COL], daily[col], color=color, label=col, linewidth=1)
+    ax.set(title="Daily Avg Pollutants", ylabel="Concentration")
+    ax.tick_params(axis='x', labelrotation=30)
+    ax.legend(loc='upper left')
+
+    if data['top_sites'] is not None:
+        ax = next(axes)
+        ax.bar(data['top_sites'][SITE_COL].astype(str), data['top_sites']['aqi'], color='tab:blue')
+        ax.tick_params(axis='x', labelrotation=60)
+        ax.set(title="Avg AQI by Site", ylabel="AQI")
+
+    if data['site_trends']:
+        ax = next(axes)
+        for site, trend in data['site_trends'].items():
+            ax.plot(trend[DATE_COL], trend['aqi'], label=str(site), linewidth=1)
+        ax.set(title="Daily AQI Over Time", xlabel="Date", ylabel="AQI")
+        ax.tick_params(axis='x', labelrotation=30)
+        ax.legend()
+
+    ax = next(axes)
+    if data['o3_scatter'] is not None:
+        ax.scatter(data['o3_scatter']['pm2.5'], data['o3_scatter']['o3'], color='navy', s=8, alpha=0.5)
+    ax.set(title="pm2.5 vs O3", xlabel="pm2.5 (µg/m³)", ylabel="O3 (ppb)")
+
+    for ax in axes:
+        ax.set_visible(False)
+    fig.suptitle(f"Air Quality Report: {data['title']}")
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+    plt.close(fig)
+
+
+# ----------------------------
+# 🏭 RENDERING
+# ----------------------------
+def render_report(data, out_dir, formats=FORMATS, inline=False):
+    """Write one report in every format; returns the written paths."""
+    base = os.path.join(out_dir, station_slug(data['title']))
+    written = []
+    if 'html' in formats:
+        write_html(data, base + ".html", inline)
+        written.append(base + ".html")
+    if 'png' in formats:
+        write_png(data, base + ".png")
+        written.append(base + ".png")
+    return written
+
+
+def write_index(reports, out_dir, formats=FORMATS):
+    rows = []
+    for title in reports:
+        slug = station_slug(title)
+        links = " · ".join(f'<a href="{slug}.{fmt}">{fmt.upper()}</a>' for fmt in formats)
+        rows.append(f"<li>{html.escape(str(title))}: {links}</li>")
+    path = os.path.join(out_dir, "index.html")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Air Quality Reports</title></head>"
+                f"<body><h1>Air Quality Reports</h1><ul>\n{chr(10).join(rows)}\n</ul></body></html>\n")
+    return path
+
+
+def render_reports(reports, out_dir=REPORT_DIR, formats=FORMATS, max_workers=None, inline=False):
+    """Render every report in a process pool; returns ``{title: [paths]}``."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers, mp_context=context) as pool:
+        futures = {pool.submit(render_report, data, out_dir, formats, inline): title
+                   for title, data in reports.items()}
+        for future in as_completed(futures):
+            written[futures[future]] = future.result()
+    write_index(reports, out_dir, formats)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render per-station air quality reports without a notebook.")
+    parser.add_argument("source", nargs="?", default=TAIWAN_CSV, help="Taiwan air quality CSV")
+    parser.add_argument("--out", default=REPORT_DIR)
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=['html'], dest='formats')
+    parser.add_argument("--stations", nargs="+", help="only these stations (default: all)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--inline", action="store_true", help="embed BokehJS so pages work offline")
+    args = parser.parse_args()
+
+    df = load_taiwan(args.source)
+    reports = prepare_reports(df, args.stations)
+    written = render_reports(reports, args.out, args.formats, args.workers, args.inline)
+    print(f"Wrote {sum(len(paths) for paths in written.values())} files for {len(written)} reports to {args.out}/")
+
+
+if __name__ == "__main__":
+    main()
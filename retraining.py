@@ -0,0 +1,209 @@
+"""Background model retraining for the Milestone 4 Admin Interface.
+
+``RetrainRunner.submit()`` returns at once: the targets are trained in
+parallel in a process pool (one task per pollutant, each loading the dataset
+through the shared cache) while a coordinator thread records progress.
+Job state and per-target metrics (R², MAE, RMSE) are persisted as JSON under
+``models/jobs/`` so any session or process can report on them. Only one job
+runs at a time per model directory: a lock file makes a second request,
+from this or another process, attach to the running job instead of starting
+a duplicate fit. The lock is linked into place with the job id already in
+it, and a running job refreshes its state every ``HEARTBEAT`` seconds, so a
+lock is only cleared as stale when its job really stopped. Claiming and
+clearing the lock hold an exclusive ``flock`` on a guard file, so a lock is
+never removed just after another process claimed it. When every target is
+done the models are saved as a new version and ``models/CURRENT`` is swapped
+to it, which the dashboards pick up on their next rerun.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_loader import CLEANED_CSV, file_lock
+from forecasting import DEFAULT_TARGETS, MODEL_DIR, save_models, train_column
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+JOBS_DIR = "jobs"
+LOCK_FILE = "ACTIVE"
+GUARD_FILE = "ACTIVE.guard"
+
+# A running job saves its state this often, even while one target trains ...
+HEARTBEAT = 60
+# ... so a lock whose job has not written state for this long is abandoned.
+STALE_AFTER = 5 * HEARTBEAT
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class RetrainRunner:
+    """Process-pool retraining with deduplicated, persisted jobs."""
+
+    def __init__(self, source=CLEANED_CSV, model_dir=MODEL_DIR, max_workers=None):
+        self.source = source
+        self.model_dir = model_dir
+        self.jobs_dir = os.path.join(model_dir, JOBS_DIR)
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._state_lock = threading.RLock()    # job dicts are saved from two threads
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    # ----------------------------
+    # 📄 JOB STATE
+    # ----------------------------
+    def _job_path(self, job_id):
+        return os.path.join(self.jobs_dir, job_id + ".json")
+
+    def _lock_path(self):
+        return os.path.join(self.jobs_dir, LOCK_FILE)
+
+    def status(self, job_id=None):
+        """State of ``job_id``, or of the running/most recent job when omitted."""
+        if job_id is None:
+            job_id = self.active_job() or self.latest_job()
+        return None if job_id is None else _read_json(self._job_path(job_id))
+
+    def latest_job(self):
+        jobs = [f for f in os.listdir(self.jobs_dir) if f.endswith(".json")]
+        if not jobs:
+            return None
+        latest = max(jobs, key=lambda f: os.path.getmtime(os.path.join(self.jobs_dir, f)))
+        return latest[:-len(".json")]
+
+    def active_job(self):
+        """Id of the job holding the lock, clearing the lock if it went stale."""
+        try:
+            with open(self._lock_path(), 'r', encoding='utf-8') as f:
+                job_id = f.read().strip()
+        except OSError:
+            return None
+        state = _read_json(self._job_path(job_id))
+        if state is None or state['status'] in (DONE, FAILED) or \
+                time.time() - state['updated'] > STALE_AFTER:
+            self._clear_lock(job_id)
+            return None
+        return job_id
+
+    def _clear_lock(self, job_id):
+        """Remove the lock if it still names ``job_id``."""
+        # Under the guard no job can take the lock between the read and the removal.
+        with file_lock(os.path.join(self.jobs_dir, GUARD_FILE)):
+            try:
+                with open(self._lock_path(), 'r', encoding='utf-8') as f:
+                    holder = f.read().strip()
+            except OSError:
+                return
+            if holder == job_id:
+                os.remove(self._lock_path())
+
+    def _save(self, job):
+        with self._state_lock:
+            job['updated'] = time.time()
+            _write_json(self._job_path(job['id']), job)
+
+    def _heartbeat(self, job, stop):
+        while not stop.wait(HEARTBEAT):
+            self._save(job)
+
+    # ----------------------------
+    # 🚀 SUBMISSION
+    # ----------------------------
+    def submit(self, targets=DEFAULT_TARGETS, candidates=None):
+        """Start a retraining job and return its id, or the id of the one already running."""
+        with self._lock:
+            running = self.active_job()
+            if running is not None:
+                return running
+
+            job = {
+                'id': time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6],
+                'status': QUEUED,
+                'targets': list(targets),
+                'candidates': candidates,
+                'completed': {},
+                'progress': 0.0,
+                'started': time.time(),
+                'finished': None,
+                'version': None,
+                'error': None,
+            }
+            self._save(job)
+            # Linking a finished file claims the lock atomically and with
+            # its content, so no reader ever sees an empty lock.
+            staged = f"{self._lock_path()}.{job['id']}.tmp"
+            with open(staged, 'w', encoding='utf-8') as f:
+                f.write(job['id'])
+            try:
+                with file_lock(os.path.join(self.jobs_dir, GUARD_FILE)):
+                    os.link(staged, self._lock_path())
+            except FileExistsError:
+                # Another process won the race; attach to its job.
+                os.remove(self._job_path(job['id']))
+                return self.active_job() or self.latest_job()
+            finally:
+                os.remove(staged)
+
+        threading.Thread(target=self._run, args=(job,), daemon=True,
+                         name=f"retrain-{job['id']}").start()
+        return job['id']
+
+    def _run(self, job):
+        models, reports = {}, {}
+        with self._state_lock:
+            job['status'] = RUNNING
+            self._save(job)
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job, stop), daemon=True,
+                         name=f"retrain-heartbeat-{job['id']}").start()
+        try:
+            # spawn: forking a process that runs Streamlit's threads is unsafe.
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(self.max_workers, mp_context=context) as pool:
+                futures = {
+                    pool.submit(train_column, self.source, column, job['candidates']): column
+                    for column in job['targets']
+                }
+                for future in as_completed(futures):
+                    column = futures[future]
+                    models[column], reports[column] = future.result()
+                    best = reports[column]['model']
+                    with self._state_lock:
+                        job['completed'][column] = dict(reports[column]['metrics'][best], model=best)
+                        job['progress'] = len(job['completed']) / len(job['targets'])
+                        self._save(job)
+
+            version = save_models(models, reports, self.model_dir, self.source)
+            with self._state_lock:
+                job['version'] = version
+                job['status'] = DONE
+        except Exception as exc:
+            with self._state_lock:
+                job['status'] = FAILED
+                job['error'] = f"{type(exc).__name__}: {exc}"
+        finally:
+            stop.set()
+            with self._state_lock:
+                job['finished'] = time.time()
+                self._save(job)
+            self._clear_lock(job['id'])
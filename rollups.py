@@ -0,0 +1,323 @@
+"""Pre-aggregated time-window rollups for the dashboard filters.
+
+``RollupIndex`` keeps hourly, daily and monthly buckets of
+count/sum/m2/min/max for every numeric column of a Datetime-sorted frame.
+``m2`` is the sum of squared deviations from the bucket's own mean, and
+buckets are combined with the pairwise (Chan et al.) update, so the std of a
+long window with a large mean keeps its precision where ``sumsq - sum*mean``
+would cancel.
+A window such as "Last 7 Days" is answered by taking the whole months, days
+and hours it covers from the coarsest grain that fits and scanning only the
+raw rows left over at the edges, so KPI means, std, min and max cost
+O(buckets) instead of O(rows). Window boundaries are found with a binary
+search on the sorted timestamps, and ``window_slice`` uses the same search to
+cut the frame for the charts without a boolean scan.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATETIME_COL
+
+# ----------------------------
+# 🕒 WINDOWS AND GRAINS
+# ----------------------------
+TIME_WINDOWS = {
+    "Last 24 Hours": pd.Timedelta(hours=24),
+    "Last 7 Days": pd.Timedelta(days=7),
+    "Last 30 Days": pd.Timedelta(days=30),
+    "All Data": None,
+}
+
+# Coarsest first: a query takes whole buckets from the first grain that fits.
+GRAINS = ('month', 'day', 'hour')
+
+STAT_FIELDS = ('count', 'sum', 'm2', 'min', 'max')
+
+_NO_END = np.iinfo(np.int64).max
+
+
+def _as_ns(stamp):
+    return pd.Timestamp(stamp).value
+
+
+def _bucket_starts(stamps, grain):
+    """Floor each timestamp to its bucket start."""
+    if grain == 'hour':
+        return stamps.floor('h')
+    if grain == 'day':
+        return stamps.floor('D')
+    return stamps.to_period('M').to_timestamp().as_unit('ns')
+
+
+def _bucket_ends(starts, grain):
+    if grain == 'hour':
+        return starts + pd.Timedelta(hours=1)
+    if grain == 'day':
+        return starts + pd.Timedelta(days=1)
+    return (starts.to_period('M') + 1).to_timestamp().as_unit('ns')
+
+
+def _mean(count, total):
+    """``total / count``, 0 where ``count`` is 0 (the sum is 0 there too)."""
+    return total / np.maximum(count, 1)
+
+
+def _aggregate(values, offsets):
+    """Reduce row blocks starting at ``offsets`` into the five stat fields."""
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    count = np.add.reduceat(present.astype(np.int64), offsets, axis=0)
+    total = np.add.reduceat(filled, offsets, axis=0)
+    lengths = np.diff(np.r_[offsets, len(values)])
+    deviation = np.where(present, values - np.repeat(_mean(count, total), lengths, axis=0), 0.0)
+    return {
+        'count': count,
+        'sum': total,
+        'm2': np.add.reduceat(deviation * deviation, offsets, axis=0),
+        'min': np.fmin.reduceat(values, offsets, axis=0),
+        'max': np.fmax.reduceat(values, offsets, axis=0),
+    }
+
+
+def _empty_stats(width):
+    return {
+        'count': np.zeros(width, dtype=np.int64),
+        'sum': np.zeros(width),
+        'm2': np.zeros(width),
+        'min': np.full(width, np.nan),
+        'max': np.full(width, np.nan),
+    }
+
+
+def _merge(into, part):
+    count = into['count'] + part['count']
+    delta = _mean(part['count'], part['sum']) - _mean(into['count'], into['sum'])
+    into['m2'] = into['m2'] + part['m2'] + delta * delta * into['count'] * (part['count'] / np.maximum(count, 1))
+    into['count'] = count
+    into['sum'] += part['sum']
+    into['min'] = np.fmin(into['min'], part['min'])
+    into['max'] = np.fmax(into['max'], part['max'])
+
+
+def _reduce_rows(values):
+    if len(values) == 0:
+        return _empty_stats(values.shape[1])
+    values = np.asarray(values, dtype=np.float64)
+    return {field: agg[0] for field, agg in _aggregate(values, [0]).items()}
+
+
+def _reduce_buckets(buckets, lo, hi):
+    count, total = buckets['count'][lo:hi], buckets['sum'][lo:hi]
+    all_count, all_total = count.sum(axis=0), total.sum(axis=0)
+    spread = _mean(count, total) - _mean(all_count, all_total)
+    return {
+        'count': all_count,
+        'sum': all_total,
+        'm2': buckets['m2'][lo:hi].sum(axis=0) + (count * spread * spread).sum(axis=0),
+        'min': np.fmin.reduce(buckets['min'][lo:hi], axis=0),
+        'max': np.fmax.reduce(buckets['max'][lo:hi], axis=0),
+    }
+
+
+def _build_grain(stamps, values, grain):
+    """Buckets of one grain over sorted int64 ``stamps`` and their ``values`` rows."""
+    starts = _bucket_starts(pd.DatetimeIndex(stamps.view('datetime64[ns]')), grain).asi8
+    if len(starts) == 0:
+        offsets = np.empty(0, dtype=np.int64)
+    else:
+        offsets = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    bucket_starts = pd.DatetimeIndex(starts[offsets].view('datetime64[ns]'))
+    grain_index = {
+        'start': bucket_starts.asi8,
+        'end': _bucket_ends(bucket_starts, grain).asi8,
+    }
+    if len(offsets):
+        grain_index.update(_aggregate(values, offsets))
+    else:
+        grain_index.update({f: np.empty((0, values.shape[1])) for f in STAT_FIELDS})
+    return grain_index
+
+
+def refresh_grains(grains, stamps, values, since):
+    """``grains`` with the buckets from ``since`` on rebuilt from sorted ``stamps`` and ``values``.
+
+    ``values`` only needs to support row slicing into a 2-D block. Buckets
+    that end before ``since`` are kept as they are.
+    """
+    since = pd.DatetimeIndex([pd.Timestamp(since)]).as_unit('ns')
+    fresh = {}
+    for grain in GRAINS:
+        old = grains[grain]
+        cut = _bucket_starts(since, grain).asi8[0]
+        keep = int(np.searchsorted(old['start'], cut, 'left'))
+        row = int(np.searchsorted(stamps, cut, 'left'))
+        rebuilt = _build_grain(stamps[row:], values[row:], grain)
+        fresh[grain] = {f: np.concatenate([old[f][:keep], rebuilt[f]]) for f in old}
+    return fresh
+
+
+def closed_grains(stamps, values, covered=None):
+    """Buckets of every grain except the one holding the last of sorted ``stamps``.
+
+    Later rows can still join that open bucket but none before it, so
+    closed buckets never change once built (see ``mapped.py``). ``covered``
+    maps a grain to the end of the closed buckets already built; only the
+    ones from there on are built, from the rows from there on.
+    """
+    grains = {}
+    for grain in GRAINS:
+        row = 0 if covered is None else int(np.searchsorted(stamps, covered[grain], 'left'))
+        buckets = _build_grain(stamps[row:], values[row:], grain)
+        grains[grain] = {f: array[:-1] for f, array in buckets.items()}
+    return grains
+
+
+class RollupIndex:
+    """Hour/day/month rollups over the numeric columns of a sorted frame."""
+
+    def __init__(self, df, columns=None):
+        if columns is None:
+            columns = [c for c in df.columns
+                       if c != DATETIME_COL and pd.api.types.is_numeric_dtype(df[c])]
+        self.columns = list(columns)
+        self._stamps, self._values = self._read(df)
+        self._grains = {grain: _build_grain(self._stamps, self._values, grain) for grain in GRAINS}
+
+    @classmethod
+    def from_arrays(cls, columns, stamps, values, grains):
+        """An index over prebuilt buckets, e.g. memory-mapped ones (see ``mapped.py``).
+
+        ``values`` only needs to support row slicing into a 2-D block.
+        """
+        index = cls.__new__(cls)
+        index.columns = list(columns)
+        index._stamps, index._values, index._grains = stamps, values, grains
+        return index
+
+    @classmethod
+    def from_rows(cls, columns, stamps, values):
+        """An index over sorted int64 ``stamps`` that scans ``values`` instead of a float64 copy.
+
+        ``values`` only needs to support row slicing into a 2-D block, e.g.
+        ``compact.ColumnRows`` over a compact dataset.
+        """
+        stamps = np.asarray(stamps, dtype=np.int64)
+        block = values[:]
+        grains = {grain: _build_grain(stamps, block, grain) for grain in GRAINS}
+        return cls.from_arrays(columns, stamps, values, grains)
+
+    @property
+    def grains(self):
+        """Bucket arrays per grain: ``start``/``end`` plus the ``STAT_FIELDS``."""
+        return self._grains
+
+    def _read(self, df):
+        stamps = pd.DatetimeIndex(df[DATETIME_COL]).as_unit('ns')
+        if not stamps.is_monotonic_increasing:
+            raise ValueError(f"{DATETIME_COL} must be sorted to build rollups")
+        return stamps.asi8, df[self.columns].to_numpy(dtype=np.float64)
+
+    def refresh(self, df, since):
+        """Take in rows added to the frame at or after ``since``.
+
+        ``df`` is the full updated frame. Buckets that end before ``since``
+        are kept and only the ones from there on are recomputed, so a daily
+        upload re-aggregates about a month of rows rather than all history.
+        """
+        stamps, values = self._read(df)
+        self._grains = refresh_grains(self._grains, stamps, values, since)
+        self._stamps, self._values = stamps, values
+
+    # ----------------------------
+    # 🔎 WINDOW LOOKUP
+    # ----------------------------
+    @property
+    def first(self):
+        return pd.Timestamp(self._stamps[0]) if len(self._stamps) else None
+
+    @property
+    def last(self):
+        return pd.Timestamp(self._stamps[-1]) if len(self._stamps) else None
+
+    def window_start(self, time_range):
+        """Start timestamp of a dashboard window, relative to the latest reading."""
+        span = TIME_WINDOWS[time_range]
+        if span is None or not len(self._stamps):
+            return self.first
+        return self.last - span
+
+    def row_bounds(self, start=None, end=None):
+        """Positional ``[lo, hi)`` of rows with ``start <= Datetime < end``."""
+        lo = 0 if start is None else int(np.searchsorted(self._stamps, _as_ns(start), 'left'))
+        hi = len(self._stamps) if end is None else int(np.searchsorted(self._stamps, _as_ns(end), 'left'))
+        return lo, max(lo, hi)
+
+    # ----------------------------
+    # 📊 AGGREGATES
+    # ----------------------------
+    def _cover(self, lo_ns, hi_ns, level, acc):
+        if lo_ns >= hi_ns:
+            return
+        if level == len(GRAINS):
+            lo = int(np.searchsorted(self._stamps, lo_ns, 'left'))
+            hi = int(np.searchsorted(self._stamps, hi_ns, 'left'))
+            _merge(acc, _reduce_rows(self._values[lo:hi]))
+            return
+
+        buckets = self._grains[GRAINS[level]]
+        first = int(np.searchsorted(buckets['start'], lo_ns, 'left'))
+        stop = int(np.searchsorted(buckets['end'], hi_ns, 'right'))
+        if first >= stop:
+            self._cover(lo_ns, hi_ns, level + 1, acc)
+            return
+        _merge(acc, _reduce_buckets(buckets, first, stop))
+        self._cover(lo_ns, int(buckets['start'][first]), level + 1, acc)
+        self._cover(int(buckets['end'][stop - 1]), hi_ns, level + 1, acc)
+
+    def stats(self, start=None, end=None, columns=None):
+        """Count, mean, std, min and max per column for ``start <= Datetime < end``.
+
+        Matches ``df[mask][columns].agg(['count', 'mean', 'std', 'min', 'max'])``
+        transposed, with ``std`` using ``ddof=1`` like pandas.
+        """
+        lo_ns = np.iinfo(np.int64).min if start is None else _as_ns(start)
+        hi_ns = _NO_END if end is None else _as_ns(end)
+        acc = _empty_stats(len(self.columns))
+        self._cover(lo_ns, hi_ns, 0, acc)
+
+        count = acc['count'].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = acc['sum'] / count
+            var = acc['m2'] / (count - 1)
+        std = np.sqrt(np.clip(var, 0.0, None))
+        std[count < 2] = np.nan
+
+        table = pd.DataFrame({
+            'count': acc['count'],
+            'mean': mean,
+            'std': std,
+            'min': acc['min'],
+            'max': acc['max'],
+        }, index=self.columns)
+        if columns is not None:
+            table = table.loc[list(columns)]
+        return table
+
+    def window_stats(self, time_range, columns=None):
+        """``stats`` for one of the ``TIME_WINDOWS`` labels."""
+        return self.stats(self.window_start(time_range), None, columns)
+
+
+def window_bounds(index, time_range):
+    """Positional ``[lo, hi)`` of the rows inside a dashboard window."""
+    return index.row_bounds(index.window_start(time_range))
+
+
+def window_slice(df, index, time_range):
+    """Rows of ``df`` inside a dashboard window, cut by binary search.
+
+    ``df`` must be the frame ``index`` was built from.
+    """
+    lo, hi = window_bounds(index, time_range)
+    return df.iloc[lo:hi]
@@ -0,0 +1,195 @@
+"""Fast start for the Streamlit dashboards: a warm-up hook and a startup budget.
+
+The dashboards keep their module-level imports light. Plotly is imported by
+the figure builders in ``dashboards.py``, the admin modules (retraining,
+uploads) when the Admin Interface renders, and forecast models, with the
+XGBoost/statsmodels/Prophet imports they pull in, are unpickled by
+``Forecaster`` on first use. ``warm_up`` runs that deferred work in a
+background thread once a script has sent its first page, so later panels
+and sessions of the same process find it done.
+
+``measure_startup`` times a dashboard's module-level imports in a fresh
+interpreter (the part of a cold start paid before anything renders) and
+lists the heavy libraries they load. ``--check`` exits with status 1 when an
+app exceeds its budget in ``STARTUP_BUDGETS`` or imports a heavy library
+at start.
+
+Usage:
+    python startup.py                     # measure every dashboard
+    python startup.py --check             # enforce the budgets
+"""
+
+import argparse
+import ast
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from instrumentation import span
+
+# ----------------------------
+# ⚙️ SETTINGS
+# ----------------------------
+APPS = {
+    'milestone1': "Milestone1-Dashboard.py",
+    'milestone4': "Milestone4-Dashboard.py",
+}
+
+# Seconds of module-level imports allowed per app, measured on a fresh
+# interpreter; importing Streamlit alone takes about 0.4 s of it.
+STARTUP_BUDGETS = {'milestone1': 1.2, 'milestone4': 1.2}
+
+# Imports that load the framework itself; timed first and separately.
+FRAMEWORK_IMPORTS = ("import streamlit as st", "import streamlit")
+
+# Libraries a dashboard's own imports may not load before its first page
+# (Streamlit itself already imports plotly.graph_objects when it is installed).
+HEAVY_MODULES = ('plotly', 'tensorflow', 'prophet', 'statsmodels', 'xgboost', 'sklearn',
+                 'matplotlib', 'bokeh', 'seaborn')
+
+REPEATS = 3
+
+_lock = threading.Lock()
+_warmups = {}   # name -> (thread, {task: seconds or error})
+
+
+# ----------------------------
+# 🔥 WARM-UP
+# ----------------------------
+def import_modules(*names):
+    """A warm-up task importing ``names``."""
+    def task():
+        for name in names:
+            importlib.import_module(name)
+    task.__name__ = "import " + ", ".join(names)
+    return task
+
+
+def _run(tasks, results):
+    for task in tasks:
+        label = getattr(task, '__name__', repr(task))
+        started = time.perf_counter()
+        try:
+            with span(f"warm-up:{label}"):
+                task()
+        except Exception as exc:    # a failed warm-up only means the work happens on first use
+            results[label] = f"{type(exc).__name__}: {exc}"
+        else:
+            results[label] = time.perf_counter() - started
+
+
+def warm_up(name, *tasks):
+    """Run ``tasks`` in order in a background daemon thread, once per process and ``name``.
+
+    Call it at the end of a script, after the page has been sent; later
+    reruns get the existing thread back. Tasks must not call Streamlit.
+    """
+    with _lock:
+        entry = _warmups.get(name)
+        if entry is None:
+            results = {}
+            thread = threading.Thread(target=_run, args=(tasks, results), name=f"warm-up:{name}", daemon=True)
+            entry = _warmups[name] = (thread, results)
+            thread.start()
+    return entry[0]
+
+
+def warm_up_results(name):
+    """``{task: seconds, or the error it raised}`` of finished warm-up tasks."""
+    entry = _warmups.get(name)
+    return dict(entry[1]) if entry is not None else {}
+
+
+# ----------------------------
+# ⏱️ STARTUP BUDGET
+# ----------------------------
+def script_imports(path):
+    """Source of the module-level import statements of a script."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def _probe(imports):
+    framework = [line for line in imports if line in FRAMEWORK_IMPORTS]
+    own = [line for line in imports if line not in FRAMEWORK_IMPORTS]
+    return "\n".join([
+        "import json, sys, time",
+        "_top = lambda: {m.split('.')[0] for m in sys.modules}",
+        "_started = time.perf_counter()",
+        *framework,
+        "_framework_s, _before = time.perf_counter() - _started, _top()",
+        *own,
+        "_seconds = time.perf_counter() - _started",
+        "print(json.dumps({'import_s': _seconds, 'framework_s': _framework_s, "
+        "'added': sorted(_top() - _before)}))",
+    ])
+
+
+def measure_startup(path, repeats=REPEATS):
+    """Median import times and the heavy modules loaded by ``path``'s module-level imports.
+
+    Each repeat is a fresh interpreter started in the script's directory.
+    ``framework_s`` is the share of ``import_s`` spent importing Streamlit,
+    ``process_s`` adds interpreter start-up, and ``heavy`` lists heavy
+    libraries loaded by the app's own imports on top of the framework.
+    """
+    code = _probe(script_imports(path))
+    cwd = os.path.dirname(os.path.abspath(path))
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        result['process_s'] = time.perf_counter() - started
+        runs.append(result)
+    return {
+        'import_s': statistics.median(run['import_s'] for run in runs),
+        'framework_s': statistics.median(run['framework_s'] for run in runs),
+        'process_s': statistics.median(run['process_s'] for run in runs),
+        'heavy': [name for name in HEAVY_MODULES if name in runs[-1]['added']],
+    }
+
+
+def check_budgets(results, budgets=STARTUP_BUDGETS):
+    """Budget violations of ``measure_startup`` results, keyed by app, as readable lines."""
+    problems = []
+    for app, result in results.items():
+        budget = budgets.get(app)
+        if budget is not None and result['import_s'] > budget:
+            problems.append(f"{app}: imports take {result['import_s']:.2f} s, budget {budget:.2f} s")
+        if result['heavy']:
+            problems.append(f"{app}: imports {', '.join(result['heavy'])} at start")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the dashboards' cold-start imports against a budget.")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--check", action="store_true", help="exit 1 when an app is over budget")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    results = {app: measure_startup(os.path.join(root, APPS[app]), args.repeats) for app in args.apps}
+    for app, result in results.items():
+        print(f"{app:<12} imports {result['import_s']:.3f} s (Streamlit {result['framework_s']:.3f} s)  "
+              f"process {result['process_s']:.3f} s  "
+              f"budget {STARTUP_BUDGETS.get(app, float('nan')):.2f} s  heavy: {', '.join(result['heavy']) or '-'}")
+
+    if args.check:
+        problems = check_budgets(results)
+        if problems:
+            print("\n".join(f"  {line}" for line in problems))
+            return 1
+        print("All dashboards within their startup budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
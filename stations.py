@@ -0,0 +1,228 @@
+"""Station-partitioned storage behind the "Monitoring Station" selector.
+
+Multi-site files (e.g. the Taiwan dataset with its ``sitename`` column) are
+split into one file per station and month::
+
+    stations/
+        index.json                  # station -> slug, months, row counts, time span
+        <station-slug>/2016-01.parquet
+        <station-slug>/2016-02.parquet
+
+Each partition holds that station's Datetime-indexed numeric columns
+(float32). Loading a station reads only its own partitions, and only the
+months overlapping the requested range. ``DEFAULT_STATION`` is always
+available and is served by ``data_loader.load_cleaned_data`` (or its
+memory-mapped copy from ``mapped.py`` when one is current), so the admin
+upload path keeps working unchanged. ``station_version`` identifies what a
+station's partitions hold, for keying caches of its frames.
+
+Usage:
+    python stations.py air_quality.csv --station-col sitename --datetime-col date
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (DATETIME_COL, DEFAULT_STATION, SENSOR_DTYPE, dataset_key, frame_suffix,
+                         load_cleaned_data, read_frame, write_frame)
+from mapped import load_mapped
+from timestamps import parse_datetimes
+
+# ----------------------------
+# 📂 STORE LAYOUT
+# ----------------------------
+STATION_DIR = "stations"
+INDEX_FILE = "index.json"
+MONTH_FORMAT = '%Y-%m'
+
+# In-process memo of loaded station frames.
+_STATIONS = {}
+
+
+def station_slug(station):
+    return ''.join(ch if ch.isalnum() else '_' for ch in str(station)).strip('_') or 'station'
+
+
+def _index_path(root):
+    return os.path.join(root, INDEX_FILE)
+
+
+def read_index(root=STATION_DIR):
+    """The station index, ``{}`` when no store has been built."""
+    try:
+        with open(_index_path(root), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(index, root):
+    tmp = _index_path(root) + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp, _index_path(root))
+
+
+def list_stations(root=STATION_DIR):
+    """``DEFAULT_STATION`` followed by every station in the store."""
+    return [DEFAULT_STATION] + sorted(s for s in read_index(root) if s != DEFAULT_STATION)
+
+
+# ----------------------------
+# ✍️ WRITING
+# ----------------------------
+def _month_path(root, slug, month):
+    return os.path.join(root, slug, month + frame_suffix())
+
+
+def write_station_rows(station, rows, root=STATION_DIR, index=None):
+    """Merge Datetime-indexed rows into the station's month partitions.
+
+    Only the months present in ``rows`` are read and rewritten; stored
+    readings win over new ones with the same timestamp. Returns the number
+    of rows added. Pass ``index`` to batch several stations into one index
+    write (the caller then saves it).
+    """
+    save_index = index is None
+    if index is None:
+        index = read_index(root)
+    entry = index.setdefault(station, {'slug': station_slug(station), 'months': {}})
+    os.makedirs(os.path.join(root, entry['slug']), exist_ok=True)
+
+    rows = rows.sort_index()
+    months = rows.index.strftime(MONTH_FORMAT)
+    added = 0
+    for month, part in rows.groupby(months, sort=False):
+        path = _month_path(root, entry['slug'], month)
+        if month in entry['months'] and os.path.exists(path):
+            stored = read_frame(path)
+            merged = pd.concat([stored, part])
+            merged = merged[~merged.index.duplicated(keep='first')].sort_index()
+            added += len(merged) - len(stored)
+        else:
+            merged = part[~part.index.duplicated(keep='first')]
+            added += len(merged)
+        write_frame(merged, path)
+        entry['months'][month] = {
+            'rows': len(merged),
+            'start': merged.index[0].isoformat(),
+            'end': merged.index[-1].isoformat(),
+        }
+    entry['rows'] = sum(m['rows'] for m in entry['months'].values())
+
+    if save_index:
+        _write_index(index, root)
+    return added
+
+
+def build_station_store(df, station_col, datetime_col=DATETIME_COL, root=STATION_DIR):
+    """Partition a multi-station frame by station and month; return rows written per station."""
+    os.makedirs(root, exist_ok=True)
+    stamps = parse_datetimes(df[datetime_col])
+    keep = stamps.notna() & df[station_col].notna()
+    numeric = [c for c in df.columns
+               if c not in (station_col, datetime_col) and pd.api.types.is_numeric_dtype(df[c])]
+
+    frame = df.loc[keep, numeric].astype(SENSOR_DTYPE)
+    frame.index = pd.DatetimeIndex(stamps[keep], name=DATETIME_COL)
+    index = read_index(root)
+    written = {}
+    for station, rows in frame.groupby(df.loc[keep, station_col].to_numpy(), sort=True):
+        written[station] = write_station_rows(str(station), rows, root, index)
+    _write_index(index, root)
+    return written
+
+
+# ----------------------------
+# 📖 READING
+# ----------------------------
+def _months_in_range(months, start, end):
+    for month, info in sorted(months.items()):
+        if start is not None and pd.Timestamp(info['end']) < start:
+            continue
+        if end is not None and pd.Timestamp(info['start']) >= end:
+            continue
+        yield month
+
+
+def _signature(root, entry):
+    """``(month, mtime_ns, size)`` of each of a station's month partitions."""
+    files = []
+    for month in sorted(entry['months']):
+        try:
+            stat = os.stat(_month_path(root, entry['slug'], month))
+        except FileNotFoundError:
+            continue
+        files.append((month, stat.st_mtime_ns, stat.st_size))
+    return tuple(files)
+
+
+def station_version(station, root=STATION_DIR):
+    """Identity of a station's stored readings; changes whenever a partition is rewritten.
+
+    ``DEFAULT_STATION`` outside the store has its ``dataset_key``.
+    """
+    index = read_index(root)
+    if station not in index:
+        if station == DEFAULT_STATION:
+            return dataset_key()
+        raise KeyError(f"Unknown station {station!r}")
+    return (os.path.abspath(root), station, _signature(root, index[station]))
+
+
+def load_station(station, start=None, end=None, root=STATION_DIR):
+    """One station's readings with ``Datetime`` as a sorted column.
+
+    Only month partitions overlapping ``[start, end)`` are read. Frames are
+    memoised per process and ``station_version``; callers must treat them
+    as read-only.
+    """
+    index = read_index(root)
+    if station not in index:
+        if station == DEFAULT_STATION:
+            store = load_mapped()
+            return store.frame if store is not None else load_cleaned_data()
+        raise KeyError(f"Unknown station {station!r}")
+
+    start = None if start is None else pd.Timestamp(start)
+    end = None if end is None else pd.Timestamp(end)
+    entry = index[station]
+    key = (os.path.abspath(root), station, start, end, _signature(root, entry))
+    df = _STATIONS.get(key)
+    if df is None:
+        months = list(_months_in_range(entry['months'], start, end))
+        parts = [read_frame(_month_path(root, entry['slug'], m)) for m in months]
+        if parts:
+            df = pd.concat(parts)
+        else:
+            df = pd.DataFrame(index=pd.DatetimeIndex([], name=DATETIME_COL))
+        if start is not None:
+            df = df[df.index >= start]
+        if end is not None:
+            df = df[df.index < end]
+        df = df.reset_index()
+        for stale in [k for k in _STATIONS if k[:2] == key[:2]]:
+            del _STATIONS[stale]
+        _STATIONS[key] = df
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition a multi-station CSV by station and month.")
+    parser.add_argument("source", help="CSV with one row per station reading")
+    parser.add_argument("--station-col", default="sitename")
+    parser.add_argument("--datetime-col", default="date")
+    parser.add_argument("--root", default=STATION_DIR)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.source, low_memory=False)
+    written = build_station_store(df, args.station_col, args.datetime_col, args.root)
+    print(f"Wrote {sum(written.values())} rows for {len(written)} stations to {args.root}/")
+
+
+if __name__ == "__main__":
+    main()
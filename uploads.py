@@ -0,0 +1,95 @@
+"""Incremental append path for admin CSV uploads.
+
+An uploaded file is checked against the ``AirQuality_cleaned.csv`` schema,
+typed like the cache (float32 sensors, datetime64 stamps), stripped of rows
+whose ``Datetime`` repeats within the file or already exists in the stored
+dataset, flagged by ``quality.py`` after the stored readings before them,
+and written as a new partition through ``data_loader``. History is
+never re-read or re-cleaned; the returned stats carry the time range that
+changed so callers can refresh rollups and caches for just that range.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_loader import (CACHE_DIR, CLEANED_CSV, DATETIME_COL, QUALITY_COL, SENSOR_COLUMNS,
+                         SENSOR_DTYPE, append_partition, load_indexed_data)
+from ingest import MISSING_SENTINEL
+from quality import flag_frame
+from timestamps import parse_datetimes
+
+REQUIRED_COLUMNS = [DATETIME_COL] + SENSOR_COLUMNS
+
+
+def validate_upload(frame):
+    """Type an uploaded frame like the cleaned dataset.
+
+    Returns the Datetime-indexed rows that have a valid timestamp and at
+    least one reading, and the number of rows dropped. Missing readings
+    stay NaN for ``imputation.py`` to fill, as in ``ingest.py``. Raises
+    ``ValueError`` when required columns are missing.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in frame.columns]
+    if missing:
+        raise ValueError(f"Uploaded file is missing columns: {', '.join(missing)}")
+
+    stamps = parse_datetimes(frame[DATETIME_COL])
+    values = frame[SENSOR_COLUMNS].apply(pd.to_numeric, errors='coerce').astype(SENSOR_DTYPE)
+    values = values.mask(values == MISSING_SENTINEL)
+
+    valid = (stamps.notna() & values.notna().any(axis=1)).to_numpy()
+    clean = values[valid]
+    clean.index = pd.DatetimeIndex(stamps[valid], name=DATETIME_COL)
+    return clean, int((~valid).sum())
+
+
+def append_upload(frame, path=CLEANED_CSV, cache_dir=CACHE_DIR):
+    """Validate, deduplicate and append an uploaded frame; return the append stats.
+
+    ``start``/``end`` give the range of appended timestamps (None when
+    nothing new was appended).
+    """
+    new, invalid = validate_upload(frame)
+    stats = append_rows(new, path, cache_dir)
+    stats.update(rows_read=len(frame), invalid=invalid)
+    return stats
+
+
+def append_rows(new, path=CLEANED_CSV, cache_dir=CACHE_DIR, stored=None):
+    """Append validated, Datetime-indexed rows whose timestamps are not stored yet.
+
+    ``stored`` is the stored data with its ``Quality`` column, loaded in
+    full when not given. Callers that keep just its latest rows (``live.py``)
+    pass those instead; new rows before the first of them cannot be checked
+    and are dropped as ``late``.
+
+    Returns the ``append_upload`` stats without the validation counts; the
+    appended rows, flags included, are under ``rows`` and the partition file
+    written under ``partition``.
+    """
+    stats = {'rows_read': len(new), 'invalid': 0, 'duplicates': 0, 'late': 0,
+             'rows_appended': 0, 'flagged': 0, 'start': None, 'end': None, 'rows': new.iloc[:0],
+             'partition': None}
+
+    if stored is None:
+        stored = load_indexed_data(path, cache_dir, keep_flags=True)
+    elif len(stored):
+        late = new.index < stored.index[0]
+        stats['late'] = int(late.sum())
+        new = new[~late]
+    existing = stored.index.as_unit('ns').asi8
+    stamps = new.index.as_unit('ns').asi8
+    fresh = ~new.index.duplicated(keep='first')
+    fresh &= ~np.isin(stamps, existing, assume_unique=False)
+    stats['duplicates'] = int((~fresh).sum())
+
+    new = new[fresh].sort_index()
+    if new.empty:
+        return stats
+
+    # Checked after the stored readings that precede them.
+    new = flag_frame(new, stored[stored.index < new.index[0]])
+    partition = append_partition(new, path, cache_dir)
+    stats.update(partition=partition, rows_appended=len(new), start=new.index[0], end=new.index[-1],
+                 flagged=int((new[QUALITY_COL] != 0).sum()), rows=new)
+    return stats